@@ -0,0 +1,723 @@
+"""benchmark_get_version_number
+Benchmarks for get_version_number.py, every benchmark prints a json report.
+
+Usage:
+    python3 benchmark_get_version_number.py reservations --concurrency 50
+    python3 benchmark_get_version_number.py startup --max-import-ms 50
+    python3 benchmark_get_version_number.py -o results.json repositories --sizes 1000 10000 100000 1000000
+    python3 benchmark_get_version_number.py report --tags 1000000
+    python3 benchmark_get_version_number.py reachability --tags 100000
+    python3 benchmark_get_version_number.py schemes --tags 1000000 --max-overhead 1.1
+    python3 benchmark_get_version_number.py compare baseline.json results.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import tempfile
+import importlib.util
+import platform
+import tracemalloc
+import subprocess
+import zlib
+import concurrent.futures
+
+import get_version_number
+
+EMPTY_TREE = '4b825dc642cb6eb9a060e54bf8d69288fbee4904'
+
+
+def run_git(repository_directory:str, *args):
+    """Runs a git command in the repository and returns stdout.
+
+    Args:
+        repository_directory (str): Path to the git repository.
+        args (str): git arguments
+
+    Returns:
+        str: stdout of the git command.
+    """
+    return subprocess.run(['git', '-C', repository_directory] + list(args), check=True, capture_output=True, text=True).stdout
+
+
+def create_repository(repository_directory:str):
+    """Creates a git repository with a single commit.
+
+    Args:
+        repository_directory (str): Path to the new git repository.
+
+    Returns:
+        str: The commit id.
+    """
+    shutil.rmtree(repository_directory, ignore_errors=True)
+    os.makedirs(repository_directory)
+    run_git(repository_directory, 'init', '-q', '-b', 'main')
+    run_git(repository_directory, '-c', 'user.name=benchmark', '-c', 'user.email=benchmark@localhost', 'commit', '-q', '--allow-empty', '-m', 'Initial commit')
+    return run_git(repository_directory, 'rev-parse', 'HEAD').strip()
+
+
+def reserve(repository_directory:str):
+    """Reserves a mainline version number and returns it with the time it took."""
+    start = time.perf_counter()
+    version_number = get_version_number.reserve_next_version_number(repository_directory, 'main', '', 2, 0)
+    return version_number, time.perf_counter() - start
+
+
+def benchmark_reservations(concurrency:int=50):
+    """Reserves mainline version numbers from many processes at the same time.
+
+    Args:
+        concurrency (int, optional): Number of parallel reservations. Defaults to 50.
+
+    Returns:
+        dict: Wall time, throughput and latencies of the reservations, and whether all numbers were unique.
+    """
+    repository_directory = tempfile.mkdtemp(prefix='benchmark_reservations_')
+    try:
+        create_repository(repository_directory)
+        start = time.perf_counter()
+        with concurrent.futures.ProcessPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(reserve, [repository_directory] * concurrency))
+        wall_time = time.perf_counter() - start
+    finally:
+        shutil.rmtree(repository_directory, ignore_errors=True)
+    version_numbers = [version_number for version_number, _ in results]
+    latencies = sorted(latency for _, latency in results)
+    return {'benchmark': 'reservations', 'concurrency': concurrency, 'wall_time': wall_time,
+            'reservations_per_second': concurrency / wall_time, 'latency_median': latencies[len(latencies) // 2],
+            'latency_max': latencies[-1], 'unique': len(set(version_numbers)) == concurrency}
+
+
+def return_import_times(stderr:str):
+    """Returns the modules and cumulative import times from python -X importtime output.
+
+    Args:
+        stderr (str): stderr of a python -X importtime run.
+
+    Returns:
+        imports (list): (module, cumulative microseconds, nested) tuples in import order.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        imports.append((module.strip(), int(cumulative), module.startswith('  ')))
+    return imports
+
+
+def benchmark_startup(runs:int=10, max_import_ms:float=None):
+    """Measures the cold start of the command line for a developer branch and a mainline build.
+
+    Args:
+        runs (int, optional): Runs per branch, the median is reported. Defaults to 10.
+        max_import_ms (float, optional): Fail when the developer branch imports take longer. Defaults to None.
+
+    Returns:
+        dict: Wall time and import time per branch, the slowest imports and whether GitPython was imported.
+    """
+    repository_directory = tempfile.mkdtemp(prefix='benchmark_startup_')
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'get_version_number.py')
+    report = {'benchmark': 'startup', 'runs': runs}
+    try:
+        create_repository(repository_directory)
+        for name, branch in [('developer', 'TOOLS-1234'), ('mainline', 'main')]:
+            wall_times = []
+            import_times = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                result = subprocess.run([sys.executable, '-X', 'importtime', script, '-d', repository_directory, '-b', branch], capture_output=True, text=True, check=True)
+                wall_times.append(time.perf_counter() - start)
+                imports = return_import_times(result.stderr)
+                import_times.append(sum(cumulative for _, cumulative, nested in imports if not nested) / 1000)
+            slowest = sorted(((cumulative, module) for module, cumulative, nested in imports if not nested), reverse=True)[:10]
+            report[name] = {'wall_time_median': sorted(wall_times)[runs // 2], 'import_ms_median': sorted(import_times)[runs // 2],
+                            'imports_gitpython': any(module == 'git' for module, _, _ in imports),
+                            'slowest_imports_ms': {module: cumulative / 1000 for cumulative, module in slowest}}
+    finally:
+        shutil.rmtree(repository_directory, ignore_errors=True)
+    report['passed'] = not report['developer']['imports_gitpython'] and (max_import_ms is None or report['developer']['import_ms_median'] <= max_import_ms)
+    return report
+
+
+def return_synthetic_refs(tag_count:int, seed:int=0):
+    """Returns tag and remote branch names shaped like a long-lived repository.
+
+    80% of the tags are mainline and release builds spread over release lines, 10% are feature branch
+    builds and 10% do not match the version number pattern. Every other release line has a release branch.
+
+    Args:
+        tag_count (int): Number of tags
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        tuple: (tags, remote_branches)
+    """
+    generator = random.Random(seed)
+    release_line_count = max(1, tag_count // 500)
+    release_lines = [(line // 20 + 1, line % 20, 0) for line in range(release_line_count)]
+    feature_branches = ['feature/FEATURE-{}'.format(number) for number in range(max(1, tag_count // 1000))]
+    tags = set()
+    builds = {}
+    while len(tags) < tag_count:
+        kind = generator.random()
+        if kind < 0.8:
+            release_line = generator.choice(release_lines)
+            builds[release_line] = builds.get(release_line, 0) + 1
+            tags.add('{}.{}'.format(get_version_number.return_version_string(release_line), builds[release_line]))
+        elif kind < 0.9:
+            feature_branch = generator.choice(feature_branches)
+            feature_number = get_version_number.hash_text_to_8_digits(feature_branch)
+            builds[feature_branch] = builds.get(feature_branch, 0) + 1
+            tags.add('0.0.{}.{}'.format(feature_number, builds[feature_branch]))
+        else:
+            tags.add('build-{}-{}'.format(generator.randrange(10 ** 6), generator.choice(['rc', 'nightly', 'hotfix'])))
+    remote_branches = ['HEAD', 'main', 'develop'] + feature_branches
+    remote_branches += ['release/{}'.format(get_version_number.return_version_string(release_line)) for release_line in release_lines[::2]]
+    remote_branches += ['TOOLS-{}'.format(number) for number in range(max(1, tag_count // 2000))]
+    return sorted(tags), remote_branches
+
+
+def create_synthetic_repository(repository_directory:str, tag_count:int, loose_fraction:float=0.01, seed:int=0):
+    """Creates a bare repository with synthetic tags and origin branches.
+
+    All refs point at one empty commit. Most refs are written to packed-refs, a fraction of the tags are written as loose refs.
+
+    Args:
+        repository_directory (str): Path to the new bare repository.
+        tag_count (int): Number of tags
+        loose_fraction (float, optional): Fraction of tags written as loose refs. Defaults to 0.01.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        dict: Number of tags, loose tags and remote branches.
+    """
+    shutil.rmtree(repository_directory, ignore_errors=True)
+    os.makedirs(repository_directory)
+    run_git(repository_directory, 'init', '-q', '--bare')
+    commit = run_git(repository_directory, '-c', 'user.name=benchmark', '-c', 'user.email=benchmark@localhost', 'commit-tree', EMPTY_TREE, '-m', 'Initial commit').strip()
+    tags, remote_branches = return_synthetic_refs(tag_count, seed)
+    loose_tags = set(random.Random(seed).sample(tags, int(tag_count * loose_fraction)))
+    refs = ['refs/tags/{}'.format(tag) for tag in tags if tag not in loose_tags]
+    refs += ['refs/remotes/origin/{}'.format(branch) for branch in remote_branches if branch != 'HEAD']
+    refs += ['refs/heads/main']
+    refs.sort(key=lambda ref: ref.encode('utf-8'))
+    with open(os.path.join(repository_directory, 'packed-refs'), 'w') as writer:
+        writer.write('# pack-refs with: peeled fully-peeled sorted \n')
+        writer.write(''.join('{} {}\n'.format(commit, ref) for ref in refs))
+    for tag in loose_tags:
+        os.makedirs(os.path.join(repository_directory, 'refs', 'tags'), exist_ok=True)
+        with open(os.path.join(repository_directory, 'refs', 'tags', tag), 'w') as writer:
+            writer.write(commit + '\n')
+    os.makedirs(os.path.join(repository_directory, 'refs', 'remotes', 'origin'), exist_ok=True)
+    with open(os.path.join(repository_directory, 'refs', 'remotes', 'origin', 'HEAD'), 'w') as writer:
+        writer.write('ref: refs/remotes/origin/main\n')
+    return {'tags': len(tags), 'loose_tags': len(loose_tags), 'remote_branches': len(remote_branches)}
+
+
+def encode_reftable_varint(value:int):
+    """Returns value as a git varint (offset encoded, most significant group first)."""
+    encoded = [value & 0x7f]
+    value >>= 7
+    while value:
+        value -= 1
+        encoded.append(0x80 | (value & 0x7f))
+        value >>= 7
+    return bytes(reversed(encoded))
+
+
+def write_reftable(path:str, refs:list, block_size:int=4096, restart_interval:int=16, update_index:int=1):
+    """Writes a version 1 reftable with padded ref blocks, restart points and no index, log or obj sections.
+
+    Args:
+        path (str): Path to the new .ref file.
+        refs (list): Sorted (name, value) pairs, value is a hex object id, 'ref: target' for a symbolic ref or None for a deletion.
+        block_size (int, optional): Block size. Defaults to 4096.
+        restart_interval (int, optional): Records between restart points. Defaults to 16.
+        update_index (int, optional): Update index of every record. Defaults to 1.
+    """
+    header = b'REFT' + bytes([1]) + block_size.to_bytes(3, 'big') + update_index.to_bytes(8, 'big') * 2
+    table = bytearray(header)
+    block_start = 0
+    records = bytearray()
+    restarts = []
+    previous = b''
+    since_restart = 0
+    def encode_record(name, value, prefix_length):
+        if value is None:
+            value_type, encoded_value = 0, b''
+        elif value.startswith('ref: '):
+            target = value[len('ref: '):].encode('utf-8')
+            value_type, encoded_value = 3, encode_reftable_varint(len(target)) + target
+        else:
+            value_type, encoded_value = 1, bytes.fromhex(value)
+        suffix = name[prefix_length:]
+        return encode_reftable_varint(prefix_length) + encode_reftable_varint((len(suffix) << 3) | value_type) + suffix + encode_reftable_varint(0) + encoded_value
+    def write_block(padded):
+        block_length = len(table) - block_start + 4 + len(records) + 3 * len(restarts) + 2
+        table.extend(b'r' + block_length.to_bytes(3, 'big') + records)
+        table.extend(b''.join(restart.to_bytes(3, 'big') for restart in restarts) + len(restarts).to_bytes(2, 'big'))
+        if padded:
+            table.extend(bytes(block_start + block_size - len(table)))
+    for name, value in refs:
+        name = name.encode('utf-8')
+        restart = not restarts or since_restart >= restart_interval
+        prefix_length = 0 if restart else len(os.path.commonprefix([previous, name]))
+        record = encode_record(name, value, prefix_length)
+        if records and len(table) - block_start + 4 + len(records) + len(record) + 3 * (len(restarts) + restart) + 2 > block_size:
+            write_block(True)
+            block_start = len(table)
+            records = bytearray()
+            restarts = []
+            restart = True
+            record = encode_record(name, value, 0)
+        if restart:
+            restarts.append(len(table) - block_start + 4 + len(records))
+            since_restart = 0
+        records.extend(record)
+        since_restart += 1
+        previous = name
+    if records:
+        write_block(False)
+    footer = header + bytes(40)
+    table.extend(footer + zlib.crc32(footer).to_bytes(4, 'big'))
+    with open(path, 'wb') as writer:
+        writer.write(table)
+
+
+def create_synthetic_reftable_repository(repository_directory:str, tag_count:int, seed:int=0, block_size:int=4096):
+    """Creates a bare repository storing the synthetic tags and origin branches in a single reftable.
+
+    Args:
+        repository_directory (str): Path to the new bare repository.
+        tag_count (int): Number of tags
+        seed (int, optional): Random seed. Defaults to 0.
+        block_size (int, optional): Reftable block size. Defaults to 4096.
+
+    Returns:
+        dict: Number of tags and remote branches.
+    """
+    shutil.rmtree(repository_directory, ignore_errors=True)
+    os.makedirs(repository_directory)
+    run_git(repository_directory, 'init', '-q', '--bare')
+    commit = run_git(repository_directory, '-c', 'user.name=benchmark', '-c', 'user.email=benchmark@localhost', 'commit-tree', EMPTY_TREE, '-m', 'Initial commit').strip()
+    run_git(repository_directory, 'config', 'core.repositoryformatversion', '1')
+    run_git(repository_directory, 'config', 'extensions.refStorage', 'reftable')
+    tags, remote_branches = return_synthetic_refs(tag_count, seed)
+    refs = [('HEAD', 'ref: refs/heads/main'), ('refs/heads/main', commit)]
+    refs += [('refs/remotes/origin/{}'.format(branch), 'ref: refs/remotes/origin/main' if branch == 'HEAD' else commit) for branch in remote_branches]
+    refs += [('refs/tags/{}'.format(tag), commit) for tag in tags]
+    refs.sort(key=lambda ref: ref[0].encode('utf-8'))
+    os.makedirs(os.path.join(repository_directory, 'reftable'))
+    write_reftable(os.path.join(repository_directory, 'reftable', '0x000000000001-0x000000000001-00000000.ref'), refs, block_size)
+    with open(os.path.join(repository_directory, 'reftable', 'tables.list'), 'w') as writer:
+        writer.write('0x000000000001-0x000000000001-00000000.ref\n')
+    with open(os.path.join(repository_directory, 'HEAD'), 'w') as writer:
+        writer.write('ref: refs/heads/.invalid\n')
+    return {'tags': len(tags), 'remote_branches': len(remote_branches)}
+
+
+def measure(function, repeat:int=3):
+    """Times a function and measures its peak memory.
+
+    Args:
+        function (callable): Function without arguments.
+        repeat (int, optional): Timed runs, the fastest is reported. Defaults to 3.
+
+    Returns:
+        tuple: (result, stage) where stage has seconds and peak_memory_bytes.
+    """
+    seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    tracemalloc.start()
+    try:
+        function()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {'seconds': seconds, 'peak_memory_bytes': peak_memory}
+
+
+def benchmark_repository(repository_directory:str, repeat:int=3):
+    """Times every stage of the version number calculation on a repository.
+
+    Args:
+        repository_directory (str): Path to the git repository.
+        repeat (int, optional): Timed runs per stage. Defaults to 3.
+
+    Returns:
+        stages (dict): seconds, peak_memory_bytes and items per stage.
+    """
+    stages = {}
+    def enumerate_refs():
+        session = get_version_number.RepositorySession(repository_directory)
+        session.load()
+        return session.tags, session.remote_branches
+    (tags, remote_branches), stages['ref_enumeration'] = measure(enumerate_refs, repeat)
+    stages['ref_enumeration']['items'] = len(tags) + len(remote_branches)
+    for backend in get_version_number.REF_BACKENDS:
+        if backend == 'pygit2' and importlib.util.find_spec('pygit2') is None:
+            continue
+        def enumerate_refs_with_backend():
+            session = get_version_number.RepositorySession(repository_directory, backend=backend)
+            session.load()
+            return len(session.tags) + len(session.remote_branches)
+        items, stages['ref_enumeration_' + backend] = measure(enumerate_refs_with_backend, repeat)
+        stages['ref_enumeration_' + backend]['items'] = items
+    filtered_tags, stages['filtering'] = measure(lambda: get_version_number.return_filtered_tag_list(tags), repeat)
+    stages['filtering']['items'] = len(filtered_tags)
+    _, stages['max'] = measure(lambda: get_version_number.return_highest_version_number_from_list(filtered_tags), repeat)
+    def match_branches():
+        release_branch_index = get_version_number.ReleaseBranchIndex(remote_branches)
+        return get_version_number.scan_version_tags(filtered_tags, release_branch_index)
+    maxima, stages['branch_matching'] = measure(match_branches, repeat)
+    stages['branch_matching']['items'] = len(maxima.maxima)
+    _, stages['index_build'] = measure(lambda: get_version_number.VersionIndex.from_tags(tags), repeat)
+    feature_branch = next((branch for branch in remote_branches if branch.startswith('feature/')), 'feature/benchmark')
+    release_branch = next((branch for branch in remote_branches if branch.startswith('release/')), 'release/1.0.0')
+    for name, branch in [('next_version_mainline', 'main'), ('next_version_release', release_branch), ('next_version_feature', feature_branch)]:
+        _, stages[name] = measure(lambda: get_version_number.return_next_version_number(tags, remote_branches, branch, '', 2, 0), repeat)
+    release_prefix = (get_version_number.REMOTE_BRANCH_REF_PREFIX + 'release/',)
+    items, stages['release_branch_seek'] = measure(lambda: len(list(get_version_number.iterate_refs_from_git_directory(repository_directory, release_prefix))), repeat)
+    stages['release_branch_seek']['items'] = items
+    items, stages['tag_prefix_seek'] = measure(lambda: len(list(get_version_number.iterate_tag_names_from_repository(repository_directory, tag_prefix='0.0.'))), repeat)
+    stages['tag_prefix_seek']['items'] = items
+    versions, stages['all_components'] = measure(lambda: get_version_number.return_component_next_versions(tags, remote_branches, ['main'], '', 2, 0), repeat)
+    stages['all_components']['items'] = len(versions)
+    cache_path = os.path.join(repository_directory, get_version_number.VERSION_INDEX_CACHE_FILENAME)
+    def load_cold_cache():
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+        return get_version_number.load_version_index(repository_directory)
+    _, stages['cache_cold'] = measure(load_cold_cache, repeat)
+    _, stages['cache_warm'] = measure(lambda: get_version_number.load_version_index(repository_directory), repeat)
+    return stages
+
+
+def benchmark_reftable_repository(repository_directory:str, repeat:int=3):
+    """Times the ref enumeration of a reftable repository, all refs and the release branches only.
+
+    Args:
+        repository_directory (str): Path to the git repository using reftable.
+        repeat (int, optional): Timed runs per stage. Defaults to 3.
+
+    Returns:
+        stages (dict): seconds, peak_memory_bytes and items per stage.
+    """
+    stages = {}
+    def enumerate_refs():
+        session = get_version_number.RepositorySession(repository_directory)
+        session.load()
+        return len(session.tags) + len(session.remote_branches)
+    items, stages['ref_enumeration_reftable'] = measure(enumerate_refs, repeat)
+    stages['ref_enumeration_reftable']['items'] = items
+    release_prefix = (get_version_number.REMOTE_BRANCH_REF_PREFIX + 'release/',)
+    items, stages['release_branch_seek_reftable'] = measure(lambda: len(list(get_version_number.iterate_refs_from_git_directory(repository_directory, release_prefix))), repeat)
+    stages['release_branch_seek_reftable']['items'] = items
+    return stages
+
+
+def return_code_revision():
+    """Returns the git commit of the benchmarked code, None outside of a git checkout."""
+    try:
+        return run_git(os.path.dirname(os.path.abspath(__file__)), 'rev-parse', 'HEAD').strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+def benchmark_repositories(sizes:list, repeat:int=3, work_directory:str=None):
+    """Creates synthetic repositories of several sizes and times every stage on them.
+
+    Args:
+        sizes (list): Number of tags per repository.
+        repeat (int, optional): Timed runs per stage. Defaults to 3.
+        work_directory (str, optional): Where the repositories are created. Defaults to a temporary directory.
+
+    Returns:
+        dict: Code revision, python version and the stage results per repository size.
+    """
+    report = {'benchmark': 'repositories', 'revision': return_code_revision(), 'python': platform.python_version(), 'results': []}
+    directory = tempfile.mkdtemp(prefix='benchmark_repositories_', dir=work_directory)
+    try:
+        for size in sizes:
+            repository_directory = os.path.join(directory, 'repository_{}'.format(size))
+            refs = create_synthetic_repository(repository_directory, size)
+            stages = benchmark_repository(repository_directory, repeat)
+            shutil.rmtree(repository_directory, ignore_errors=True)
+            create_synthetic_reftable_repository(repository_directory, size)
+            stages.update(benchmark_reftable_repository(repository_directory, repeat))
+            report['results'].append({'size': size, 'refs': refs, 'stages': stages})
+            shutil.rmtree(repository_directory, ignore_errors=True)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return report
+
+
+def benchmark_report(tag_count:int=1000000, repeat:int=1, work_directory:str=None):
+    """Times the tag history report on a synthetic repository, streaming the tags from packed-refs.
+
+    Args:
+        tag_count (int, optional): Number of tags. Defaults to 1000000.
+        repeat (int, optional): Timed runs, the fastest is reported. Defaults to 1.
+        work_directory (str, optional): Where the repository is created. Defaults to a temporary directory.
+
+    Returns:
+        dict: Code revision, seconds, peak memory and the report totals.
+    """
+    directory = tempfile.mkdtemp(prefix='benchmark_report_', dir=work_directory)
+    try:
+        repository_directory = os.path.join(directory, 'repository')
+        refs = create_synthetic_repository(repository_directory, tag_count)
+        def report_tag_history():
+            session = get_version_number.RepositorySession(repository_directory)
+            return get_version_number.return_tag_history_report(get_version_number.iterate_tag_names_from_repository(repository_directory), session.remote_branches)
+        history, stage = measure(report_tag_history, repeat)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return {'benchmark': 'report', 'revision': return_code_revision(), 'python': platform.python_version(), 'refs': refs,
+            'seconds': stage['seconds'], 'peak_memory_bytes': stage['peak_memory_bytes'], 'lines': len(history['lines']),
+            'gaps': history['gaps'], 'duplicates': history['duplicates'], 'collisions': len(history['collisions'])}
+
+
+def scan_version_tags_baseline(tags):
+    """The four digit version scan before version schemes, a pattern match followed by a split per tag.
+
+    Args:
+        tags (iterable): Tag names
+
+    Returns:
+        tuple: (highest version, highest version per major.minor.patch)
+    """
+    match = get_version_number.VERSION_NUMBER_PATTERN.match
+    maxima = {}
+    highest_version = None
+    for tag in tags:
+        if match(tag) is None:
+            continue
+        version_tuple = tuple(map(int, tag.split('.')))
+        if highest_version is None or version_tuple > highest_version:
+            highest_version = version_tuple
+        prefix = version_tuple[:3]
+        current = maxima.get(prefix)
+        if current is None or version_tuple > current:
+            maxima[prefix] = version_tuple
+    return highest_version, maxima
+
+
+def return_scheme_tags(tags:list, scheme):
+    """Rewrites four digit version tags into version numbers of a scheme, other tags are kept.
+
+    Args:
+        tags (list): Tag names from return_synthetic_refs
+        scheme (get_version_number.VersionScheme): Version scheme
+
+    Returns:
+        tags (list): Tag names with the same share of version numbers.
+    """
+    if scheme.digits == 4:
+        return tags
+    scheme_tags = []
+    for tag in tags:
+        version = get_version_number.DEFAULT_VERSION_SCHEME.parse(tag)
+        if version is None:
+            scheme_tags.append(tag)
+        elif scheme.calendar and version[0] != 0:
+            scheme_tags.append('{}.{}.{}'.format(2000 + version[0], version[1] % 12 + 1, version[3]))
+        else:
+            scheme_tags.append('{}.{}.{}'.format(version[0], version[1] + version[2], version[3]))
+    return scheme_tags
+
+
+def benchmark_schemes(tag_count:int=1000000, repeat:int=3, max_overhead:float=1.1):
+    """Times the version scan of every version scheme against the four digit scan before version schemes.
+
+    Args:
+        tag_count (int, optional): Number of tags. Defaults to 1000000.
+        repeat (int, optional): Timed runs per stage, the fastest is reported. Defaults to 3.
+        max_overhead (float, optional): Highest accepted time ratio of the four digit scheme against the baseline. Defaults to 1.1.
+
+    Returns:
+        dict: seconds and nanoseconds per tag of every stage, and whether the four digit scheme stayed within max_overhead.
+    """
+    tags, _ = return_synthetic_refs(tag_count)
+    stages = {}
+    _, stages['scan_baseline'] = measure(lambda: scan_version_tags_baseline(tags), repeat)
+    for name, scheme in get_version_number.VERSION_SCHEMES.items():
+        scheme_tags = return_scheme_tags(tags, scheme)
+        result, stages['scan_' + name] = measure(lambda: get_version_number.scan_version_tags(scheme_tags, scheme=scheme), repeat)
+        stages['scan_' + name]['items'] = result.count
+    for stage in stages.values():
+        stage['per_tag_ns'] = stage['seconds'] * 1e9 / len(tags)
+    overhead = stages['scan_' + get_version_number.DEFAULT_VERSION_SCHEME.name]['seconds'] / stages['scan_baseline']['seconds']
+    return {'benchmark': 'schemes', 'revision': return_code_revision(), 'python': platform.python_version(), 'tags': len(tags),
+            'stages': stages, 'overhead': overhead, 'passed': overhead <= max_overhead}
+
+
+def append_synthetic_history(repository_directory:str, branch:str, tag_format:str, first:int, count:int, orphan:bool=False):
+    """Appends commits to a branch with git fast-import, every commit gets a lightweight tag.
+
+    Args:
+        repository_directory (str): Path to the git repository.
+        branch (str): Branch to append to
+        tag_format (str): Tag name with {} for the commit number, example 1.0.0.{}
+        first (int): Number of the first new commit
+        count (int): Number of commits
+        orphan (bool, optional): Start the branch without a parent. Defaults to False.
+    """
+    stream = []
+    if orphan:
+        stream.append('reset refs/heads/{}\n'.format(branch))
+    elif first > 1:
+        stream.append('reset refs/heads/{0}\nfrom refs/heads/{0}^0\n'.format(branch))
+    for number in range(first, first + count):
+        stream.append('commit refs/heads/{}\nmark :{}\ncommitter benchmark <benchmark@localhost> {} +0000\ndata 0\n'.format(branch, number, 1700000000 + number))
+        stream.append('reset refs/tags/{}\nfrom :{}\n'.format(tag_format.format(number), number))
+    subprocess.run(['git', '-C', repository_directory, 'fast-import', '--quiet'], input=''.join(stream), text=True, check=True)
+
+
+def benchmark_reachability(tag_count:int=100000, sample:int=50, work_directory:str=None):
+    """Times reachability aware tag listing on a synthetic history against a merge-base per tag.
+
+    The main branch has one tagged commit per tag, an unrelated branch has higher tags that must not count.
+
+    Args:
+        tag_count (int, optional): Number of tagged commits on main. Defaults to 100000.
+        sample (int, optional): Tags timed with git merge-base to estimate the naive approach. Defaults to 50.
+        work_directory (str, optional): Where the repository is created. Defaults to a temporary directory.
+
+    Returns:
+        dict: Seconds per stage, passed is False when the reachable tags are wrong.
+    """
+    directory = tempfile.mkdtemp(prefix='benchmark_reachability_', dir=work_directory)
+    stages = {}
+    try:
+        repository_directory = os.path.join(directory, 'repository')
+        run_git(directory, 'init', '-q', repository_directory)
+        run_git(repository_directory, 'symbolic-ref', 'HEAD', 'refs/heads/main')
+        append_synthetic_history(repository_directory, 'main', '1.0.0.{}', 1, tag_count)
+        append_synthetic_history(repository_directory, 'unrelated', '9.0.0.{}', tag_count + 1, 100, orphan=True)
+        run_git(repository_directory, 'pack-refs', '--all')
+        start = time.perf_counter()
+        for number in range(1, tag_count + 1, max(1, tag_count // sample)):
+            subprocess.run(['git', '-C', repository_directory, 'merge-base', '--is-ancestor', '1.0.0.{}'.format(number), 'main'], check=True)
+        stages['naive_merge_base_per_tag'] = (time.perf_counter() - start) / len(range(1, tag_count + 1, max(1, tag_count // sample)))
+        stages['naive_merge_base_estimate'] = stages['naive_merge_base_per_tag'] * (tag_count + 100)
+        def reachable_tags():
+            start = time.perf_counter()
+            tags = get_version_number.get_reachable_tags(repository_directory, 'main')
+            return tags, time.perf_counter() - start
+        tags, stages['cold'] = reachable_tags()
+        passed = len(tags) == tag_count and '9.0.0.{}'.format(tag_count + 1) not in tags
+        run_git(repository_directory, 'commit-graph', 'write', '--reachable')
+        os.remove(os.path.join(repository_directory, '.git', get_version_number.REACHABILITY_CACHE_FILENAME))
+        _, stages['cold_commit_graph'] = reachable_tags()
+        _, stages['warm'] = reachable_tags()
+        append_synthetic_history(repository_directory, 'main', '1.0.0.{}', tag_count + 101, 10)
+        tags, stages['incremental_10_commits'] = reachable_tags()
+        passed = passed and len(tags) == tag_count + 10
+        start = time.perf_counter()
+        subprocess.run([sys.executable, get_version_number.__file__, '-d', repository_directory, '-b', 'main', '--reachable'], check=True, capture_output=True)
+        stages['command_line_warm'] = time.perf_counter() - start
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return {'benchmark': 'reachability', 'revision': return_code_revision(), 'python': platform.python_version(), 'tags': tag_count,
+            'seconds': stages, 'passed': passed}
+
+
+def compare_reports(baseline:dict, current:dict, threshold:float=1.25):
+    """Compares the stage times of two repositories reports.
+
+    Args:
+        baseline (dict): Report from benchmark_repositories for the baseline commit.
+        current (dict): Report from benchmark_repositories for the current commit.
+        threshold (float, optional): Slowdown ratio treated as a regression. Defaults to 1.25.
+
+    Returns:
+        dict: Time ratio per size and stage, and the regressions above the threshold.
+    """
+    baseline_results = {result['size']: result['stages'] for result in baseline['results']}
+    comparison = {'benchmark': 'compare', 'baseline': baseline.get('revision'), 'current': current.get('revision'), 'ratios': {}, 'regressions': []}
+    for result in current['results']:
+        if result['size'] not in baseline_results:
+            continue
+        ratios = {}
+        for stage, measurement in result['stages'].items():
+            baseline_stage = baseline_results[result['size']].get(stage)
+            if not baseline_stage or not baseline_stage['seconds']:
+                continue
+            ratios[stage] = measurement['seconds'] / baseline_stage['seconds']
+            if ratios[stage] > threshold:
+                comparison['regressions'].append({'size': result['size'], 'stage': stage, 'ratio': ratios[stage]})
+        comparison['ratios'][str(result['size'])] = ratios
+    comparison['passed'] = not comparison['regressions']
+    return comparison
+
+
+def parse_arguments(args):
+    argparser = argparse.ArgumentParser(description='Benchmarks for get_version_number.py')
+    benchmarks = argparser.add_subparsers(dest='benchmark', required=True)
+    reservations = benchmarks.add_parser('reservations', help='Parallel version number reservations.')
+    reservations.add_argument('--concurrency', help='Number of parallel reservations.', type=int, default=50)
+    startup = benchmarks.add_parser('startup', help='Cold start and import time of the command line.')
+    startup.add_argument('--runs', help='Runs per branch.', type=int, default=10)
+    startup.add_argument('--max-import-ms', help='Fail when the developer branch imports take longer.', type=float)
+    repositories = benchmarks.add_parser('repositories', help='Every stage on synthetic repositories of several sizes.')
+    repositories.add_argument('--sizes', help='Number of tags per repository.', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    repositories.add_argument('--repeat', help='Timed runs per stage, the fastest is reported.', type=int, default=3)
+    repositories.add_argument('--work-directory', help='Where the synthetic repositories are created.')
+    report = benchmarks.add_parser('report', help='Tag history report on a synthetic repository.')
+    report.add_argument('--tags', help='Number of tags.', type=int, default=1000000)
+    report.add_argument('--repeat', help='Timed runs, the fastest is reported.', type=int, default=1)
+    report.add_argument('--work-directory', help='Where the synthetic repository is created.')
+    reachability = benchmarks.add_parser('reachability', help='Reachability aware tag listing against a merge-base per tag.')
+    reachability.add_argument('--tags', help='Number of tagged commits.', type=int, default=100000)
+    reachability.add_argument('--work-directory', help='Where the synthetic repository is created.')
+    schemes = benchmarks.add_parser('schemes', help='Version scan of every version scheme against the four digit scan before version schemes.')
+    schemes.add_argument('--tags', help='Number of tags.', type=int, default=1000000)
+    schemes.add_argument('--repeat', help='Timed runs per stage, the fastest is reported.', type=int, default=3)
+    schemes.add_argument('--max-overhead', help='Fail when the four digit scheme is slower than the baseline by more than this ratio.', type=float, default=1.1)
+    compare = benchmarks.add_parser('compare', help='Compare two repositories reports.')
+    compare.add_argument('baseline', help='Report of the baseline commit.')
+    compare.add_argument('current', help='Report of the current commit.')
+    compare.add_argument('--threshold', help='Slowdown ratio treated as a regression.', type=float, default=1.25)
+    argparser.add_argument('-o', '--output', help='Write the json report to this file instead of stdout.')
+    return argparser.parse_args(args)
+
+
+def main():
+    arguments = parse_arguments(sys.argv[1:])
+    if arguments.benchmark == 'reservations':
+        report = benchmark_reservations(arguments.concurrency)
+    elif arguments.benchmark == 'startup':
+        report = benchmark_startup(arguments.runs, arguments.max_import_ms)
+    elif arguments.benchmark == 'repositories':
+        report = benchmark_repositories(arguments.sizes, arguments.repeat, arguments.work_directory)
+    elif arguments.benchmark == 'report':
+        report = benchmark_report(arguments.tags, arguments.repeat, arguments.work_directory)
+    elif arguments.benchmark == 'reachability':
+        report = benchmark_reachability(arguments.tags, work_directory=arguments.work_directory)
+    elif arguments.benchmark == 'schemes':
+        report = benchmark_schemes(arguments.tags, arguments.repeat, arguments.max_overhead)
+    elif arguments.benchmark == 'compare':
+        with open(arguments.baseline) as reader:
+            baseline = json.load(reader)
+        with open(arguments.current) as reader:
+            current = json.load(reader)
+        report = compare_reports(baseline, current, arguments.threshold)
+    if arguments.output:
+        with open(arguments.output, 'w') as writer:
+            json.dump(report, writer, indent=2)
+    else:
+        print (json.dumps(report, indent=2))
+    if not report.get('passed', True):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
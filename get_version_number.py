@@ -40,15 +40,196 @@ Is expected to end up as a TAG in the repository, this script so far does to any
 """
 import os
 import re
-import git
 import sys
 import argparse
+import bisect
+import heapq
+import time
+import contextlib
+import functools
+import json
 
-from packaging import version
 import hashlib
 
 DEFAULT_MAJOR_MINOR_PATCH = '0.1.0'
+MAINLINE_BRANCHES = ['main', 'develop', 'master']
+VERSION_NUMBER_PATTERN = re.compile(r'^[0-9]+\.[0-9]+\.[0-9]+\.[0-9]+$')
+TAG_REF_PREFIX = 'refs/tags/'
+REMOTE_BRANCH_REF_PREFIX = 'refs/remotes/origin/'
+TAG_COMPONENT_PATTERN = re.compile(r'^(?:.*/)?[^/0-9]*')
+AS_OF_DATE_PATTERN = re.compile(r'^[0-9]{4}-[0-9]{2}-[0-9]{2}')
+RELEASE_PREFIX_LENGTH = 3
+VERSION_INDEX_CACHE_FILENAME = 'version_index.json'
+VERSION_INDEX_COMPONENT_CACHE_FILENAME = 'version_index.{}.json'
+VERSION_INDEX_CACHE_FORMAT = 1
+TAG_DATE_INDEX_CACHE_FILENAME = 'tag_dates.json'
+TAG_DATE_INDEX_CACHE_FORMAT = 2
+REACHABILITY_CACHE_FILENAME = 'tag_reachability.json'
+TAG_PATTERN_LIMIT = 1000
+RESERVATION_JOURNAL_FILENAME = 'version_reservations'
+RESERVATION_EXPIRY_SECONDS = 24 * 60 * 60
+REF_BACKENDS = ('files', 'pygit2', 'gitpython')
+REPORT_MAX_BUILD_NUMBER = 1 << 20
+REFTABLE_TABLES_LIST = os.path.join('reftable', 'tables.list')
+PACKED_REFS_CHUNK_SIZE = 1 << 20
+PROFILE_ENVIRONMENT_VARIABLE = 'GET_VERSION_NUMBER_PROFILE'
+PROFILE_DISABLED_VALUES = ('', '0', 'false', 'no', 'off')
+PROFILE_STDERR_VALUES = ('-', 'stderr', '1', 'true', 'yes', 'on')
+
+class Profiler:
+    """Records the wall time and item counts of each phase, enabled by --profile or GET_VERSION_NUMBER_PROFILE."""
+
+    def __init__(self):
+        self.phases = []
+        self.start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def phase(self, name:str):
+        """Times the phase, counts can be added to the yielded dict.
+
+        Args:
+            name (str): Name of the phase
+
+        Yields:
+            dict: The phase record.
+        """
+        record = {'phase': name}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            self.phases.append(record)
+
+    def report(self):
+        """Returns the recorded phases.
+
+        Returns:
+            dict: The phases in the order they finished and the total wall time.
+        """
+        return {'phases': self.phases, 'total_seconds': time.perf_counter() - self.start}
+
+    def write(self, destination:str):
+        """Writes the report as json.
+
+        Args:
+            destination (str): Path of the json file, -, stderr, 1, true, yes or on writes to stderr.
+        """
+        report = json.dumps(self.report(), indent=2)
+        if destination.lower() in PROFILE_STDERR_VALUES:
+            sys.stderr.write(report + '\n')
+        else:
+            with open(destination, 'w') as writer:
+                writer.write(report + '\n')
+
+
+class NullProfiler:
+    """Profiler used when profiling is disabled, every phase is the same no-op context manager."""
+
+    def __init__(self):
+        self.record = {}
+        self.context = contextlib.nullcontext(self.record)
+
+    def phase(self, name:str):
+        """Returns a context manager that records nothing."""
+        return self.context
+
+
+NULL_PROFILER = NullProfiler()
+
 
+class VersionScheme:
+    """How version number tags are parsed, compared and bumped.
+
+    The pattern has one group per digit, so a tag is matched and parsed by a single regex call and the
+    tuple of integers is its comparable key. The last digit is the build number, the digits before it
+    are the version line a release branch owns, major.minor.patch in the four digit scheme.
+
+    Args:
+        name (str): Name of the scheme, used by --scheme and stored in the caches.
+        pattern (str): Regex matching a version number tag, with one group per digit.
+        digits (int): Number of digits in a version number.
+        first_build (int, optional): Last digit of the first version of a line. Defaults to 1.
+        default_line (str, optional): Line of the first mainline version. Defaults to DEFAULT_MAJOR_MINOR_PATCH.
+        calendar (bool, optional): The line is year.month, mainline moves to the current month when it is behind. Defaults to False.
+    """
+
+    def __init__(self, name:str, pattern:str, digits:int, first_build:int=1, default_line:str=DEFAULT_MAJOR_MINOR_PATCH, calendar:bool=False):
+        self.name = name
+        self.pattern = re.compile(pattern)
+        self.digits = digits
+        self.line_length = digits - 1
+        self.first_build = first_build
+        self.default_line = default_line
+        self.calendar = calendar
+
+    def parse(self, tag:str):
+        """Returns the version tuple of a tag.
+
+        Args:
+            tag (str): Tag name
+
+        Returns:
+            tuple: The version tuple, None if the tag is not a version number of this scheme.
+        """
+        found = self.pattern.match(tag)
+        if found is None:
+            return None
+        return tuple(map(int, found.groups()))
+
+    def line_floor(self, major_minor_patch:str):
+        """Returns the lowest line the next mainline version may use.
+
+        Args:
+            major_minor_patch (str): Expectation for highest starting line, empty for none.
+
+        Returns:
+            tuple: The line, None if there is no lower bound.
+        """
+        line = return_version_tuple(major_minor_patch) if major_minor_patch else None
+        if self.calendar:
+            today = time.localtime()
+            line = max(line or (), (today.tm_year, today.tm_mon))
+        return line
+
+    def bump(self, version:tuple, position:int):
+        """Returns the first version of the next line, when the highest version is owned by a release branch.
+
+        Args:
+            version (tuple): Highest version tuple
+            position (int): Which digit to increment
+
+        Returns:
+            tuple: The bumped version tuple, with calendar lines the next valid month (or year for position 1) or the current month, whichever is later.
+        """
+        if not self.calendar:
+            return increment_version_digit_tuple(version, 1, position, self.first_build)
+        year, month = version[:2]
+        line = (year + 1, 1) if position <= 1 or month >= 12 else (year, month + 1)
+        today = time.localtime()
+        return max(line, (today.tm_year, today.tm_mon)) + (self.first_build,)
+
+    def feature_line(self, number:int):
+        """Returns the line of a feature branch, the branch number preceded by zeros, example (0, 0, 1234)."""
+        return (0,) * (self.line_length - 1) + (number,)
+
+    def developer_version(self, number:int, build_number):
+        """Returns the version number of a developer branch build, example 99.1234.0.5."""
+        return '.'.join(['99', str(number)] + ['0'] * (self.digits - 3) + [str(build_number)])
+
+
+VERSION_SCHEMES = {scheme.name: scheme for scheme in [
+    VersionScheme('four-digit', r'^([0-9]+)\.([0-9]+)\.([0-9]+)\.([0-9]+)$', 4),
+    VersionScheme('three-digit', r'^([0-9]+)\.([0-9]+)\.([0-9]+)$', 3, default_line='0.1'),
+    # Pre-releases are not release tags, build metadata does not change the version
+    VersionScheme('semver', r'^(0|[1-9][0-9]*)\.(0|[1-9][0-9]*)\.(0|[1-9][0-9]*)(?:\+[0-9A-Za-z.-]+)?$', 3, first_build=0, default_line='0.1'),
+    # year.month.micro, feature (0.<number>) and developer (99.<number>) lines included
+    VersionScheme('calver', r'^([0-9]{4}|0|99)\.([0-9]+)\.([0-9]+)$', 3, first_build=0, default_line='', calendar=True),
+]}
+DEFAULT_VERSION_SCHEME = VERSION_SCHEMES['four-digit']
+
+
+@functools.lru_cache(maxsize=65536)
 def hash_text_to_8_digits(branch_name:str, length:int=8):
     """Returns an length specified hash of a branch name using numbers only
 
@@ -61,35 +242,758 @@ def hash_text_to_8_digits(branch_name:str, length:int=8):
     """
     return int(hashlib.sha1(branch_name.encode("utf-8")).hexdigest(), 16) % (10 ** length)
 
-def get_tags_as_list_from_repository(repository_directory:str):
-    """Returns a list of tags in the repository
+def return_branch_category(branch:str):
+    """Returns how the version number of a branch is calculated.
+
+    Args:
+        branch (str): Branch name
+
+    Returns:
+        str: mainline, release, feature or developer. Only developer branches do not need the repository.
+    """
+    if branch in MAINLINE_BRANCHES:
+        return 'mainline'
+    if branch.startswith('release/'):
+        return 'release'
+    if branch.startswith('feature/'):
+        return 'feature'
+    return 'developer'
+
+def return_branch_number_table(branches, length:int=8):
+    """Returns the unique number of every feature and developer branch.
+
+    Args:
+        branches (iterable): Branch names
+        length (int, optional): Length of unique numbers. Defaults to 8.
+
+    Returns:
+        table (dict): Branch name to its number, mainline and release branches are left out.
+    """
+    table = {}
+    for branch in branches:
+        if return_branch_category(branch) in ('feature', 'developer'):
+            table[branch] = hash_text_to_8_digits(branch, length)
+    return table
+
+def return_branch_number_collisions(table:dict):
+    """Returns the branches sharing a version space, same category and same number.
+
+    Args:
+        table (dict): Branch name to number, see return_branch_number_table
+
+    Returns:
+        collisions (list): dicts with category, number and the sorted branches sharing it.
+    """
+    spaces = {}
+    for branch, number in table.items():
+        spaces.setdefault((return_branch_category(branch), number), []).append(branch)
+    return [{'category': category, 'number': number, 'branches': sorted(branches)} for (category, number), branches in sorted(spaces.items()) if len(branches) > 1]
+
+def return_current_branch_number_collisions(branches, current_branches:list, length:int=8):
+    """Returns the collisions of the feature and developer branches being versioned with the other branches.
+
+    Mainline and release branches have no number, so nothing is hashed for them, and the other branches
+    are only hashed when they are in the category of a current branch.
+
+    Args:
+        branches (iterable): Other branch names, example the remote branches
+        current_branches (list): Branches being versioned
+        length (int, optional): Length of unique numbers. Defaults to 8.
+
+    Returns:
+        collisions (list): dicts with category, number and the sorted branches sharing it, see return_branch_number_collisions.
+    """
+    table = return_branch_number_table(current_branches, length)
+    if not table:
+        return []
+    spaces = {(return_branch_category(branch), number) for branch, number in table.items()}
+    categories = {category for category, _ in spaces}
+    for branch in branches:
+        if branch in table:
+            continue
+        category = return_branch_category(branch)
+        if category in categories:
+            number = hash_text_to_8_digits(branch, length)
+            if (category, number) in spaces:
+                table[branch] = number
+    return return_branch_number_collisions(table)
+
+def return_git_directory(repository_directory:str):
+    """Returns the git directory when the refs can be read directly from disk.
+
+    Plain clones (.git directory) and bare repositories are supported, worktrees, submodules
+    (.git file) and repositories using a commondir return None so callers can fall back to GitPython.
 
     Args:
         repository_directory (str): Path to the git repository.
 
     Returns:
-        tags (list): A list of tags for a repository.
+        str: Path to the git directory, None if the layout is not supported.
+    """
+    git_directory = os.path.join(repository_directory, '.git')
+    if not os.path.isdir(git_directory):
+        if os.path.exists(git_directory):
+            return None
+        if not os.path.isfile(os.path.join(repository_directory, 'HEAD')) or not os.path.isdir(os.path.join(repository_directory, 'refs')):
+            return None
+        git_directory = repository_directory
+    if os.path.exists(os.path.join(git_directory, 'commondir')):
+        return None
+    return git_directory
+
+def return_disjoint_prefixes(prefixes:tuple):
+    """Returns the ref name prefixes as sorted bytes, without the prefixes inside another one.
+
+    Args:
+        prefixes (tuple): Ref name prefixes, example ('refs/tags/', 'refs/tags/v')
+
+    Returns:
+        byte_prefixes (list): Sorted prefixes, example [b'refs/tags/']
+    """
+    byte_prefixes = sorted(prefix.encode('utf-8') for prefix in prefixes)
+    # A prefix inside another one would yield the refs twice
+    return [prefix for index, prefix in enumerate(byte_prefixes) if not any(prefix.startswith(other) for other in byte_prefixes[:index])]
+
+def return_next_packed_ref_record(data, position:int, end:int):
+    """Returns the start of the first packed-refs record after the position, peeled (^) lines belong to the record before them.
+
+    Args:
+        data (mmap): packed-refs data
+        position (int): Position inside a record
+        end (int): Position to stop searching at.
+
+    Returns:
+        int: Start of the next record, end if there is none.
+    """
+    while True:
+        position = data.find(b'\n', position, end)
+        if position < 0:
+            return end
+        position += 1
+        if data[position:position + 1] != b'^':
+            return position
+
+def seek_packed_refs(data, name:bytes, start:int, end:int):
+    """Returns the start of the first record in sorted packed-refs whose ref name is not below the name.
+
+    Args:
+        data (mmap): packed-refs data
+        name (bytes): Ref name or prefix to seek to
+        start (int): Start of the first record to search.
+        end (int): Start of the record after the last one to search.
+
+    Returns:
+        int: Start of the record, end if every ref name is below the name.
+    """
+    low, high = start, end
+    while low < high:
+        middle = (low + high) // 2
+        record = max(data.rfind(b'\n', low, middle) + 1, low)
+        while record > low and data[record:record + 1] == b'^':
+            record = max(data.rfind(b'\n', low, record - 1) + 1, low)
+        record_end = data.find(b'\n', record, high)
+        if data[record:record_end if record_end >= 0 else high].partition(b' ')[2].rstrip(b'\r') < name:
+            low = return_next_packed_ref_record(data, record, high)
+        else:
+            high = record
+    return low
+
+def iterate_packed_refs(git_directory:str, prefixes:tuple):
+    """Yields the ref names in packed-refs starting with one of the prefixes.
+
+    packed-refs written by git is sorted, so the refs of every prefix are found with a binary search
+    and only they are read, in chunks. Files without the sorted trait (older git and other tools) are
+    scanned and their matching refs sorted, so the refs are always yielded in sorted order.
+
+    Args:
+        git_directory (str): Path to the git directory.
+        prefixes (tuple): Ref name prefixes to include, example ('refs/tags/',)
+
+    Yields:
+        str: Full ref name in sorted order, example refs/tags/1.0.0.1
+    """
+    import mmap
+    try:
+        packed_refs = open(os.path.join(git_directory, 'packed-refs'), 'rb')
+    except FileNotFoundError:
+        return
+    with packed_refs:
+        if os.fstat(packed_refs.fileno()).st_size == 0:
+            return
+        data = mmap.mmap(packed_refs.fileno(), 0, access=mmap.ACCESS_READ)
+    with data:
+        start = 0
+        if data[:1] == b'#':
+            start = return_next_packed_ref_record(data, 0, len(data))
+        byte_prefixes = return_disjoint_prefixes(prefixes)
+        sorted_refs = b'sorted' in data[:start].split()
+        ranges = [(start, len(data))]
+        if sorted_refs:
+            ranges = []
+            for prefix in byte_prefixes:
+                low = seek_packed_refs(data, prefix, start, len(data))
+                high = len(data)
+                if prefix and prefix[-1] < 0xff:
+                    high = seek_packed_refs(data, prefix[:-1] + bytes([prefix[-1] + 1]), low, high)
+                ranges.append((low, high))
+        byte_prefixes = tuple(byte_prefixes)
+        unsorted_names = []
+        for low, high in ranges:
+            while low < high:
+                chunk_end = min(low + PACKED_REFS_CHUNK_SIZE, high)
+                if chunk_end < high:
+                    chunk_end = data.find(b'\n', chunk_end - 1, high) + 1 or high
+                for line in data[low:chunk_end].splitlines():
+                    if line[:1] == b'^':
+                        continue
+                    name = line.partition(b' ')[2]
+                    if sorted_refs:
+                        yield name.decode('utf-8')
+                    elif name.startswith(byte_prefixes):
+                        unsorted_names.append(name)
+                low = chunk_end
+        # Callers merge the packed refs with the sorted loose refs
+        for name in sorted(unsorted_names):
+            yield name.decode('utf-8')
+
+def return_loose_refs(git_directory:str, prefixes:tuple):
+    """Returns the sorted loose ref names starting with one of the prefixes.
+
+    Args:
+        git_directory (str): Path to the git directory.
+        prefixes (tuple): Ref name prefixes to include, example ('refs/tags/',)
+
+    Returns:
+        refs (list): Sorted full ref names.
+    """
+    refs = []
+    for prefix in prefixes:
+        directory_prefix, _, name_prefix = prefix.rpartition('/')
+        top_directory = os.path.join(git_directory, *directory_prefix.split('/'))
+        for directory, directories, files in os.walk(top_directory):
+            relative_directory = os.path.relpath(directory, git_directory).replace(os.sep, '/')
+            if name_prefix and directory == top_directory:
+                # Only the entries starting with the rest of the prefix, example v of refs/tags/v
+                directories[:] = [name for name in directories if name.startswith(name_prefix)]
+                files = [name for name in files if name.startswith(name_prefix)]
+            for file in files:
+                if file.endswith('.lock'):
+                    continue
+                refs.append('{}/{}'.format(relative_directory, file))
+    refs.sort()
+    return refs
+
+def read_reftable_varint(data, position:int):
+    """Returns a git varint (offset encoded, most significant group first) and the position after it.
+
+    Args:
+        data (bytes|mmap): Reftable data
+        position (int): Position of the varint
+
+    Returns:
+        tuple: (value, position)
+    """
+    byte = data[position]
+    value = byte & 0x7f
+    while byte & 0x80:
+        position += 1
+        byte = data[position]
+        value = ((value + 1) << 7) | (byte & 0x7f)
+    return value, position + 1
+
+class ReftableTable:
+    """A single reftable file, read through mmap so only the visited blocks are loaded.
+
+    Args:
+        path (str): Path to the .ref file.
+    """
+
+    def __init__(self, path:str):
+        import mmap
+        with open(path, 'rb') as reader:
+            self.data = mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self.data
+        if data[:4] != b'REFT':
+            raise ValueError('{} is not a reftable'.format(path))
+        version = data[4]
+        self.block_size = int.from_bytes(data[5:8], 'big')
+        self.header_size = 24 if version == 1 else 28
+        self.hash_size = 32 if version == 2 and data[24:28] == b's256' else 20
+        footer = len(data) - (68 if version == 1 else 72)
+        positions = [int.from_bytes(data[footer + self.header_size + offset:footer + self.header_size + offset + 8], 'big') for offset in range(0, 40, 8)]
+        positions[1] >>= 5
+        # Ref blocks come first, followed by the ref index, obj and log sections, or the footer
+        self.ref_end = min([position for position in positions if position] or [footer])
+        # Padded blocks start at multiples of the block size and can be binary searched
+        first_block_end = self.block_end(0) if self.is_ref_block(0) else 0
+        self.aligned = self.block_size > 0 and (first_block_end >= min(self.block_size, self.ref_end) or data[first_block_end] == 0)
+
+    def block_header(self, block_start:int):
+        """Returns the position of the block type byte, the first block starts after the file header."""
+        return block_start + (self.header_size if block_start == 0 else 0)
+
+    def block_end(self, block_start:int):
+        """Returns the end of the records and restart points of the block starting at block_start."""
+        header = self.block_header(block_start)
+        return block_start + int.from_bytes(self.data[header + 1:header + 4], 'big')
+
+    def is_ref_block(self, block_start:int):
+        """Returns True when a ref block starts at block_start."""
+        header = self.block_header(block_start)
+        return header < self.ref_end and self.data[header] == ord('r')
+
+    def next_block(self, block_start:int):
+        """Returns the start of the block following the one at block_start, skipping the padding."""
+        block_end = self.block_end(block_start)
+        if self.aligned or (block_end < self.ref_end and self.data[block_end] == 0):
+            return (block_start // self.block_size + 1) * self.block_size
+        return block_end
+
+    def restart_key(self, position:int):
+        """Returns the full ref name of the record at a restart point, which is stored without prefix compression."""
+        _, position = read_reftable_varint(self.data, position)
+        suffix_and_type, position = read_reftable_varint(self.data, position)
+        return self.data[position:position + (suffix_and_type >> 3)]
+
+    def iterate_block(self, block_start:int, seek:bytes=b''):
+        """Yields (name, value_type) of the records in a block, starting at the last restart point before seek.
+
+        Args:
+            block_start (int): Position of the block
+            seek (bytes, optional): Ref name to start from, the restart points are binary searched. Defaults to b''.
+
+        Yields:
+            tuple: (name, value_type), name as bytes
+        """
+        data = self.data
+        block_end = self.block_end(block_start)
+        restart_count = int.from_bytes(data[block_end - 2:block_end], 'big')
+        records_end = block_end - 2 - 3 * restart_count
+        position = self.block_header(block_start) + 4
+        if seek:
+            restarts = [block_start + int.from_bytes(data[records_end + 3 * index:records_end + 3 * index + 3], 'big') for index in range(restart_count)]
+            low, high = 0, len(restarts)
+            while low < high:
+                middle = (low + high) // 2
+                if self.restart_key(restarts[middle]) <= seek:
+                    low = middle + 1
+                else:
+                    high = middle
+            if low:
+                position = restarts[low - 1]
+        # Records are decoded from a copy of the block, the varints are almost always a single byte
+        block = data[block_start:records_end]
+        position -= block_start
+        records_end -= block_start
+        value_sizes = (0, self.hash_size, 2 * self.hash_size)
+        name = b''
+        while position < records_end:
+            prefix_length = block[position]
+            if prefix_length < 0x80:
+                position += 1
+            else:
+                prefix_length, position = read_reftable_varint(block, position)
+            suffix_and_type = block[position]
+            if suffix_and_type < 0x80:
+                position += 1
+            else:
+                suffix_and_type, position = read_reftable_varint(block, position)
+            suffix_end = position + (suffix_and_type >> 3)
+            name = name[:prefix_length] + block[position:suffix_end]
+            position = suffix_end
+            if block[position] < 0x80:
+                position += 1
+            else:
+                _, position = read_reftable_varint(block, position)
+            value_type = suffix_and_type & 0x7
+            if value_type == 3:
+                target_length, position = read_reftable_varint(block, position)
+                position += target_length
+            else:
+                position += value_sizes[value_type]
+            yield name, value_type
+
+    def seek_block(self, seek:bytes):
+        """Returns the start of the ref block that would contain seek, binary searching aligned blocks."""
+        if not self.aligned:
+            return 0
+        low, high = 0, (self.ref_end + self.block_size - 1) // self.block_size
+        while low < high:
+            middle = (low + high) // 2
+            if self.is_ref_block(middle * self.block_size) and self.restart_key(self.block_header(middle * self.block_size) + 4) <= seek:
+                low = middle + 1
+            else:
+                high = middle
+        return max(low - 1, 0) * self.block_size
+
+    def iterate_refs(self, prefix:bytes):
+        """Yields (name, value_type) of the records starting with prefix, in sorted order.
+
+        Args:
+            prefix (bytes): Ref name prefix, example b'refs/tags/'
+
+        Yields:
+            tuple: (name, value_type), name as bytes
+        """
+        block_start = self.seek_block(prefix)
+        seek = prefix
+        while self.is_ref_block(block_start):
+            for name, value_type in self.iterate_block(block_start, seek):
+                if name.startswith(prefix):
+                    yield name, value_type
+                elif name > prefix:
+                    return
+            seek = b''
+            block_start = self.next_block(block_start)
+
+def iterate_reftable_refs(git_directory:str, prefixes:tuple):
+    """Yields the ref names starting with one of the prefixes from a reftable repository.
+
+    Every table in the stack is sought to the prefixes instead of being scanned, the newest table wins
+    when several tables hold the same ref, and deleted refs are skipped.
+
+    Args:
+        git_directory (str): Path to the git directory.
+        prefixes (tuple): Ref name prefixes to include, example ('refs/tags/',)
+
+    Yields:
+        str: Full ref name in sorted order.
+    """
+    with open(os.path.join(git_directory, REFTABLE_TABLES_LIST)) as reader:
+        tables = [ReftableTable(os.path.join(git_directory, 'reftable', name)) for name in reader.read().split()]
+    byte_prefixes = return_disjoint_prefixes(prefixes)
+    def iterate_table(age, table):
+        for prefix in byte_prefixes:
+            for name, value_type in table.iterate_refs(prefix):
+                yield name, -age, value_type
+    if len(tables) == 1:
+        # A compacted stack needs no merge, a single table holds every ref once
+        for prefix in byte_prefixes:
+            for name, value_type in tables[0].iterate_refs(prefix):
+                if value_type != 0:
+                    yield name.decode('utf-8')
+        return
+    previous = None
+    for name, _, value_type in heapq.merge(*(iterate_table(age, table) for age, table in enumerate(tables))):
+        if name != previous and value_type != 0:
+            yield name.decode('utf-8')
+        previous = name
+
+def iterate_refs_from_git_directory(git_directory:str, prefixes:tuple):
+    """Yields the ref names starting with one of the prefixes, from both packed-refs and loose refs.
+
+    Both sources are sorted, so they are merged while streaming and a ref existing in both places is
+    yielded once. Only the loose refs are held in memory. Repositories using reftable are read with
+    iterate_reftable_refs instead.
+
+    Args:
+        git_directory (str): Path to the git directory.
+        prefixes (tuple): Ref name prefixes to include, example ('refs/tags/',)
+
+    Yields:
+        str: Full ref name in sorted order.
+    """
+    if os.path.isfile(os.path.join(git_directory, REFTABLE_TABLES_LIST)):
+        yield from iterate_reftable_refs(git_directory, prefixes)
+        return
+    previous = None
+    loose_refs = return_loose_refs(git_directory, prefixes)
+    for name in heapq.merge(iterate_packed_refs(git_directory, prefixes), loose_refs):
+        if name != previous:
+            yield name
+        previous = name
+
+def iterate_refs_with_pygit2(repository_directory:str, prefixes:tuple):
+    """Yields the ref names starting with one of the prefixes, listed by libgit2.
+
+    Args:
+        repository_directory (str): Path to the git repository.
+        prefixes (tuple): Ref name prefixes to include, example ('refs/tags/',)
+
+    Yields:
+        str: Full ref name, example refs/tags/1.0.0.1
+    """
+    import pygit2
+    for name in pygit2.Repository(repository_directory).references:
+        if name.startswith(prefixes):
+            yield name
+
+def iterate_refs_with_gitpython(repository_directory:str, prefixes:tuple):
+    """Yields the ref names starting with one of the prefixes, listed by GitPython.
+
+    Args:
+        repository_directory (str): Path to the git repository.
+        prefixes (tuple): Ref name prefixes to include, example ('refs/tags/',)
+
+    Yields:
+        str: Full ref name, example refs/tags/1.0.0.1
+    """
+    import git
+    for ref in git.Repo(repository_directory).refs:
+        if ref.path.startswith(prefixes):
+            yield ref.path
+
+def return_ref_backend(repository_directory:str, backend:str=None):
+    """Returns the backend listing the refs of the repository.
+
+    Without a choice, the refs are read from disk by the files backend, which is the fastest.
+    Layouts it cannot read (worktrees, submodules, commondir) use pygit2 when it is installed, GitPython otherwise.
+
+    Args:
+        repository_directory (str): Path to the git repository.
+        backend (str, optional): One of REF_BACKENDS. Defaults to None, automatic.
+
+    Returns:
+        str: One of REF_BACKENDS.
+    """
+    if backend is not None:
+        if backend not in REF_BACKENDS:
+            raise ValueError('Unknown ref backend {}, choose one of {}'.format(backend, ', '.join(REF_BACKENDS)))
+        return backend
+    if return_git_directory(repository_directory) is not None:
+        return 'files'
+    import importlib.util
+    if importlib.util.find_spec('pygit2') is not None:
+        return 'pygit2'
+    return 'gitpython'
+
+def iterate_refs_from_repository(repository_directory:str, prefixes:tuple, backend:str=None):
+    """Yields the ref names starting with one of the prefixes, using one of the ref backends.
+
+    Args:
+        repository_directory (str): Path to the git repository.
+        prefixes (tuple): Ref name prefixes to include, example ('refs/tags/',)
+        backend (str, optional): One of REF_BACKENDS. Defaults to None, see return_ref_backend.
+
+    Yields:
+        str: Full ref name, sorted for the files backend only.
+    """
+    backend = return_ref_backend(repository_directory, backend)
+    if backend == 'pygit2':
+        return iterate_refs_with_pygit2(repository_directory, prefixes)
+    if backend == 'gitpython':
+        return iterate_refs_with_gitpython(repository_directory, prefixes)
+    git_directory = return_git_directory(repository_directory)
+    if git_directory is None:
+        raise ValueError('The files ref backend cannot read the layout of {}, use pygit2 or gitpython'.format(repository_directory))
+    return iterate_refs_from_git_directory(git_directory, prefixes)
+
+def iterate_tag_names_from_repository(repository_directory:str, filtered:bool=False, backend:str=None, scheme:VersionScheme=DEFAULT_VERSION_SCHEME, tag_prefix:str=''):
+    """Yields the tag names in the repository without creating a git object per tag.
+
+    Args:
+        repository_directory (str): Path to the git repository.
+        filtered (bool, optional): Only yield tags matching the version number pattern. Defaults to False.
+        backend (str, optional): One of REF_BACKENDS. Defaults to None, see return_ref_backend.
+        scheme (VersionScheme, optional): Version scheme of the filtered tags. Defaults to DEFAULT_VERSION_SCHEME.
+        tag_prefix (str, optional): Only yield the tags starting with the prefix, without it. Defaults to '', every tag.
+
+    Yields:
+        str: Tag name, example 1.0.0.1
+    """
+    match = scheme.pattern.match
+    tag_ref_prefix = TAG_REF_PREFIX + tag_prefix
+    for ref in iterate_refs_from_repository(repository_directory, (tag_ref_prefix,), backend):
+        name = ref[len(tag_ref_prefix):]
+        if not filtered or match(name):
+            yield name
+
+def run_git_command(repository_directory:str, *args):
+    """Runs git in the repository and returns stdout.
+
+    Args:
+        repository_directory (str): Path to the git repository.
+        args (str): git arguments
+
+    Returns:
+        str: stdout of the git command.
+    """
+    import subprocess
+    return subprocess.run(['git', '-C', repository_directory] + list(args), check=True, capture_output=True, text=True).stdout
+
+def get_refs_from_remote(repository_directory:str, remote:str='origin'):
+    """Returns the tags and branches advertised by a remote, like git ls-remote, without fetching any objects.
+
+    Args:
+        repository_directory (str): Path to the git repository.
+        remote (str, optional): Remote name or url. Defaults to origin.
+
+    Returns:
+        tuple: (tags, branches) as sorted lists of names without the refs/tags/ and refs/heads/ prefixes.
     """
-    repo = git.Repo(repository_directory)
     tags = []
-    for tag in repo.tags:
-        tags.append(tag.name)
-    return tags
+    branches = []
+    for line in run_git_command(repository_directory, 'ls-remote', '--tags', '--heads', remote).splitlines():
+        ref = line.partition('\t')[2]
+        if ref.endswith('^{}'):
+            continue
+        if ref.startswith(TAG_REF_PREFIX):
+            tags.append(ref[len(TAG_REF_PREFIX):])
+        elif ref.startswith('refs/heads/'):
+            branches.append(ref[len('refs/heads/'):])
+    return tags, branches
+
+class RepositorySession:
+    """A repository opened once, sharing a single pass over the refs between tag and branch listing.
+
+    With a remote, the tags and branches are read from the ref advertisement of the remote instead,
+    so shallow and single branch clones see all of them without fetching.
+
+    With a tag prefix only the tags of that component are listed, without the prefix, and its release
+    branches release/<tag_prefix><version> are listed as release/<version>, see return_component_branches.
+
+    Args:
+        repository_directory (str): Path to the git repository.
+        remote (str, optional): Remote name or url to list the refs of. Defaults to None, the local refs.
+        backend (str, optional): One of REF_BACKENDS listing the local refs. Defaults to None, see return_ref_backend.
+        tag_prefix (str, optional): Tag prefix of a component, example service-a/ or v. Defaults to '', every tag.
+    """
+
+    def __init__(self, repository_directory:str, remote:str=None, backend:str=None, tag_prefix:str=''):
+        self.repository_directory = repository_directory
+        self.remote = remote
+        self.backend = backend
+        self.tag_prefix = tag_prefix
+        self.git_directory = return_git_directory(repository_directory)
+        self._repo = None
+        self._tags = None
+        self._remote_branches = None
+
+    @property
+    def repo(self):
+        """git.Repo: GitPython repository, only created when the refs cannot be read directly."""
+        if self._repo is None:
+            import git
+            self._repo = git.Repo(self.repository_directory)
+        return self._repo
+
+    @property
+    def tags(self):
+        """list: Tag names in the repository."""
+        if self._tags is None:
+            self.load(remote_branches=False)
+        return self._tags
+
+    @property
+    def remote_branches(self):
+        """list: Branch names on origin, without the origin/ prefix."""
+        if self._remote_branches is None:
+            self.load(tags=False)
+        return self._remote_branches
+
+    def load(self, tags:bool=True, remote_branches:bool=True):
+        """Reads tags and origin branches in one pass over the refs.
+
+        Args:
+            tags (bool, optional): Read the tags. Defaults to True.
+            remote_branches (bool, optional): Read the origin branches. Defaults to True.
+        """
+        tag_list = []
+        remote_branch_list = []
+        if self.remote is not None:
+            # One ls-remote round trip returns both, keep them
+            tag_list, remote_branch_list = get_refs_from_remote(self.repository_directory, self.remote)
+            tag_list = return_component_tags(tag_list, self.tag_prefix)
+            tags = remote_branches = True
+        else:
+            tag_ref_prefix = TAG_REF_PREFIX + self.tag_prefix
+            prefixes = tuple(prefix for prefix, wanted in ((REMOTE_BRANCH_REF_PREFIX, remote_branches), (tag_ref_prefix, tags)) if wanted)
+            for ref in iterate_refs_from_repository(self.repository_directory, prefixes, self.backend):
+                if ref.startswith(tag_ref_prefix):
+                    tag_list.append(ref[len(tag_ref_prefix):])
+                else:
+                    remote_branch_list.append(ref[len(REMOTE_BRANCH_REF_PREFIX):])
+        if self.tag_prefix:
+            remote_branch_list = return_component_branches(remote_branch_list, self.tag_prefix)
+        if tags:
+            self._tags = tag_list
+        if remote_branches:
+            self._remote_branches = remote_branch_list
+
+def get_tags_as_list_from_repository(repository_directory):
+    """Returns a list of tags in the repository
+
+    Args:
+        repository_directory (str|RepositorySession): Path to the git repository, or an open session.
 
-def return_filtered_tag_list(tags:list):
+    Returns:
+        tags (list): A list of tags for a repository.
+    """
+    if isinstance(repository_directory, RepositorySession):
+        return repository_directory.tags
+    return list(iterate_tag_names_from_repository(repository_directory))
+
+def return_filtered_tag_list(tags:list, scheme:VersionScheme=DEFAULT_VERSION_SCHEME):
     """Returns a list of tags matching the regex.
 
     Args:
         tags (list): A list of git tags
+        scheme (VersionScheme, optional): Version scheme of the tags. Defaults to DEFAULT_VERSION_SCHEME.
 
     Returns:
         tags (list): Without tags not matching the specified pattern.
     """
-    filtered_tag_list = []
-    for tag in tags:
-        if match_regex_to_version_number(tag, r'^[0-9]+\.[0-9]+\.[0-9]+\.[0-9]+$'):
-            filtered_tag_list.append(tag)
-    return filtered_tag_list
+    match = scheme.pattern.match
+    return [tag for tag in tags if match(tag)]
+
+def return_tag_component(tag:str):
+    """Returns the tag prefix of the component a tag belongs to.
+
+    Args:
+        tag (str): Tag name
+
+    Returns:
+        str: The directories and the characters before the first digit, service-a/ for service-a/1.2.3.4, v for v1.2.3.4 and '' for 1.2.3.4.
+    """
+    return TAG_COMPONENT_PATTERN.match(tag).group()
+
+def return_component_tags(tags, tag_prefix:str):
+    """Returns the tags of a component without the tag prefix.
+
+    Args:
+        tags (iterable): Tag names
+        tag_prefix (str): Tag prefix of the component, example service-a/
+
+    Returns:
+        tags (list): service-a/1.2.3.4 will result in 1.2.3.4, tags without the prefix are left out.
+    """
+    if not tag_prefix:
+        return list(tags)
+    return [tag[len(tag_prefix):] for tag in tags if tag.startswith(tag_prefix)]
+
+def return_component_branch(branch:str, tag_prefix:str):
+    """Returns the branch as seen by a component, release/<tag_prefix><version> becomes release/<version>.
+
+    Args:
+        branch (str): Branch name
+        tag_prefix (str): Tag prefix of the component, example service-a/
+
+    Returns:
+        str: The branch, None for a release branch of another component.
+    """
+    if not branch.startswith('release/'):
+        return branch
+    release = branch[len('release/'):]
+    if return_tag_component(release) != tag_prefix:
+        return None
+    return 'release/' + release[len(tag_prefix):]
+
+def return_component_branches(branches:list, tag_prefix:str):
+    """Returns the branches as seen by a component, see return_component_branch.
+
+    Args:
+        branches (list): List of branches
+        tag_prefix (str): Tag prefix of the component, example service-a/
+
+    Returns:
+        branches (list): The branches, without the release branches of other components.
+    """
+    component_branches = []
+    for branch in branches:
+        component_branch = return_component_branch(branch, tag_prefix)
+        if component_branch is not None:
+            component_branches.append(component_branch)
+    return component_branches
 
 def match_regex_to_version_number(version:str, regex:str):
     """Returns True if the version number matches the regex.
@@ -106,20 +1010,18 @@ def match_regex_to_version_number(version:str, regex:str):
     return True
 
 
-def get_remote_branches_from_repository(repository_directory:str):
+def get_remote_branches_from_repository(repository_directory):
     """Returns a list of remote branches in the repository
 
     Args:
-        repository_directory (str): Path to the git repository.
+        repository_directory (str|RepositorySession): Path to the git repository, or an open session.
 
     Returns:
         remote_branches (list): returns a list of remote branches
     """
-    repo = git.Repo(repository_directory)
-    remote_branches = []
-    for branch in repo.remotes.origin.refs:
-        remote_branches.append(branch.name.replace('origin/', ''))
-    return remote_branches
+    if not isinstance(repository_directory, RepositorySession):
+        repository_directory = RepositorySession(repository_directory)
+    return repository_directory.remote_branches
 
 
 def return_version_variables(version:str):
@@ -134,205 +1036,1854 @@ def return_version_variables(version:str):
     return version.split('.')
 
 
-def return_highest_version_number_from_list(versions:list):
-    """Return the highest version number from a list of version numbers.
+def return_version_tuple(version:str):
+    """Return the version number as a tuple of integers.
 
     Args:
-        versions (list): List of versions to find the highest version number from
+        version (str): Version number
 
     Returns:
-        str: The highest version number
+        tuple: 4.5.6.7 will result in (4, 5, 6, 7)
     """
+    return tuple(map(int, version.split('.')))
 
-    for n, i in enumerate(versions):
-        versions[n] = version.parse(i)
-    return max(versions).__str__()
 
-
-def increment_last_digit_in_version(version:str, increment:int):
-    """Add a number to the last digit in a version number.
+def return_version_string(version:tuple):
+    """Return the version tuple as a version number.
 
     Args:
-        version (str):Version Number
-        increment (int): How much should we increment the version
+        version (tuple): Version tuple
 
     Returns:
-        str: New version number
+        str: (4, 5, 6, 7) will result in 4.5.6.7
     """
-    
-    version_list = return_version_variables(version)
-    version_list[-1] = str(int(version_list[-1]) + increment)
-    return '.'.join(version_list)
+    return '.'.join(map(str, version))
 
 
-def return_release_branches_from_branch_list(branches:list):
-    """Returns a list of release branches from a list of branches.
+def return_release_branch_version_prefix(branch:str):
+    """Return the version prefix owned by a release branch.
 
     Args:
-        branches (list): List of branchs
+        branch (str): Branch name, example release/4.7.0
 
     Returns:
-        branches (list): List of release branches
+        tuple: (4, 7, 0), None if the branch is not a numbered release branch.
     """
-    release_branches = []
-    for branch in branches:
-        if branch.startswith('release/'):
-            release_branches.append(branch)
-    return release_branches
+    if not branch.startswith('release/'):
+        return None
+    try:
+        return return_version_tuple(branch.replace('release/', ''))
+    except ValueError:
+        return None
 
 
-def is_highest_version_number_matching_release_branch(version:str, branches:list):
-    """Returns True if the highest version number is matching the release branch.
+def return_highest_version_number_from_list(versions:list, scheme:VersionScheme=None):
+    """Return the highest version number from a list of version numbers.
 
     Args:
-        version (str): Version number
-        branches (list): List of branches
+        versions (list): List of versions to find the highest version number from
+        scheme (VersionScheme, optional): Compare with the key of this scheme, the versions must match it. Defaults to None, any dotted numbers.
 
     Returns:
-        bool: True if the highest version number is matching a release branch.
+        str: The highest version number
     """
-    release_branches = return_release_branches_from_branch_list(branches)
-    for branch in release_branches:
-        if version.startswith(branch.replace('release/', '')):
-            return True
-    return False
+    return max(versions, key=scheme.parse if scheme is not None else return_version_tuple)
 
-def increment_version_digit(version:str, increment:int, position:int):
-    """Bump a digit in a version number.
-    Any number after the bumped digit will be reset to 0.
+
+def import_numpy():
+    """Returns the numpy module, None when it is not installed."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def parse_version_array(tags, use_numpy:bool=None):
+    """Parses the version number tags into rows of four integers in one pass, for bulk analysis of many tags.
 
     Args:
-        version (str): Version number
-        increment (int): How much to increment the digit
-        position (int): Which digit to increment
+        tags (iterable): Tag names, tags not matching the version number pattern are skipped.
+        use_numpy (bool, optional): Return a numpy array. Defaults to None, numpy when it is installed.
 
     Returns:
-        version_nuber (str): Returns a new version number with the correct increment.
-    """
-    version_list = return_version_variables(version)
-    version_list[position - 1] = str(int(version_list[position - 1]) + increment)
-    if len(version_list) == 4: # 4 digit version number
-        if position == 2:
-            version_list[-2] = '0'
-        if position == 1:
-            version_list[-3] = '0'
-            version_list[-2] = '0'
-    version_list[-1] = '1'
-    return '.'.join(version_list)
+        numpy.ndarray|list: An (N, 4) int64 array, or a list of version tuples without numpy or when a digit does not fit in int64 and use_numpy is None.
 
-def return_tag_list_starting_with(tags:list, pattern:str):
-    """Returns a list of tags that start with a pattern.
+    Raises:
+        ValueError: When use_numpy is True and a digit does not fit in int64.
+    """
+    numpy = import_numpy() if use_numpy is not False else None
+    if use_numpy and numpy is None:
+        raise ImportError('numpy is not installed')
+    match = VERSION_NUMBER_PATTERN.match
+    valid_tags = [tag for tag in tags if match(tag)]
+    if numpy is not None:
+        digits = '.'.join(valid_tags).split('.') if valid_tags else []
+        try:
+            return numpy.fromiter(map(int, digits), dtype=numpy.int64, count=len(digits)).reshape(-1, 4)
+        except OverflowError:
+            if use_numpy:
+                raise ValueError('a version number digit does not fit in int64, example {}'.format(next(tag for tag in valid_tags if any(int(digit) >= 1 << 63 for digit in tag.split('.')))))
+    return [tuple(map(int, tag.split('.'))) for tag in valid_tags]
+
+
+def sort_version_array(versions):
+    """Sorts versions from parse_version_array from lowest to highest.
 
     Args:
-        tags (list): List of tags
-        pattern (str): Pattern to match 
+        versions (numpy.ndarray|list): Versions from parse_version_array
 
     Returns:
-        tags (list): Matching tags
+        numpy.ndarray|list: The sorted versions.
     """
-    tag_list = []
-    for tag in tags:
-        if tag.startswith(pattern):
-            tag_list.append(tag)
-    return tag_list
+    if isinstance(versions, list):
+        return sorted(versions)
+    return versions[import_numpy().lexsort(versions.T[::-1])]
 
 
-def return_list_of_tags_matching_release_branches(tags:list, branches:list):
-    """Returns a list of tags that match the release branches.
+def filter_version_array(versions, prefix:tuple):
+    """Returns the versions starting with the prefix.
 
     Args:
-        tags (list): List of tags
-        branches (list): Pattern to match 
+        versions (numpy.ndarray|list): Versions from parse_version_array
+        prefix (tuple): Version prefix, example (4, 7, 0)
 
     Returns:
-        tags (list): Matching tags
+        numpy.ndarray|list: The matching versions, in the same order.
     """
-    release_branches = return_release_branches_from_branch_list(branches)
-    tag_list = []
-    for branch in release_branches:
-        if branch.replace('release/', '') not in tags:
-            tag_list.append("{}.1".format(branch.replace('release/', '')))
-        for tag in tags:
-            if tag.startswith(branch.replace('release/', '')):
-                tag_list.append(tag)
-    return tag_list
+    if isinstance(versions, list):
+        return [version_tuple for version_tuple in versions if version_tuple[:len(prefix)] == prefix]
+    return versions[(versions[:, :len(prefix)] == prefix).all(axis=1)]
 
 
-def return_next_version_number(tags:list, branches:list, current_branch:str, major_minor_patch:str, increment_position:str, build_number:int, length:int=8):
-    """ Returns the next version number.
+def return_grouped_highest_versions(versions, prefix_length:int=RELEASE_PREFIX_LENGTH):
+    """Returns the highest version of every prefix, by default every major.minor.patch.
 
     Args:
-        tags (list): List of tags
-        branches (list): List of branches
-        current_branch (str): Current branch
-        major_minor_patch (str): Expectation for highest starting major_minor_patch
-        increment_position (str): Which position to increment in case of conflict between mainline and release branches
-        build_number (int): Build number (Used for developer branches). Defaults to str.
-        length (int, optional): Length of unique numbers. Defaults to 8.
+        versions (numpy.ndarray|list): Versions from parse_version_array
+        prefix_length (int, optional): Number of digits in the prefix. Defaults to 3.
 
     Returns:
-        version_number (str): Returns the next version number, for the branch. 
+        numpy.ndarray|list: The highest version per prefix, sorted by prefix.
     """
-    _build_number = os.environ.get("BUILD_NUMBER",build_number)
-    release_branch_indicator = 'release/'
-    feature_branch_indicator = 'feature/'
-    feature_branch_version_start = '0.0'
-    filtered_tags = return_filtered_tag_list(tags)
-    if current_branch in ['main', 'develop', 'master']:
-        if len(filtered_tags) == 0:
-            if major_minor_patch != '':
-                return "{}.1".format(major_minor_patch)
-            return '{}.1'.format(DEFAULT_MAJOR_MINOR_PATCH)
-        tag_list_from_releases = return_list_of_tags_matching_release_branches(filtered_tags, branches)
-        highest_version_number = return_highest_version_number_from_list(tag_list_from_releases+filtered_tags)
-        highest_version_number_short = '.'.join(highest_version_number.split('.')[:-1])
-        if version.parse(highest_version_number_short) < version.parse(major_minor_patch):
-            # print ("Major_Minor_Patch -{}- is higher than -{}-".format(major_minor_patch, highest_version_number))
-            return ("{}.1".format(major_minor_patch))
-        if is_highest_version_number_matching_release_branch(highest_version_number, branches):
-            # print ('Mainline build - Release Branch has reserved highest number -{}-, Bumping {}. digit'.format(highest_version_number,
-            #                                                                                                    increment_position))
-            return (increment_version_digit(highest_version_number, 1, int(increment_position)))
-        else:
-            # print('Mainline build - Bumbing last digit')
-            return (increment_last_digit_in_version(highest_version_number, 1))
-    elif current_branch.startswith(release_branch_indicator):
-        tag_list = return_tag_list_starting_with(filtered_tags,current_branch.replace(release_branch_indicator, ''))
-        if tag_list:
-            return increment_last_digit_in_version(return_highest_version_number_from_list(tag_list), 1)
-        else:
-            return ('{}.1'.format(current_branch.replace(release_branch_indicator, '')))
-    elif current_branch.startswith(feature_branch_indicator):
-        third_digit = hash_text_to_8_digits(current_branch, length)
-        tag_list = return_tag_list_starting_with(filtered_tags, "{}.{}".format(feature_branch_version_start, third_digit))
-        if tag_list:
-            return increment_last_digit_in_version(return_highest_version_number_from_list(tag_list), 1)
-        else:
-            third_digit = hash_text_to_8_digits(current_branch, length)
-            return ('{}.{}.1'.format(feature_branch_version_start, third_digit))
-    else:
-        # Making the assumption that we are on a developer branch
-        second_digit = hash_text_to_8_digits(current_branch, length)
-        return ('99.{}.0.{}'.format(second_digit, _build_number))
+    versions = sort_version_array(versions)
+    if isinstance(versions, list):
+        maxima = {}
+        for version_tuple in versions:
+            maxima[version_tuple[:prefix_length]] = version_tuple
+        return list(maxima.values())
+    numpy = import_numpy()
+    if len(versions) == 0:
+        return versions
+    last_of_group = numpy.append((versions[1:, :prefix_length] != versions[:-1, :prefix_length]).any(axis=1), True)
+    return versions[last_of_group]
+
+
+def return_duplicate_versions(versions):
+    """Returns the versions parsed from more than one tag, for example 1.0.0.1 and 1.0.0.01.
 
+    Args:
+        versions (numpy.ndarray|list): Versions from parse_version_array
 
-def parse_arguments(args):
+    Returns:
+        numpy.ndarray|list: Every duplicated version once, sorted.
+    """
+    versions = sort_version_array(versions)
+    if isinstance(versions, list):
+        return sorted({current for previous, current in zip(versions, versions[1:]) if previous == current})
+    numpy = import_numpy()
+    duplicated = (versions[1:] == versions[:-1]).all(axis=1)
+    return numpy.unique(versions[1:][duplicated], axis=0)
+
+
+def return_version_gap_counts(versions, prefix_length:int=RELEASE_PREFIX_LENGTH):
+    """Returns how many build numbers are missing below the highest build of every prefix.
+
+    Args:
+        versions (numpy.ndarray|list): Versions from parse_version_array
+        prefix_length (int, optional): Number of digits in the prefix. Defaults to 3.
+
+    Returns:
+        dict: Version prefix tuple to the number of missing build numbers between 1 and the highest build.
+    """
+    versions = sort_version_array(versions)
+    if isinstance(versions, list):
+        builds = {}
+        for version_tuple in versions:
+            builds.setdefault(version_tuple[:prefix_length], set()).add(version_tuple[-1])
+        return {prefix: max(numbers) - len(numbers - {0}) for prefix, numbers in builds.items()}
+    numpy = import_numpy()
+    if len(versions) == 0:
+        return {}
+    unique_versions = numpy.unique(versions[versions[:, -1] > 0], axis=0)
+    prefixes, counts = numpy.unique(unique_versions[:, :prefix_length], axis=0, return_counts=True)
+    maxima = return_grouped_highest_versions(versions, prefix_length)
+    present = {tuple(prefix): int(count) for prefix, count in zip(prefixes.tolist(), counts.tolist())}
+    return {tuple(row[:prefix_length]): row[-1] - present.get(tuple(row[:prefix_length]), 0) for row in maxima.tolist()}
+
+
+def return_missing_build_ranges(builds:bytearray, highest:int, limit:int=10):
+    """Returns the first ranges of build numbers missing between 1 and highest.
+
+    Args:
+        builds (bytearray): Bitset of the present build numbers
+        highest (int): Highest build number
+        limit (int, optional): Maximum number of ranges. Defaults to 10.
+
+    Returns:
+        ranges (list): Strings like 4 or 7-9.
+    """
+    ranges = []
+    start = None
+    build = 1
+    while build <= highest and len(ranges) < limit:
+        if start is None and build & 7 == 0 and builds[build >> 3] == 0xff:
+            build += 8
+            continue
+        present = builds[build >> 3] >> (build & 7) & 1
+        if not present and start is None:
+            start = build
+        elif present and start is not None:
+            ranges.append(str(start) if start == build - 1 else '{}-{}'.format(start, build - 1))
+            start = None
+        build += 1
+    if start is not None:
+        ranges.append(str(start) if start == highest else '{}-{}'.format(start, highest))
+    return ranges
+
+def return_tag_history_report(tags, branches:list, length:int=8, max_build_number:int=REPORT_MAX_BUILD_NUMBER, limit:int=10, scheme:VersionScheme=DEFAULT_VERSION_SCHEME):
+    """Returns the missing and duplicated build numbers of every version line, and the colliding branch numbers.
+
+    The tags are streamed once, every line (major.minor.patch, 0.0.<hash> or 99.<hash>.0 in the four digit scheme) keeps
+    a counter and a bitset of its build numbers, so the memory only depends on the number of lines and their highest build.
+    A line with a build number above max_build_number stops tracking its bitset and reports None for gaps and duplicates.
+    With two digit lines the feature and developer lines cannot be told apart from other lines, only the lines of the
+    branches are recognized.
+
+    Args:
+        tags (iterable): Tag names, only version numbers are counted
+        branches (list): Branches on origin
+        length (int, optional): Length of unique numbers. Defaults to 8.
+        max_build_number (int, optional): Highest build number tracked per line. Defaults to REPORT_MAX_BUILD_NUMBER.
+        limit (int, optional): Maximum number of gap ranges and duplicated builds listed per line. Defaults to 10.
+        scheme (VersionScheme, optional): Version scheme of the tags. Defaults to DEFAULT_VERSION_SCHEME.
+
+    Returns:
+        report (dict): tags, version_tags, gaps, duplicates, the lines and the branch number collisions.
+    """
+    release_branch_index = ReleaseBranchIndex(branches)
+    table = return_branch_number_table(branches, length)
+    numbered_branches = {}
+    for branch, number in table.items():
+        numbered_branches.setdefault((return_branch_category(branch), number), []).append(branch)
+    # line: [count, highest build, duplicates, bitset of builds, duplicated builds]
+    lines = {}
+    tag_count = 0
+    version_count = 0
+    match = scheme.pattern.match
+    for tag in tags:
+        tag_count += 1
+        found = match(tag)
+        if found is None:
+            continue
+        version_count += 1
+        version = tuple(map(int, found.groups()))
+        line, build = version[:-1], version[-1]
+        state = lines.get(line)
+        if state is None:
+            state = lines[line] = [0, 0, 0, bytearray(), []]
+        state[0] += 1
+        state[1] = max(state[1], build)
+        builds = state[3]
+        if builds is None:
+            continue
+        if build > max_build_number:
+            state[3] = None
+            continue
+        index = build >> 3
+        if index >= len(builds):
+            builds.extend(bytes(index + 1 - len(builds)))
+        mask = 1 << (build & 7)
+        if builds[index] & mask:
+            state[2] += 1
+            if len(state[4]) < limit:
+                state[4].append(build)
+        else:
+            builds[index] |= mask
+    report = {'tags': tag_count, 'version_tags': version_count, 'gaps': 0, 'duplicates': 0, 'lines': [],
+              'collisions': return_branch_number_collisions(table)}
+    numbered_lines = scheme.line_length > 2
+    feature_zeros = (0,) * (scheme.line_length - 1)
+    developer_zeros = (0,) * (scheme.line_length - 2)
+    for line in sorted(lines):
+        count, highest, duplicates, builds, duplicated_builds = lines[line]
+        if line[:-1] == feature_zeros and (numbered_lines or ('feature', line[-1]) in numbered_branches):
+            kind, line_branches = 'feature', numbered_branches.get(('feature', line[-1]), [])
+        elif line[0] == 99 and line[2:] == developer_zeros and (numbered_lines or ('developer', line[1]) in numbered_branches):
+            kind, line_branches = 'developer', numbered_branches.get(('developer', line[1]), [])
+        else:
+            owner = release_branch_index.owner(line + (0,))
+            kind, line_branches = ('release', [owner]) if owner is not None else ('mainline', [])
+        entry = {'line': return_version_string(line), 'kind': kind, 'branches': sorted(line_branches), 'count': count,
+                 'highest': return_version_string(line + (highest,)), 'gaps': None, 'gap_ranges': None, 'duplicates': None, 'duplicate_builds': None}
+        if builds is not None:
+            present = int.from_bytes(builds, 'little') >> 1
+            entry['gaps'] = highest - bin(present).count('1')
+            entry['gap_ranges'] = return_missing_build_ranges(builds, highest, limit) if entry['gaps'] else []
+            entry['duplicates'] = duplicates
+            entry['duplicate_builds'] = duplicated_builds
+            report['gaps'] += entry['gaps']
+            report['duplicates'] += duplicates
+        report['lines'].append(entry)
+    return report
+
+
+def increment_last_digit_in_version_tuple(version:tuple, increment:int):
+    """Add a number to the last digit in a version tuple.
+
+    Args:
+        version (tuple): Version tuple
+        increment (int): How much should we increment the version
+
+    Returns:
+        tuple: New version tuple
+    """
+    return version[:-1] + (version[-1] + increment,)
+
+
+def increment_last_digit_in_version(version:str, increment:int):
+    """Add a number to the last digit in a version number.
+
+    Args:
+        version (str):Version Number
+        increment (int): How much should we increment the version
+
+    Returns:
+        str: New version number
+    """
+    return return_version_string(increment_last_digit_in_version_tuple(return_version_tuple(version), increment))
+
+
+def return_release_branches_from_branch_list(branches:list):
+    """Returns a list of release branches from a list of branches.
+
+    Args:
+        branches (list): List of branchs
+
+    Returns:
+        branches (list): List of release branches
+    """
+    release_branches = []
+    for branch in branches:
+        if branch.startswith('release/'):
+            release_branches.append(branch)
+    return release_branches
+
+
+class ReleaseBranchIndex:
+    """The version prefixes owned by the release branches, grouped by prefix length.
+
+    Finding the release branch owning a version is one dict lookup per distinct prefix length
+    instead of a scan over all branches.
+
+    Args:
+        branches (list): List of branches
+    """
+
+    def __init__(self, branches:list):
+        self.prefixes = {}
+        for branch in branches:
+            prefix = return_release_branch_version_prefix(branch)
+            if prefix is not None:
+                self.prefixes.setdefault(len(prefix), {})[prefix] = branch
+
+    def __iter__(self):
+        for owned in self.prefixes.values():
+            yield from owned
+
+    def owner(self, version:tuple):
+        """Returns the release branch owning the version.
+
+        Args:
+            version (tuple): Version tuple
+
+        Returns:
+            str: The release branch, None if no release branch owns the version.
+        """
+        for prefix_length, owned in self.prefixes.items():
+            branch = owned.get(version[:prefix_length])
+            if branch is not None:
+                return branch
+        return None
+
+
+def is_highest_version_number_matching_release_branch(version:str, branches:list):
+    """Returns True if the highest version number is matching the release branch.
+
+    Args:
+        version (str): Version number
+        branches (list): List of branches
+
+    Returns:
+        bool: True if the highest version number is matching a release branch.
+    """
+    return ReleaseBranchIndex(branches).owner(return_version_tuple(version)) is not None
+
+def increment_version_digit_tuple(version:tuple, increment:int, position:int, first_build:int=1):
+    """Bump a digit in a version tuple.
+    Any number after the bumped digit will be reset to 0, and the last digit will be reset to first_build.
+
+    Args:
+        version (tuple): Version tuple
+        increment (int): How much to increment the digit
+        position (int): Which digit to increment
+        first_build (int, optional): Last digit of the bumped version. Defaults to 1.
+
+    Returns:
+        tuple: Returns a new version tuple with the correct increment.
+    """
+    if position >= len(version):
+        return version[:-1] + (first_build,)
+    return version[:position - 1] + (version[position - 1] + increment,) + (0,) * (len(version) - position - 1) + (first_build,)
+
+def increment_version_digit(version:str, increment:int, position:int):
+    """Bump a digit in a version number.
+    Any number after the bumped digit will be reset to 0.
+
+    Args:
+        version (str): Version number
+        increment (int): How much to increment the digit
+        position (int): Which digit to increment
+
+    Returns:
+        version_nuber (str): Returns a new version number with the correct increment.
+    """
+    return return_version_string(increment_version_digit_tuple(return_version_tuple(version), increment, position))
+
+def return_tag_list_starting_with(tags:list, pattern:str):
+    """Returns a list of tags that start with a pattern.
+
+    Args:
+        tags (list): List of tags
+        pattern (str): Pattern to match 
+
+    Returns:
+        tags (list): Matching tags
+    """
+    tag_list = []
+    for tag in tags:
+        if tag.startswith(pattern):
+            tag_list.append(tag)
+    return tag_list
+
+
+def return_list_of_tags_matching_release_branches(tags:list, branches:list):
+    """Returns a list of tags that match the release branches.
+
+    Args:
+        tags (list): List of tags
+        branches (list): Pattern to match 
+
+    Returns:
+        tags (list): Matching tags
+    """
+    release_branches = return_release_branches_from_branch_list(branches)
+    tag_list = []
+    for branch in release_branches:
+        if branch.replace('release/', '') not in tags:
+            tag_list.append("{}.1".format(branch.replace('release/', '')))
+        for tag in tags:
+            if tag.startswith(branch.replace('release/', '')):
+                tag_list.append(tag)
+    return tag_list
+
+
+class VersionIndex:
+    """The version number tags of a repository, parsed into sorted integer tuples.
+
+    The highest tag for every release branch prefix (major.minor.patch) is kept as well, so the
+    lookups needed by return_next_version_number do not touch the tag list. Other prefixes are
+    looked up with a binary search.
+
+    Args:
+        versions (list): Sorted version tuples.
+        scheme (VersionScheme, optional): Version scheme of the versions. Defaults to DEFAULT_VERSION_SCHEME.
+    """
+
+    def __init__(self, versions:list, scheme:VersionScheme=DEFAULT_VERSION_SCHEME):
+        self.versions = versions
+        self.scheme = scheme
+        self.maxima = {}
+        line_length = scheme.line_length
+        for version_tuple in versions:
+            self.maxima[version_tuple[:line_length]] = version_tuple
+
+    @classmethod
+    def from_tags(cls, tags, scheme:VersionScheme=DEFAULT_VERSION_SCHEME):
+        """Creates the index from tag names, tags not matching the version number pattern are ignored.
+
+        Args:
+            tags (iterable): Tag names
+            scheme (VersionScheme, optional): Version scheme of the tags. Defaults to DEFAULT_VERSION_SCHEME.
+
+        Returns:
+            VersionIndex: The index
+        """
+        match = scheme.pattern.match
+        return cls(sorted({tuple(map(int, found.groups())) for found in map(match, tags) if found is not None}), scheme)
+
+    @classmethod
+    def from_dict(cls, data:dict, scheme:VersionScheme=DEFAULT_VERSION_SCHEME):
+        """Creates the index from the output of to_dict.
+
+        Args:
+            data (dict): Serialized index
+            scheme (VersionScheme, optional): Version scheme of the versions. Defaults to DEFAULT_VERSION_SCHEME.
+
+        Returns:
+            VersionIndex: The index
+        """
+        return cls([tuple(version_tuple) for version_tuple in data['versions']], scheme)
+
+    def to_dict(self):
+        """Returns the index as a json serializable dict.
+
+        Returns:
+            dict: Serialized index
+        """
+        return {'versions': self.versions, 'maxima': {return_version_string(prefix): version_tuple for prefix, version_tuple in self.maxima.items()}}
+
+    def highest(self):
+        """Returns the highest version.
+
+        Returns:
+            tuple: The highest version, None if there are no version tags.
+        """
+        if self.versions:
+            return self.versions[-1]
+        return None
+
+    def highest_with_prefix(self, prefix:tuple):
+        """Returns the highest version starting with the prefix.
+
+        Args:
+            prefix (tuple): Version prefix, example (4, 7, 0)
+
+        Returns:
+            tuple: The highest matching version, None if no version matches.
+        """
+        if len(prefix) == self.scheme.line_length:
+            return self.maxima.get(prefix)
+        position = bisect.bisect_left(self.versions, prefix[:-1] + (prefix[-1] + 1,))
+        if position and self.versions[position - 1][:len(prefix)] == prefix:
+            return self.versions[position - 1]
+        return None
+
+    def versions_with_prefix(self, prefix:tuple):
+        """Returns the versions starting with the prefix.
+
+        Args:
+            prefix (tuple): Version prefix, example (4, 7, 0)
+
+        Returns:
+            versions (list): Sorted matching versions.
+        """
+        start = bisect.bisect_left(self.versions, prefix)
+        end = bisect.bisect_left(self.versions, prefix[:-1] + (prefix[-1] + 1,))
+        return self.versions[start:end]
+
+
+class VersionMaxima:
+    """The highest version overall and per version prefix, see scan_version_tags.
+
+    Without prefixes the highest version of every major.minor.patch prefix is kept, which makes it
+    a compact state that can be saved and updated with the tags added and removed since.
+
+    Args:
+        prefixes (iterable, optional): Version prefixes to keep the highest version for, example [(4, 7, 0)]. Defaults to None, every major.minor.patch prefix.
+        scheme (VersionScheme, optional): Version scheme of the tags. Defaults to DEFAULT_VERSION_SCHEME.
+        tag_prefix (str, optional): Tag prefix of the component the tags were read for. Defaults to ''.
+    """
+
+    def __init__(self, prefixes=None, scheme:VersionScheme=DEFAULT_VERSION_SCHEME, tag_prefix:str=''):
+        self.highest_version = None
+        self.scheme = scheme
+        self.tag_prefix = tag_prefix
+        self.complete = prefixes is None
+        self.maxima = {} if prefixes is None else dict.fromkeys(prefixes)
+        self.count = 0
+
+    @classmethod
+    def from_dict(cls, data:dict):
+        """Creates the maxima from the output of to_dict.
+
+        Args:
+            data (dict): Serialized maxima of every major.minor.patch prefix
+
+        Returns:
+            VersionMaxima: The maxima
+        """
+        result = cls(scheme=VERSION_SCHEMES[data.get('scheme', DEFAULT_VERSION_SCHEME.name)], tag_prefix=data.get('tag_prefix', ''))
+        result.maxima = {return_version_tuple(prefix): return_version_tuple(version_number) for prefix, version_number in data['maxima'].items()}
+        result.highest_version = max(result.maxima.values(), default=None)
+        result.count = data.get('count', 0)
+        return result
+
+    def to_dict(self):
+        """Returns the maxima as a json serializable dict.
+
+        Returns:
+            dict: scheme, tag_prefix, highest, maxima per prefix and count as version number strings.
+        """
+        return {'scheme': self.scheme.name, 'tag_prefix': self.tag_prefix, 'highest': return_version_string(self.highest_version) if self.highest_version else None, 'count': self.count,
+                'maxima': {return_version_string(prefix): return_version_string(version_tuple) for prefix, version_tuple in self.maxima.items() if version_tuple}}
+
+    def highest(self):
+        """Returns the highest version.
+
+        Returns:
+            tuple: The highest version, None if there are no version tags.
+        """
+        return self.highest_version
+
+    def highest_with_prefix(self, prefix:tuple):
+        """Returns the highest version starting with the prefix.
+
+        Args:
+            prefix (tuple): One of the version prefixes given when scanning, or any prefix when every major.minor.patch prefix is kept.
+
+        Returns:
+            tuple: The highest matching version, None if no version matches.
+        """
+        if not self.complete:
+            return self.maxima[prefix]
+        if len(prefix) == self.scheme.line_length:
+            return self.maxima.get(prefix)
+        if len(prefix) > self.scheme.line_length:
+            raise KeyError(prefix)
+        return max((version_tuple for maxima_prefix, version_tuple in self.maxima.items() if maxima_prefix[:len(prefix)] == prefix), default=None)
+
+    def apply_tag_delta(self, added, removed):
+        """Updates the maxima with the tags added and removed since they were computed.
+
+        Only possible when every major.minor.patch prefix is kept. Removing the highest version of a
+        prefix cannot be resolved without the other tags of that prefix.
+
+        Args:
+            added (iterable): Added tag names
+            removed (iterable): Removed tag names
+
+        Returns:
+            bool: True if the maxima are up to date, False if the tags have to be scanned again.
+        """
+        if not self.complete:
+            return False
+        parse = self.scheme.parse
+        line_length = self.scheme.line_length
+        for tag in removed:
+            version_tuple = parse(tag)
+            if version_tuple is not None:
+                if self.maxima.get(version_tuple[:line_length]) == version_tuple:
+                    return False
+                self.count -= 1
+        for tag in added:
+            version_tuple = parse(tag)
+            if version_tuple is not None:
+                prefix = version_tuple[:line_length]
+                if self.maxima.get(prefix) is None or version_tuple > self.maxima[prefix]:
+                    self.maxima[prefix] = version_tuple
+                if self.highest_version is None or version_tuple > self.highest_version:
+                    self.highest_version = version_tuple
+                self.count += 1
+        return True
+
+
+def scan_version_tags(tags, prefixes=None, scheme:VersionScheme=DEFAULT_VERSION_SCHEME):
+    """Finds the highest version overall and per version prefix in a single pass over the tags.
+
+    Tags not matching the version number pattern are skipped, and only the maxima are kept, so the
+    tags can be streamed straight from the repository.
+
+    Args:
+        tags (iterable): Tag names
+        prefixes (iterable, optional): Version prefixes to keep the highest version for, example [(4, 7, 0)]. Defaults to None, every major.minor.patch prefix.
+        scheme (VersionScheme, optional): Version scheme of the tags. Defaults to DEFAULT_VERSION_SCHEME.
+
+    Returns:
+        VersionMaxima: The highest versions.
+    """
+    result = VersionMaxima(prefixes, scheme)
+    maxima = result.maxima
+    complete = result.complete
+    prefix_lengths = [scheme.line_length] if complete else sorted({len(prefix) for prefix in maxima})
+    match = scheme.pattern.match
+    highest_version = None
+    count = 0
+    for tag in tags:
+        found = match(tag)
+        if found is None:
+            continue
+        count += 1
+        version_tuple = tuple(map(int, found.groups()))
+        if highest_version is None or version_tuple > highest_version:
+            highest_version = version_tuple
+        for prefix_length in prefix_lengths:
+            prefix = version_tuple[:prefix_length]
+            if complete or prefix in maxima:
+                current = maxima.get(prefix)
+                if current is None or version_tuple > current:
+                    maxima[prefix] = version_tuple
+    result.highest_version = highest_version
+    result.count = count
+    return result
+
+
+def scan_component_version_tags(tags, scheme:VersionScheme=DEFAULT_VERSION_SCHEME):
+    """Finds the highest versions of every component in a single pass over the tags.
+
+    The component of a tag is its tag prefix, see return_tag_component. Tags whose rest is not a
+    version number of the scheme are skipped.
+
+    Args:
+        tags (iterable): Tag names
+        scheme (VersionScheme, optional): Version scheme of the tags. Defaults to DEFAULT_VERSION_SCHEME.
+
+    Returns:
+        components (dict): Tag prefix to the VersionMaxima of every major.minor.patch prefix of the component.
+    """
+    components = {}
+    component_match = TAG_COMPONENT_PATTERN.match
+    match = scheme.pattern.match
+    line_length = scheme.line_length
+    for tag in tags:
+        tag_prefix = component_match(tag).group()
+        found = match(tag[len(tag_prefix):] if tag_prefix else tag)
+        if found is None:
+            continue
+        version_tuple = tuple(map(int, found.groups()))
+        result = components.get(tag_prefix)
+        if result is None:
+            result = components[tag_prefix] = VersionMaxima(scheme=scheme)
+        result.count += 1
+        if result.highest_version is None or version_tuple > result.highest_version:
+            result.highest_version = version_tuple
+        prefix = version_tuple[:line_length]
+        current = result.maxima.get(prefix)
+        if current is None or version_tuple > current:
+            result.maxima[prefix] = version_tuple
+    return components
+
+
+def read_ref_delta(path:str):
+    """Returns the tags added and removed according to a ref delta file.
+
+    Every line is + or - followed by a tag name or full tag ref, other refs are ignored.
+
+    Args:
+        path (str): Path to the file, - reads from stdin.
+
+    Returns:
+        tuple: (added, removed) tag names
+    """
+    if path == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path) as reader:
+            lines = reader.read().splitlines()
+    added = []
+    removed = []
+    for line in lines:
+        operation, name = line[:1], line[1:].strip()
+        if name.startswith('refs/'):
+            if not name.startswith(TAG_REF_PREFIX):
+                continue
+            name = name[len(TAG_REF_PREFIX):]
+        if operation == '+':
+            added.append(name)
+        elif operation == '-':
+            removed.append(name)
+    return added, removed
+
+
+def load_version_state(repository_directory, state_path:str=None, added=(), removed=(), scheme:VersionScheme=DEFAULT_VERSION_SCHEME):
+    """Returns the maxima of every major.minor.patch prefix, updated from a previous state when possible.
+
+    Args:
+        repository_directory (str|RepositorySession): Path to the git repository, or an open session.
+        state_path (str, optional): Previous state written by save_version_state. Defaults to None.
+        added (iterable, optional): Tags added since the previous state. Defaults to ().
+        removed (iterable, optional): Tags removed since the previous state. Defaults to ().
+        scheme (VersionScheme, optional): Version scheme of the tags, a state of another scheme is not used. Defaults to DEFAULT_VERSION_SCHEME.
+
+    Returns:
+        VersionMaxima: The maxima, read from the repository tags when there is no usable previous state or it was saved for another tag prefix.
+    """
+    session = repository_directory
+    if not isinstance(session, RepositorySession):
+        session = RepositorySession(repository_directory)
+    if state_path is not None and os.path.exists(state_path):
+        with open(state_path) as reader:
+            state = VersionMaxima.from_dict(json.load(reader))
+        if state.scheme is scheme and state.tag_prefix == session.tag_prefix and state.apply_tag_delta(added, removed):
+            return state
+    state = scan_version_tags(session.tags, scheme=scheme)
+    state.tag_prefix = session.tag_prefix
+    return state
+
+
+def save_version_state(state:VersionMaxima, state_path:str):
+    """Writes the maxima for the next load_version_state.
+
+    Args:
+        state (VersionMaxima): Maxima of every major.minor.patch prefix
+        state_path (str): Path of the state file.
+    """
+    temporary_path = '{}.{}.tmp'.format(state_path, os.getpid())
+    with open(temporary_path, 'w') as writer:
+        json.dump(state.to_dict(), writer, indent=2)
+    os.replace(temporary_path, state_path)
+
+
+def return_branch_version_prefixes(branches:list, current_branch:str, length:int=8, scheme:VersionScheme=DEFAULT_VERSION_SCHEME):
+    """Returns the version prefixes return_next_version_number looks up for a branch.
+
+    Args:
+        branches (list): List of branches
+        current_branch (str): Current branch
+        length (int, optional): Length of unique numbers. Defaults to 8.
+        scheme (VersionScheme, optional): Version scheme of the tags. Defaults to DEFAULT_VERSION_SCHEME.
+
+    Returns:
+        prefixes (list): The release branch prefixes, and the prefix of the current branch when it is a release or feature branch.
+    """
+    prefixes = [prefix for prefix in map(return_release_branch_version_prefix, branches) if prefix is not None]
+    if current_branch.startswith('release/'):
+        prefix = return_release_branch_version_prefix(current_branch)
+        if prefix is not None:
+            prefixes.append(prefix)
+    elif current_branch.startswith('feature/'):
+        prefixes.append(scheme.feature_line(hash_text_to_8_digits(current_branch, length)))
+    return prefixes
+
+
+def return_refs_signature(git_directory:str, prefixes:tuple=(TAG_REF_PREFIX,)):
+    """Returns a signature of the refs that changes whenever a ref is added, moved or removed.
+
+    Args:
+        git_directory (str): Path to the git directory.
+        prefixes (tuple, optional): Ref directories to include. Defaults to ('refs/tags/',)
+
+    Returns:
+        signature (list): Modification time and size of packed-refs or the reftable stack, and the modification time of every directory under the prefixes.
+    """
+    signature = []
+    try:
+        packed_refs = os.stat(os.path.join(git_directory, 'packed-refs'))
+        signature.append(['packed-refs', packed_refs.st_mtime_ns, packed_refs.st_size])
+    except FileNotFoundError:
+        pass
+    try:
+        # Every reftable update replaces tables.list
+        tables_list = os.stat(os.path.join(git_directory, REFTABLE_TABLES_LIST))
+        signature.append(['reftable', tables_list.st_mtime_ns, tables_list.st_size, tables_list.st_ino])
+    except FileNotFoundError:
+        pass
+    for prefix in prefixes:
+        for directory, _, _ in os.walk(os.path.join(git_directory, *prefix.rstrip('/').split('/'))):
+            signature.append([os.path.relpath(directory, git_directory).replace(os.sep, '/'), os.stat(directory).st_mtime_ns])
+    return signature
+
+
+def return_version_index_cache_filename(tag_prefix:str=''):
+    """Returns the name of the version index cache file of a component, so the components of a monorepo keep their own cache.
+
+    Args:
+        tag_prefix (str, optional): Tag prefix of the component. Defaults to '', every tag.
+
+    Returns:
+        str: version_index.json, or version_index.<quoted prefix>.json, example version_index.service-a%2F.json
+    """
+    if not tag_prefix:
+        return VERSION_INDEX_CACHE_FILENAME
+    import urllib.parse
+    return VERSION_INDEX_COMPONENT_CACHE_FILENAME.format(urllib.parse.quote(tag_prefix, safe=''))
+
+
+def load_version_index(repository_directory, cache:bool=True, scheme:VersionScheme=DEFAULT_VERSION_SCHEME):
+    """Returns the version index for a repository, using the cache file in the git directory when it is up to date.
+
+    The cache is rebuilt whenever packed-refs or a directory under refs/tags changed since it was written,
+    or when it was written for another version scheme. Every tag prefix has its own cache file, see
+    return_version_index_cache_filename, so the components of a monorepo do not evict each other.
+
+    Args:
+        repository_directory (str|RepositorySession): Path to the git repository, or an open session.
+        cache (bool, optional): Read and write the cache file. Defaults to True.
+        scheme (VersionScheme, optional): Version scheme of the tags. Defaults to DEFAULT_VERSION_SCHEME.
+
+    Returns:
+        VersionIndex: The index
+    """
+    session = repository_directory
+    if not isinstance(session, RepositorySession):
+        session = RepositorySession(repository_directory)
+    if not cache or session.git_directory is None or session.remote is not None:
+        return VersionIndex.from_tags(session.tags, scheme)
+    cache_path = os.path.join(session.git_directory, return_version_index_cache_filename(session.tag_prefix))
+    signature = return_refs_signature(session.git_directory)
+    try:
+        with open(cache_path) as reader:
+            data = json.load(reader)
+        if data.get('format') == VERSION_INDEX_CACHE_FORMAT and data.get('signature') == signature and data.get('scheme', DEFAULT_VERSION_SCHEME.name) == scheme.name and data.get('tag_prefix', '') == session.tag_prefix:
+            return VersionIndex.from_dict(data, scheme)
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    if session._tags is None:
+        session.load(remote_branches=session._remote_branches is None)
+    index = VersionIndex.from_tags(session.tags, scheme)
+    data = index.to_dict()
+    data.update({'format': VERSION_INDEX_CACHE_FORMAT, 'signature': signature, 'scheme': scheme.name, 'tag_prefix': session.tag_prefix})
+    temporary_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+    try:
+        with open(temporary_path, 'w') as writer:
+            json.dump(data, writer)
+        os.replace(temporary_path, cache_path)
+    except OSError:
+        pass
+    return index
+
+
+def load_tag_date_index(repository_directory, cache:bool=True):
+    """Returns the commit and creation date of every tag, using the cache file in the git directory when it is up to date.
+
+    The creation date is the tagger date of annotated tags and the commit date of lightweight tags, like git's creatordate.
+    When packed-refs or a directory under refs/tags changed since the cache was written, only the new and moved tags are read again.
+
+    Args:
+        repository_directory (str|RepositorySession): Path to the git repository, or an open session.
+        cache (bool, optional): Read and write the cache file. Defaults to True.
+
+    Returns:
+        index (dict): Tag name to [commit, creation date as unix time, tag object].
+    """
+    session = repository_directory
+    if not isinstance(session, RepositorySession):
+        session = RepositorySession(repository_directory)
+    cache = cache and session.git_directory is not None
+    cached_index = {}
+    if cache:
+        cache_path = os.path.join(session.git_directory, TAG_DATE_INDEX_CACHE_FILENAME)
+        signature = return_refs_signature(session.git_directory)
+        try:
+            with open(cache_path) as reader:
+                data = json.load(reader)
+            if data.get('format') == TAG_DATE_INDEX_CACHE_FORMAT:
+                if data.get('signature') == signature:
+                    return data['tags']
+                cached_index = data['tags']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    details_format = '--format=%(refname:strip=2)%09%(objectname)%09%(*objectname)%09%(creatordate:unix)'
+    patterns = [TAG_REF_PREFIX]
+    index = {}
+    if cached_index:
+        # Listing the tag objects is cheap, the dates are only read for the tags that are new or moved
+        for line in run_git_command(session.repository_directory, 'for-each-ref', '--format=%(refname:strip=2)%09%(objectname)', TAG_REF_PREFIX).splitlines():
+            tag, target = line.split('\t')
+            cached = cached_index.get(tag)
+            index[tag] = cached if cached is not None and cached[2] == target else None
+        changed_tags = [tag for tag, entry in index.items() if entry is None]
+        if len(changed_tags) <= TAG_PATTERN_LIMIT:
+            patterns = [TAG_REF_PREFIX + tag for tag in changed_tags]
+    if patterns:
+        for line in run_git_command(session.repository_directory, 'for-each-ref', details_format, *patterns).splitlines():
+            tag, target, peeled_target, date = line.split('\t')
+            index[tag] = [peeled_target or target, int(date or 0), target]
+    if cache:
+        temporary_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+        try:
+            with open(temporary_path, 'w') as writer:
+                # json.dumps uses the C encoder, json.dump streams through the python one
+                writer.write(json.dumps({'format': TAG_DATE_INDEX_CACHE_FORMAT, 'signature': signature, 'tags': index}))
+            os.replace(temporary_path, cache_path)
+        except OSError:
+            pass
+    return index
+
+
+def return_as_of_timestamp(as_of:str):
+    """Returns the unix time of an as-of point given as @<unix time> or an ISO 8601 date, None for anything else.
+
+    Args:
+        as_of (str): Example @1700000000, 2024-03-01 or 2024-03-01T12:00:00+01:00
+
+    Returns:
+        int: Unix time, None when as_of is not a date and should be treated as a commit.
+    """
+    if as_of.startswith('@') and as_of[1:].isdigit():
+        return int(as_of[1:])
+    # Only YYYY-MM-DD forms are dates, fromisoformat also accepts 20240301 which can be an abbreviated commit
+    if not AS_OF_DATE_PATTERN.match(as_of):
+        return None
+    import datetime
+    try:
+        return int(datetime.datetime.fromisoformat(as_of).timestamp())
+    except ValueError:
+        return None
+
+
+def get_tags_as_of(repository_directory, as_of:str, cache:bool=True):
+    """Returns the tags as they were at a point in time or at a commit.
+
+    A date keeps the tags created before it, answered from the tag date index without walking the history.
+    A commit keeps the tags whose commits are reachable from it, in a single git for-each-ref --merged walk.
+
+    Args:
+        repository_directory (str|RepositorySession): Path to the git repository, or an open session.
+        as_of (str): @<unix time>, an ISO 8601 date, or a commit (sha, tag or branch).
+        cache (bool, optional): Read and write the tag date index cache. Defaults to True.
+
+    Returns:
+        tags (list): Tag names.
+    """
+    timestamp = return_as_of_timestamp(as_of)
+    if timestamp is not None:
+        return [tag for tag, (_, date, _) in load_tag_date_index(repository_directory, cache).items() if date <= timestamp]
+    if isinstance(repository_directory, RepositorySession):
+        repository_directory = repository_directory.repository_directory
+    return run_git_command(repository_directory, 'for-each-ref', '--merged={}'.format(as_of), '--format=%(refname:strip=2)', TAG_REF_PREFIX).splitlines()
+
+
+def return_branch_head(repository_directory:str, branch:str):
+    """Returns the commit of a branch, the local branch first, then the origin branch, then HEAD.
+
+    Args:
+        repository_directory (str): Path to the git repository.
+        branch (str): Branch name
+
+    Returns:
+        str: Commit sha
+    """
+    heads = run_git_command(repository_directory, 'for-each-ref', '--format=%(objectname)', 'refs/heads/{}'.format(branch), '{}{}'.format(REMOTE_BRANCH_REF_PREFIX, branch)).split()
+    if heads:
+        return heads[0]
+    return run_git_command(repository_directory, 'rev-parse', 'HEAD').strip()
+
+
+def return_merged_tags(repository_directory:str, head:str, patterns:list=(TAG_REF_PREFIX,)):
+    """Returns the tags reachable from head, git walks the history once using the commit-graph generation numbers when available.
+
+    Args:
+        repository_directory (str): Path to the git repository.
+        head (str): Commit the tags must be reachable from
+        patterns (list, optional): Tag refs to check. Defaults to all tags.
+
+    Returns:
+        tags (list): Tag names.
+    """
+    return run_git_command(repository_directory, 'for-each-ref', '--merged={}'.format(head), '--format=%(refname:strip=2)', *patterns).splitlines()
+
+
+def get_reachable_tags(repository_directory, branch:str, cache:bool=True):
+    """Returns the tags whose commits are reachable from the head of a branch.
+
+    The reachability of every tagged commit is cached per branch in the git directory and updated incrementally:
+    when the head moved forward only the commits added since the cached head are listed, and only new tagged
+    commits outside of them are checked. A head that was rewound or rewritten, or many new tags, check every tag in one walk.
+
+    Args:
+        repository_directory (str|RepositorySession): Path to the git repository, or an open session.
+        branch (str): Branch name
+        cache (bool, optional): Read and write the cache file. Defaults to True.
+
+    Returns:
+        tags (list): Tag names.
+    """
+    import subprocess
+    session = repository_directory
+    if not isinstance(session, RepositorySession):
+        session = RepositorySession(repository_directory)
+    repository_directory = session.repository_directory
+    head = return_branch_head(repository_directory, branch)
+    tag_commits = load_tag_date_index(session, cache)
+    cache = cache and session.git_directory is not None
+    data = {'format': VERSION_INDEX_CACHE_FORMAT, 'branches': {}}
+    if cache:
+        cache_path = os.path.join(session.git_directory, REACHABILITY_CACHE_FILENAME)
+        try:
+            with open(cache_path) as reader:
+                cached = json.load(reader)
+            if cached.get('format') == VERSION_INDEX_CACHE_FORMAT:
+                data = cached
+        except (OSError, ValueError):
+            pass
+    entry = data['branches'].get(branch)
+    reachable = {}
+    if entry is not None and entry['head'] == head:
+        reachable = entry['commits']
+    elif entry is not None and subprocess.run(['git', '-C', repository_directory, 'merge-base', '--is-ancestor', entry['head'], head], capture_output=True).returncode == 0:
+        # Commits reachable from the old head stay reachable, only the commits added since can make tags reachable
+        reachable = entry['commits']
+        added_commits = set(run_git_command(repository_directory, 'rev-list', '{}..{}'.format(entry['head'], head)).split())
+        for commit, _, _ in tag_commits.values():
+            if commit in added_commits:
+                reachable[commit] = True
+    unknown_tags = [tag for tag, (commit, _, _) in tag_commits.items() if commit not in reachable]
+    if unknown_tags:
+        if not reachable or len(unknown_tags) > TAG_PATTERN_LIMIT:
+            merged_tags = set(return_merged_tags(repository_directory, head))
+            unknown_tags = list(tag_commits)
+        else:
+            merged_tags = set(return_merged_tags(repository_directory, head, [TAG_REF_PREFIX + tag for tag in unknown_tags]))
+        for tag in unknown_tags:
+            reachable[tag_commits[tag][0]] = reachable.get(tag_commits[tag][0], False) or tag in merged_tags
+    if cache and (entry is None or entry['head'] != head or unknown_tags):
+        tagged_commits = {commit for commit, _, _ in tag_commits.values()}
+        data['branches'][branch] = {'head': head, 'commits': {commit: value for commit, value in reachable.items() if commit in tagged_commits}}
+        temporary_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+        try:
+            with open(temporary_path, 'w') as writer:
+                writer.write(json.dumps(data))
+            os.replace(temporary_path, cache_path)
+        except OSError:
+            pass
+    return [tag for tag, (commit, _, _) in tag_commits.items() if reachable[commit]]
+
+
+def return_next_version_details_from_index(index, branches:list, current_branch:str, major_minor_patch:str, increment_position:str, build_number:int, length:int=8, scheme:VersionScheme=DEFAULT_VERSION_SCHEME):
+    """ Returns the next version number together with the facts it was derived from, using lookups in a version index.
+
+    Args:
+        index (VersionIndex|VersionMaxima): Version index of the repository tags, or the result of scan_version_tags
+        branches (list): List of branches
+        current_branch (str): Current branch
+        major_minor_patch (str): Expectation for highest starting major_minor_patch
+        increment_position (str): Which position to increment in case of conflict between mainline and release branches
+        build_number (int): Build number (Used for developer branches).
+        length (int, optional): Length of unique numbers. Defaults to 8.
+        scheme (VersionScheme, optional): Version scheme of the tags and the returned version. Defaults to DEFAULT_VERSION_SCHEME.
+
+    Returns:
+        details (dict): branch, category, version, highest_tag (the previous highest tag the version counts on, None if there is none),
+                        release_branch (the release branch deciding the version, None if there is none), branch_number (the hashed
+                        number of feature and developer branches, None otherwise), major_minor_patch and build_number.
+    """
+    branch_category = return_branch_category(current_branch)
+    details = {'branch': current_branch, 'category': branch_category, 'version': None, 'highest_tag': None, 'release_branch': None,
+               'branch_number': None, 'major_minor_patch': major_minor_patch or None, 'build_number': None}
+    if branch_category == 'mainline':
+        highest_version = index.highest()
+        line_floor = scheme.line_floor(major_minor_patch)
+        if highest_version is None:
+            line = line_floor if line_floor is not None else return_version_tuple(scheme.default_line)
+            details['version'] = return_version_string(line + (scheme.first_build,))
+            return details
+        details['highest_tag'] = return_version_string(highest_version)
+        release_branch_index = ReleaseBranchIndex(branches)
+        for prefix in release_branch_index:
+            highest_version = max(highest_version, prefix + (scheme.first_build,))
+        if line_floor is not None and highest_version[:-1] < line_floor:
+            details['version'] = return_version_string(line_floor + (scheme.first_build,))
+            return details
+        details['release_branch'] = release_branch_index.owner(highest_version)
+        if details['release_branch'] is not None:
+            details['version'] = return_version_string(scheme.bump(highest_version, int(increment_position)))
+        else:
+            details['version'] = return_version_string(increment_last_digit_in_version_tuple(highest_version, 1))
+    elif branch_category == 'release':
+        details['release_branch'] = current_branch
+        prefix = return_release_branch_version_prefix(current_branch)
+        highest_version = index.highest_with_prefix(prefix) if prefix is not None else None
+        if highest_version is not None:
+            details['highest_tag'] = return_version_string(highest_version)
+            details['version'] = return_version_string(increment_last_digit_in_version_tuple(highest_version, 1))
+        else:
+            details['version'] = '{}.{}'.format(current_branch.replace('release/', ''), scheme.first_build)
+    elif branch_category == 'feature':
+        branch_number = hash_text_to_8_digits(current_branch, length)
+        details['branch_number'] = branch_number
+        feature_line = scheme.feature_line(branch_number)
+        highest_version = index.highest_with_prefix(feature_line)
+        if highest_version is not None:
+            details['highest_tag'] = return_version_string(highest_version)
+            details['version'] = return_version_string(increment_last_digit_in_version_tuple(highest_version, 1))
+        else:
+            details['version'] = return_version_string(feature_line + (scheme.first_build,))
+    else:
+        # Making the assumption that we are on a developer branch
+        branch_number = hash_text_to_8_digits(current_branch, length)
+        details['branch_number'] = branch_number
+        # Build numbers are not always integers, example 20240301.1, only all digit ones become an int
+        details['build_number'] = int(build_number) if str(build_number).isdigit() else build_number
+        details['version'] = scheme.developer_version(branch_number, build_number)
+    return details
+
+
+def return_next_version_number_from_index(index, branches:list, current_branch:str, major_minor_patch:str, increment_position:str, build_number:int, length:int=8, scheme:VersionScheme=DEFAULT_VERSION_SCHEME):
+    """ Returns the next version number using lookups in a version index instead of scanning the tags.
+
+    Args:
+        index (VersionIndex|VersionMaxima): Version index of the repository tags, or the result of scan_version_tags
+        branches (list): List of branches
+        current_branch (str): Current branch
+        major_minor_patch (str): Expectation for highest starting major_minor_patch
+        increment_position (str): Which position to increment in case of conflict between mainline and release branches
+        build_number (int): Build number (Used for developer branches).
+        length (int, optional): Length of unique numbers. Defaults to 8.
+        scheme (VersionScheme, optional): Version scheme of the tags and the returned version. Defaults to DEFAULT_VERSION_SCHEME.
+
+    Returns:
+        version_number (str): Returns the next version number, for the branch.
+    """
+    return return_next_version_details_from_index(index, branches, current_branch, major_minor_patch, increment_position, build_number, length, scheme)['version']
+
+
+def return_next_version_details(tags, branches:list, current_branch:str, major_minor_patch:str, increment_position:str, build_number:int, length:int=8, scheme:VersionScheme=DEFAULT_VERSION_SCHEME):
+    """ Returns the next version number together with the facts it was derived from.
+
+    Args:
+        tags (iterable|VersionIndex|VersionMaxima): Tags, or a version index of the tags
+        branches (list): List of branches
+        current_branch (str): Current branch
+        major_minor_patch (str): Expectation for highest starting major_minor_patch
+        increment_position (str): Which position to increment in case of conflict between mainline and release branches
+        build_number (int): Build number (Used for developer branches).
+        length (int, optional): Length of unique numbers. Defaults to 8.
+        scheme (VersionScheme, optional): Version scheme of the tags and the returned version. Defaults to DEFAULT_VERSION_SCHEME.
+
+    Returns:
+        details (dict): See return_next_version_details_from_index.
+    """
+    if not isinstance(tags, (VersionIndex, VersionMaxima)):
+        tags = scan_version_tags(tags, return_branch_version_prefixes(branches, current_branch, length, scheme), scheme)
+    return return_next_version_details_from_index(tags, branches, current_branch, major_minor_patch, increment_position, build_number, length, scheme)
+
+
+def return_next_version_number(tags:list, branches:list, current_branch:str, major_minor_patch:str, increment_position:str, build_number:int, length:int=8, scheme:VersionScheme=DEFAULT_VERSION_SCHEME):
+    """ Returns the next version number.
+
+    Args:
+        tags (iterable|VersionIndex|VersionMaxima): Tags, or a version index of the tags
+        branches (list): List of branches
+        current_branch (str): Current branch
+        major_minor_patch (str): Expectation for highest starting major_minor_patch
+        increment_position (str): Which position to increment in case of conflict between mainline and release branches
+        build_number (int): Build number (Used for developer branches). Defaults to str.
+        length (int, optional): Length of unique numbers. Defaults to 8.
+        scheme (VersionScheme, optional): Version scheme of the tags and the returned version. Defaults to DEFAULT_VERSION_SCHEME.
+
+    Returns:
+        version_number (str): Returns the next version number, for the branch. 
+    """
+    return return_next_version_details(tags, branches, current_branch, major_minor_patch, increment_position, build_number, length, scheme)['version']
+
+
+def return_next_versions(tags, branches:list, current_branches:list, major_minor_patch:str, increment_position:str, build_number:int, length:int=8, profiler=NULL_PROFILER, details:bool=False, scheme:VersionScheme=DEFAULT_VERSION_SCHEME):
+    """ Returns the next version number for many branches, scanning the tags only once.
+
+    Args:
+        tags (iterable|VersionIndex|VersionMaxima): Tags, or a version index of the tags
+        branches (list): List of branches
+        current_branches (list): Branches to return a version number for
+        major_minor_patch (str): Expectation for highest starting major_minor_patch
+        increment_position (str): Which position to increment in case of conflict between mainline and release branches
+        build_number (int): Build number (Used for developer branches).
+        length (int, optional): Length of unique numbers. Defaults to 8.
+        profiler (Profiler, optional): Records the phases. Defaults to NULL_PROFILER.
+        details (bool, optional): Return the details of return_next_version_details_from_index instead of the version numbers. Defaults to False.
+        scheme (VersionScheme, optional): Version scheme of the tags and the returned versions. Defaults to DEFAULT_VERSION_SCHEME.
+
+    Returns:
+        version_numbers (dict): The next version number, or its details, for every branch in current_branches, in the same order.
+    """
+    if not isinstance(tags, (VersionIndex, VersionMaxima)):
+        with profiler.phase('release_branch_matching') as phase:
+            prefixes = set()
+            for current_branch in current_branches:
+                prefixes.update(return_branch_version_prefixes(branches, current_branch, length, scheme))
+            phase['prefixes'] = len(prefixes)
+        with profiler.phase('version_scan') as phase:
+            tags = scan_version_tags(tags, prefixes, scheme)
+            phase['matched_tags'] = tags.count
+    with profiler.phase('version_selection') as phase:
+        version_numbers = {}
+        for current_branch in current_branches:
+            version_details = return_next_version_details_from_index(tags, branches, current_branch, major_minor_patch, increment_position, build_number, length, scheme)
+            version_numbers[current_branch] = version_details if details else version_details['version']
+        phase['branches'] = len(version_numbers)
+    return version_numbers
+
+
+def return_component_next_versions(tags, branches:list, current_branches:list, major_minor_patch:str, increment_position:str, build_number:int, length:int=8, details:bool=False, scheme:VersionScheme=DEFAULT_VERSION_SCHEME):
+    """ Returns the next version number of every component for many branches, scanning the tags only once.
+
+    A release branch only gets a version number from the component owning it, see return_component_branch.
+
+    Args:
+        tags (iterable): Tag names of all components
+        branches (list): List of branches
+        current_branches (list): Branches to return a version number for
+        major_minor_patch (str): Expectation for highest starting major_minor_patch
+        increment_position (str): Which position to increment in case of conflict between mainline and release branches
+        build_number (int): Build number (Used for developer branches).
+        length (int, optional): Length of unique numbers. Defaults to 8.
+        details (bool, optional): Return the details of return_next_version_details_from_index instead of the version numbers. Defaults to False.
+        scheme (VersionScheme, optional): Version scheme of the tags and the returned versions. Defaults to DEFAULT_VERSION_SCHEME.
+
+    Returns:
+        versions (list): branch, version, tag_prefix and tag (the tag prefix followed by the version) per component and branch, sorted by tag prefix.
+    """
+    versions = []
+    for tag_prefix, maxima in sorted(scan_component_version_tags(tags, scheme).items()):
+        component_branches = return_component_branches(branches, tag_prefix)
+        for current_branch in current_branches:
+            component_branch = return_component_branch(current_branch, tag_prefix)
+            if component_branch is None:
+                continue
+            version_details = return_next_version_details_from_index(maxima, component_branches, component_branch, major_minor_patch, increment_position, build_number, length, scheme)
+            version_details['branch'] = current_branch
+            version = version_details if details else {'branch': current_branch, 'version': version_details['version']}
+            version.update({'tag_prefix': tag_prefix, 'tag': tag_prefix + version_details['version']})
+            versions.append(version)
+    return versions
+
+
+def read_reservation_journal(journal_path:str):
+    """Returns the reservations of a journal written by write_reservation_journal.
+
+    Args:
+        journal_path (str): Path of the journal.
+
+    Returns:
+        list: [tag, reserved at as unix time, owner] per reservation, lines without time and owner count as reserved now.
+    """
+    reservations = []
+    try:
+        with open(journal_path) as reader:
+            for line in reader:
+                fields = line.rstrip('\n').split('\t')
+                if fields[0].strip():
+                    reservations.append([fields[0].strip(), float(fields[1]) if len(fields) > 1 else time.time(), fields[2] if len(fields) > 2 else ''])
+    except FileNotFoundError:
+        pass
+    return reservations
+
+
+def write_reservation_journal(journal_path:str, reservations:list):
+    """Replaces the journal with the reservations, one tab separated tag, unix time and owner per line.
+
+    Args:
+        journal_path (str): Path of the journal.
+        reservations (list): [tag, reserved at as unix time, owner] per reservation
+    """
+    temporary_path = '{}.{}.tmp'.format(journal_path, os.getpid())
+    with open(temporary_path, 'w') as writer:
+        writer.write(''.join('{}\t{}\t{}\n'.format(tag, int(reserved_at), owner) for tag, reserved_at, owner in reservations))
+    os.replace(temporary_path, journal_path)
+
+
+def reserve_next_version_number(repository_directory:str, current_branch:str, major_minor_patch:str, increment_position:str, build_number:int, length:int=8, scheme:VersionScheme=DEFAULT_VERSION_SCHEME, tag_prefix:str='', owner:str=None, expiry:int=RESERVATION_EXPIRY_SECONDS):
+    """ Returns the next version number and reserves it, so parallel builds on this machine never get the same number.
+
+    The reserved numbers are kept in a journal in the git directory, protected by a file lock, and are
+    treated as tags until the tag itself shows up in the repository, the reservation expires or it is
+    released with release_version_number_reservation.
+
+    Args:
+        repository_directory (str): Path to the git repository.
+        current_branch (str): Current branch
+        major_minor_patch (str): Expectation for highest starting major_minor_patch
+        increment_position (str): Which position to increment in case of conflict between mainline and release branches
+        build_number (int): Build number (Used for developer branches).
+        length (int, optional): Length of unique numbers. Defaults to 8.
+        scheme (VersionScheme, optional): Version scheme of the tags and the reserved version. Defaults to DEFAULT_VERSION_SCHEME.
+        tag_prefix (str, optional): Tag prefix of the component, the journal keeps the reserved tag names. Defaults to '', every tag.
+        owner (str, optional): Who reserved the version, kept in the journal. Defaults to None, host name and process id.
+        expiry (int, optional): Seconds after which a reservation without a tag is dropped. Defaults to RESERVATION_EXPIRY_SECONDS.
+
+    Returns:
+        version_number (str): The reserved version number.
+    """
+    import fcntl
+    session = RepositorySession(repository_directory, tag_prefix=tag_prefix)
+    git_directory = session.git_directory or session.repo.common_dir
+    journal_path = os.path.join(git_directory, RESERVATION_JOURNAL_FILENAME)
+    if owner is None:
+        owner = '{}:{}'.format(os.uname().nodename, os.getpid())
+    with open(journal_path + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        session.load()
+        now = time.time()
+        tags = {tag_prefix + tag for tag in session.tags}
+        # Failed builds never create their tag, their reservations expire instead of holding the number forever
+        reservations = [reservation for reservation in read_reservation_journal(journal_path) if reservation[0] not in tags and now - reservation[1] < expiry]
+        reserved = [tag for tag, _, _ in reservations]
+        version_number = return_next_version_number(session.tags + return_component_tags(reserved, tag_prefix), session.remote_branches, current_branch, major_minor_patch, increment_position, build_number, length, scheme)
+        if tag_prefix + version_number not in reserved:
+            reservations.append([tag_prefix + version_number, now, owner])
+        write_reservation_journal(journal_path, reservations)
+    return version_number
+
+
+def release_version_number_reservation(repository_directory:str, version_number:str, tag_prefix:str=''):
+    """Releases a reserved version number, for a build that failed before creating its tag.
+
+    Args:
+        repository_directory (str): Path to the git repository.
+        version_number (str): Version number returned by reserve_next_version_number.
+        tag_prefix (str, optional): Tag prefix of the component. Defaults to ''.
+
+    Returns:
+        bool: True when the version number was reserved.
+    """
+    import fcntl
+    session = RepositorySession(repository_directory)
+    git_directory = session.git_directory or session.repo.common_dir
+    journal_path = os.path.join(git_directory, RESERVATION_JOURNAL_FILENAME)
+    with open(journal_path + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        reservations = read_reservation_journal(journal_path)
+        remaining = [reservation for reservation in reservations if reservation[0] != tag_prefix + version_number]
+        if len(remaining) == len(reservations):
+            return False
+        write_reservation_journal(journal_path, remaining)
+    return True
+
+
+class VersionServer:
+    """Keeps the version index of a repository in memory and answers version number requests.
+
+    Every request first compares the modification times of packed-refs, refs/tags and refs/remotes/origin
+    with the ones the index was built from, and reloads the refs when they changed.
+
+    Args:
+        repository_directory (str): Path to the git repository.
+        scheme (VersionScheme, optional): Version scheme of the tags and the returned versions. Defaults to DEFAULT_VERSION_SCHEME.
+        tag_prefix (str, optional): Tag prefix of the component to answer for. Defaults to '', every tag.
+    """
+
+    def __init__(self, repository_directory:str, scheme:VersionScheme=DEFAULT_VERSION_SCHEME, tag_prefix:str=''):
+        self.repository_directory = repository_directory
+        self.scheme = scheme
+        self.tag_prefix = tag_prefix
+        self.signature = None
+        self.index = None
+        self.remote_branches = None
+        self.refresh()
+
+    def refresh(self):
+        """Reloads the tags and remote branches when the refs changed since they were read."""
+        session = RepositorySession(self.repository_directory, tag_prefix=self.tag_prefix)
+        signature = None
+        if session.git_directory is not None:
+            signature = return_refs_signature(session.git_directory, (TAG_REF_PREFIX, REMOTE_BRANCH_REF_PREFIX))
+            if signature == self.signature:
+                return
+        session.load()
+        self.index = VersionIndex.from_tags(session.tags, self.scheme)
+        self.remote_branches = session.remote_branches
+        self.signature = signature
+
+    def handle_request(self, request:dict):
+        """Returns the response to a version number request.
+
+        Args:
+            request (dict): branch, and optionally major_minor_patch, increment_position, build_number and branch_number_length.
+
+        Returns:
+            dict: branch, version and the other details of return_next_version_details_from_index.
+        """
+        self.refresh()
+        branch = request['branch']
+        if self.tag_prefix:
+            branch = return_component_branch(branch, self.tag_prefix)
+            if branch is None:
+                raise ValueError('{} is a release branch of another component than {}'.format(request['branch'], self.tag_prefix))
+        details = return_next_version_details_from_index(self.index, self.remote_branches, branch,
+                                                         request.get('major_minor_patch', self.scheme.default_line),
+                                                         request.get('increment_position', 2), request.get('build_number', 0),
+                                                         int(request.get('branch_number_length', 8)), self.scheme)
+        details['branch'] = request['branch']
+        return details
+
+    async def handle_connection(self, reader, writer):
+        """Answers json requests, one per line, until the client closes the connection."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = self.handle_request(json.loads(line))
+                except Exception as error:
+                    response = {'error': '{}: {}'.format(type(error).__name__, error)}
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+async def start_version_server(repository_directory:str, socket_path:str, scheme:VersionScheme=DEFAULT_VERSION_SCHEME, tag_prefix:str=''):
+    """Starts a version server for the repository on a unix domain socket.
+
+    Args:
+        repository_directory (str): Path to the git repository.
+        socket_path (str): Path of the unix domain socket.
+        scheme (VersionScheme, optional): Version scheme of the tags and the returned versions. Defaults to DEFAULT_VERSION_SCHEME.
+        tag_prefix (str, optional): Tag prefix of the component to answer for. Defaults to '', every tag.
+
+    Returns:
+        asyncio.Server: The started server.
+    """
+    import asyncio
+    version_server = VersionServer(repository_directory, scheme, tag_prefix)
+    return await asyncio.start_unix_server(version_server.handle_connection, path=socket_path)
+
+
+def serve_version_numbers(repository_directory:str, socket_path:str, scheme:VersionScheme=DEFAULT_VERSION_SCHEME, tag_prefix:str=''):
+    """Runs a version server for the repository until interrupted.
+
+    Args:
+        repository_directory (str): Path to the git repository.
+        socket_path (str): Path of the unix domain socket.
+        scheme (VersionScheme, optional): Version scheme of the tags and the returned versions. Defaults to DEFAULT_VERSION_SCHEME.
+        tag_prefix (str, optional): Tag prefix of the component to answer for. Defaults to '', every tag.
+    """
+    import asyncio
+    async def serve():
+        server = await start_version_server(repository_directory, socket_path, scheme, tag_prefix)
+        async with server:
+            await server.serve_forever()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def request_version_numbers_from_server(socket_path:str, current_branches:list, major_minor_patch:str=DEFAULT_MAJOR_MINOR_PATCH, increment_position:str=2, build_number:int=0, length:int=8, details:bool=False):
+    """ Returns the next version numbers from a running version server.
+
+    Args:
+        socket_path (str): Path of the unix domain socket the server listens on.
+        current_branches (list): Branches to return a version number for
+        major_minor_patch (str, optional): Expectation for highest starting major_minor_patch. Defaults to DEFAULT_MAJOR_MINOR_PATCH.
+        increment_position (str, optional): Which position to increment in case of conflict between mainline and release branches. Defaults to 2.
+        build_number (int, optional): Build number (Used for developer branches). Defaults to 0.
+        length (int, optional): Length of unique numbers. Defaults to 8.
+        details (bool, optional): Return the whole response of the server, see VersionServer.handle_request, instead of the version number. Defaults to False.
+
+    Returns:
+        version_numbers (dict): The next version number, or its details, for every branch in current_branches, in the same order.
+    """
+    import socket
+    version_numbers = {}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        with client.makefile('rwb') as stream:
+            for current_branch in current_branches:
+                request = {'branch': current_branch, 'major_minor_patch': major_minor_patch, 'increment_position': increment_position,
+                           'build_number': build_number, 'branch_number_length': length}
+                stream.write(json.dumps(request).encode('utf-8') + b'\n')
+                stream.flush()
+                response = json.loads(stream.readline())
+                if 'error' in response:
+                    raise RuntimeError(response['error'])
+                version_numbers[current_branch] = response if details else response['version']
+    return version_numbers
+
+
+def read_branches_from_file(path:str):
+    """Returns the branch names in a file, one branch per line.
+
+    Args:
+        path (str): Path to the file, - reads from stdin.
+
+    Returns:
+        branches (list): Branch names, empty lines are skipped.
+    """
+    if path == '-':
+        return [line.strip() for line in sys.stdin if line.strip()]
+    with open(path) as reader:
+        return [line.strip() for line in reader if line.strip()]
+
+
+def return_manifest_entry_version(entry:dict):
+    """Returns the next version number for one manifest entry, errors are returned instead of raised.
+
+    Args:
+        entry (dict): directory and branch, optionally major_minor_patch, increment_position, build_number, branch_number_length, cache, ls_remote, ref_backend, scheme and tag_prefix.
+
+    Returns:
+        dict: directory, branch and version, or error when the version could not be calculated.
+    """
+    result = {'directory': entry.get('directory'), 'branch': entry.get('branch')}
+    try:
+        scheme = VERSION_SCHEMES[entry.get('scheme', DEFAULT_VERSION_SCHEME.name)]
+        tag_prefix = entry.get('tag_prefix', '')
+        # true stands for the default remote, like --ls-remote without a value
+        remote = 'origin' if entry.get('ls_remote') is True else entry.get('ls_remote') or None
+        session = RepositorySession(entry['directory'], remote, entry.get('ref_backend'), tag_prefix)
+        branch = entry['branch']
+        if tag_prefix:
+            branch = return_component_branch(branch, tag_prefix)
+            if branch is None:
+                raise ValueError('{} is a release branch of another component than {}'.format(entry['branch'], tag_prefix))
+        if entry.get('cache'):
+            tags = load_version_index(session, scheme=scheme)
+        else:
+            session.load()
+            tags = session.tags
+        result['version'] = return_next_version_number(tags, session.remote_branches, branch,
+                                                       entry.get('major_minor_patch', scheme.default_line), entry.get('increment_position', 2),
+                                                       entry.get('build_number', 0), int(entry.get('branch_number_length', 8)), scheme)
+    except Exception as error:
+        result['error'] = '{}: {}'.format(type(error).__name__, error)
+    return result
+
+
+def iterate_manifest_versions(entries:list, max_workers:int=None):
+    """Calculates the next version number of many repositories in a process pool.
+
+    Args:
+        entries (list): Manifest entries, see return_manifest_entry_version
+        max_workers (int, optional): Number of processes. Defaults to None, the number of CPUs.
+
+    Yields:
+        dict: The result of every entry as soon as it is done, in completion order.
+    """
+    import concurrent.futures
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(return_manifest_entry_version, entry): entry for entry in entries}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as error:
+                entry = futures[future]
+                yield {'directory': entry.get('directory'), 'branch': entry.get('branch'), 'error': '{}: {}'.format(type(error).__name__, error)}
+
+
+def read_manifest(path:str):
+    """Returns the entries of a manifest, a json list of objects.
+
+    Args:
+        path (str): Path to the manifest, - reads from stdin.
+
+    Returns:
+        entries (list): Manifest entries, see return_manifest_entry_version
+    """
+    if path == '-':
+        return json.load(sys.stdin)
+    with open(path) as reader:
+        return json.load(reader)
+
+
+def return_profile_destination(profile:str=None):
+    """Returns where the profile is written, from --profile or else GET_VERSION_NUMBER_PROFILE.
+
+    Args:
+        profile (str, optional): Value of --profile. Defaults to None.
+
+    Returns:
+        str: - for stderr or a file name, None when profiling is off, also when the environment variable is empty, 0, false, no or off.
+    """
+    if profile:
+        return profile
+    destination = os.environ.get(PROFILE_ENVIRONMENT_VARIABLE, '')
+    if destination.strip().lower() in PROFILE_DISABLED_VALUES:
+        return None
+    if destination.strip().lower() in PROFILE_STDERR_VALUES:
+        return '-'
+    return destination
+
+
+def return_argument_parser():
     argparser = argparse.ArgumentParser(description='Get a version number to use for a new release.')
-    argparser.add_argument('-d', '--directory', help='The directory of the git repository.', required=True)
-    argparser.add_argument('-b', '--branch', help='Current branch', required=True)
-    argparser.add_argument('-m', '--major_minor_patch', help='What is the current major minor patch configured as?', required=False, default=DEFAULT_MAJOR_MINOR_PATCH)
+    argparser.add_argument('-d', '--directory', help='The directory of the git repository.')
+    branch_arguments = argparser.add_mutually_exclusive_group()
+    branch_arguments.add_argument('-b', '--branch', help='Current branch')
+    branch_arguments.add_argument('--branches-from', help='File with one branch per line to return version numbers for, - reads from stdin.')
+    argparser.add_argument('-m', '--major_minor_patch', help='What is the current major minor patch configured as? Defaults to the first line of the version scheme.', required=False, default=None)
     argparser.add_argument('-p', '--increment_position', help='What is the position of the version number to increment? When release and mainline version matches.', required=False, default=2)
-    argparser.add_argument('-n', '--build_number', help='Current Build_Number, if not configured the environment variable will be used', required=False, default=0)
+    argparser.add_argument('-n', '--build_number', help='Current Build_Number, if not configured the environment variable will be used', required=False, default=None)
     argparser.add_argument('-l', '--branch_number_length', help='Current Build_Number, if not configured the environment variable will be used', type=int, required=False, default=8)
-    return argparser.parse_args(args)
+    argparser.add_argument('-f', '--format', help='Output format, text or one json record per branch.', choices=['text', 'json'], default='text')
+    argparser.add_argument('-c', '--cache', help='Keep a version index of the tags in the git directory and reuse it while the tags are unchanged.', action='store_true')
+    argparser.add_argument('-r', '--reserve', help='Reserve the version number, so parallel builds on this machine get different numbers until the tag is created.', action='store_true')
+    argparser.add_argument('--release-reservation', help='Release a version number reserved with --reserve, for a build that failed before creating the tag. Reservations also expire after a day.', metavar='VERSION')
+    argparser.add_argument('--profile', help='Write the time and item count of every phase as json to stderr, or to this file. Also enabled by {}.'.format(PROFILE_ENVIRONMENT_VARIABLE), nargs='?', const='-', metavar='FILE')
+    argparser.add_argument('--state-in', help='Previous state written by --state-out, updated with --ref-delta instead of scanning all tags.', metavar='FILE')
+    argparser.add_argument('--state-out', help='Write the highest version per major.minor.patch for the next --state-in.', metavar='FILE')
+    argparser.add_argument('--ref-delta', help='Tags added (+name) and removed (-name) since --state-in, one per line, - reads from stdin.', metavar='FILE')
+    argparser.add_argument('--ls-remote', help='Read tags and branches from the ref advertisement of a remote (default origin) instead of the local refs, nothing is fetched.', nargs='?', const='origin', metavar='REMOTE')
+    argparser.add_argument('--manifest', help='Json list of {"directory": ..., "branch": ...} entries, the version numbers are calculated in parallel and printed as json lines when done.', metavar='FILE')
+    argparser.add_argument('-j', '--jobs', help='Number of processes for --manifest, defaults to the number of CPUs.', type=int)
+    argparser.add_argument('--scheme', help='Version number scheme of the tags: four-digit major.minor.patch.build, three-digit major.minor.build, semver major.minor.patch or calver year.month.micro.', choices=list(VERSION_SCHEMES), default=DEFAULT_VERSION_SCHEME.name)
+    argparser.add_argument('--tag-prefix', help='Only read the tags starting with this prefix, example service-a/ or v, and calculate the version number of that component. Its release branches are named release/<prefix><version>.', default='')
+    argparser.add_argument('--all-components', help='Calculate the version number of every component (tag prefix) in one pass over the tags, the tag to create is printed.', action='store_true')
+    argparser.add_argument('--ref-backend', help='How the local refs are listed, files reads packed-refs and the loose refs directly. Defaults to files, or pygit2 (when installed) and gitpython for worktrees and submodules.', choices=REF_BACKENDS, default=None)
+    argparser.add_argument('--branch-number-table', help='Print the unique number of every feature and developer branch on origin, and the branches sharing a number, as json.', action='store_true')
+    argparser.add_argument('--as-of', help='Calculate the version number as it would have been at a commit (only tags reachable from it count) or at a date given as @<unix time> or ISO 8601 (only tags created before it count).', default=None)
+    argparser.add_argument('--reachable', help='Only count the tags reachable from the head of the branch for mainline and release branches, so tags pushed from unrelated branches do not bump them. The reachability is cached in tag_reachability.json inside the git directory.', action='store_true')
+    argparser.add_argument('--report', help='Print the missing and duplicated build numbers of every version line and the colliding branch numbers as json, the tags are streamed once.', action='store_true')
+    argparser.add_argument('--serve', help='Keep the tags in memory and answer version number requests on this unix domain socket.', metavar='SOCKET')
+    argparser.add_argument('--connect', help='Ask the version server listening on this unix domain socket instead of reading the repository.', metavar='SOCKET')
+    return argparser
+
+
+def parse_arguments(args):
+    argparser = return_argument_parser()
+    arguments = argparser.parse_args(args)
+    if arguments.major_minor_patch is None:
+        arguments.major_minor_patch = VERSION_SCHEMES[arguments.scheme].default_line
+    if arguments.build_number is None:
+        # Only the command line reads the environment, servers and manifest workers use the build number they are given
+        arguments.build_number = os.environ.get('BUILD_NUMBER', 0)
+    if arguments.manifest is not None:
+        return arguments
+    if arguments.directory is None and arguments.connect is None:
+        argparser.error('the following arguments are required: -d/--directory')
+    if (arguments.as_of is not None or arguments.reachable) and arguments.ls_remote is not None:
+        argparser.error('--as-of and --reachable need the local history and cannot be combined with --ls-remote')
+    if arguments.all_components and (arguments.tag_prefix or arguments.reserve or arguments.serve or arguments.connect or arguments.as_of or arguments.reachable
+                                     or arguments.cache or arguments.state_in or arguments.state_out or arguments.report):
+        argparser.error('--all-components reads every tag once and cannot be combined with --tag-prefix, --reserve, --serve, --connect, --as-of, --reachable, --cache, --state-in, --state-out or --report')
+    if arguments.reserve and (arguments.as_of or arguments.reachable or arguments.cache or arguments.ls_remote or arguments.ref_backend or arguments.connect
+                              or arguments.state_in or arguments.state_out or arguments.ref_delta):
+        argparser.error('--reserve reads the current local tags under the journal lock and cannot be combined with --as-of, --reachable, --cache, --ls-remote, --ref-backend, --connect, --state-in, --state-out or --ref-delta')
+    if (arguments.state_in or arguments.state_out) and (arguments.cache or arguments.as_of):
+        argparser.error('--state-in and --state-out keep their own state of the tags and cannot be combined with --cache or --as-of')
+    if (arguments.connect or arguments.serve) and (arguments.as_of is not None or arguments.reachable or arguments.ls_remote is not None):
+        argparser.error('--serve and --connect answer from the current local tags of the server and cannot be combined with --as-of, --reachable or --ls-remote')
+    if arguments.tag_prefix and arguments.connect:
+        argparser.error('--tag-prefix is given to the --serve side, the server answers for its component')
+    if arguments.serve is None and not arguments.branch_number_table and not arguments.report and arguments.release_reservation is None and arguments.branch is None and arguments.branches_from is None:
+        argparser.error('one of the arguments -b/--branch --branches-from is required')
+    return arguments
 
 
 def main():
     arguments = parse_arguments(sys.argv[1:])
-    available_tags = get_tags_as_list_from_repository(arguments.directory)
-    current_remote_branches = get_remote_branches_from_repository(arguments.directory)
-
-    print (return_next_version_number(available_tags, current_remote_branches, arguments.branch, arguments.major_minor_patch, arguments.increment_position, arguments.build_number, arguments.branch_number_length))
+    scheme = VERSION_SCHEMES[arguments.scheme]
+    tag_prefix = arguments.tag_prefix
+    if arguments.serve:
+        serve_version_numbers(arguments.directory, arguments.serve, scheme, tag_prefix)
+        return
+    if arguments.manifest:
+        failed = False
+        for result in iterate_manifest_versions(read_manifest(arguments.manifest), arguments.jobs):
+            failed = failed or 'error' in result
+            print (json.dumps(result), flush=True)
+        if failed:
+            sys.exit(1)
+        return
+    if arguments.release_reservation:
+        if not release_version_number_reservation(arguments.directory, arguments.release_reservation, tag_prefix):
+            sys.stderr.write('Warning: {}{} is not reserved\n'.format(tag_prefix, arguments.release_reservation))
+        return
+    if arguments.branches_from:
+        current_branches = read_branches_from_file(arguments.branches_from)
+    else:
+        current_branches = [arguments.branch] if arguments.branch else []
+    if arguments.branch_number_table:
+        remote_branches = get_remote_branches_from_repository(RepositorySession(arguments.directory, arguments.ls_remote, arguments.ref_backend, tag_prefix))
+        table = return_branch_number_table(remote_branches + current_branches, arguments.branch_number_length)
+        print (json.dumps({'table': table, 'collisions': return_branch_number_collisions(table)}, indent=2))
+        return
+    if arguments.report:
+        session = RepositorySession(arguments.directory, arguments.ls_remote, arguments.ref_backend, tag_prefix)
+        # Local tags are streamed from the refs instead of being listed first
+        tags = session.tags if arguments.ls_remote else iterate_tag_names_from_repository(arguments.directory, backend=arguments.ref_backend, tag_prefix=tag_prefix)
+        print (json.dumps(return_tag_history_report(tags, get_remote_branches_from_repository(session), arguments.branch_number_length, scheme=scheme), indent=2))
+        return
+    if arguments.all_components:
+        session = RepositorySession(arguments.directory, arguments.ls_remote, arguments.ref_backend)
+        session.load()
+        for version in return_component_next_versions(session.tags, session.remote_branches, current_branches, arguments.major_minor_patch, arguments.increment_position, arguments.build_number, arguments.branch_number_length, arguments.format == 'json', scheme):
+            if arguments.format == 'json':
+                print (json.dumps(version))
+            elif arguments.branches_from:
+                print ('{} {}'.format(version['branch'], version['tag']))
+            else:
+                print (version['tag'])
+        return
+
+    profile_destination = return_profile_destination(arguments.profile)
+    profiler = Profiler() if profile_destination else NULL_PROFILER
+
+    # Release branches of a component are named release/<tag_prefix><version>
+    component_branches = {}
+    for current_branch in current_branches:
+        component_branches[current_branch] = return_component_branch(current_branch, tag_prefix) if tag_prefix else current_branch
+        if component_branches[current_branch] is None:
+            return_argument_parser().error('{} is a release branch of another component, the release branches of --tag-prefix {} are named release/{}<version>'.format(current_branch, tag_prefix, tag_prefix))
+
+    if arguments.reserve:
+        version_numbers = {}
+        for current_branch in current_branches:
+            version_numbers[current_branch] = reserve_next_version_number(arguments.directory, component_branches[current_branch], arguments.major_minor_patch, arguments.increment_position, arguments.build_number, arguments.branch_number_length, scheme, tag_prefix)
+    elif arguments.connect:
+        version_numbers = request_version_numbers_from_server(arguments.connect, current_branches, arguments.major_minor_patch, arguments.increment_position, arguments.build_number, arguments.branch_number_length, arguments.format == 'json')
+    elif not arguments.state_out and all(return_branch_category(current_branch) == 'developer' for current_branch in current_branches):
+        # Developer branch versions only depend on the branch name and build number, the repository is never opened
+        # unless --state-out asks for the state file
+        version_numbers = return_next_versions([], [], current_branches, arguments.major_minor_patch, arguments.increment_position, arguments.build_number, arguments.branch_number_length, profiler, arguments.format == 'json', scheme)
+    else:
+        with profiler.phase('repository_open'):
+            session = RepositorySession(arguments.directory, arguments.ls_remote, arguments.ref_backend, tag_prefix)
+        if arguments.as_of:
+            with profiler.phase('as_of_tags') as phase:
+                available_tags = return_component_tags(get_tags_as_of(session, arguments.as_of), tag_prefix)
+                phase['tags'] = len(available_tags)
+        elif arguments.cache:
+            with profiler.phase('version_index_load') as phase:
+                available_tags = load_version_index(session, scheme=scheme)
+                phase['versions'] = len(available_tags.versions)
+        elif arguments.state_in or arguments.state_out:
+            with profiler.phase('version_state') as phase:
+                added, removed = read_ref_delta(arguments.ref_delta) if arguments.ref_delta else ([], [])
+                available_tags = load_version_state(session, arguments.state_in, return_component_tags(added, tag_prefix), return_component_tags(removed, tag_prefix), scheme)
+                phase['prefixes'] = len(available_tags.maxima)
+            if arguments.state_out:
+                save_version_state(available_tags, arguments.state_out)
+        else:
+            # Tags and remote branches are read in the same pass over the refs
+            with profiler.phase('ref_listing') as phase:
+                session.load()
+                available_tags = get_tags_as_list_from_repository(session)
+                phase['tags'] = len(available_tags)
+        with profiler.phase('remote_branch_listing') as phase:
+            current_remote_branches = get_remote_branches_from_repository(session)
+            phase['remote_branches'] = len(current_remote_branches)
+        for collision in return_current_branch_number_collisions(current_remote_branches, current_branches, arguments.branch_number_length):
+            sys.stderr.write('Warning: {} branches {} share the number {}\n'.format(collision['category'], ', '.join(collision['branches']), collision['number']))
+        if arguments.reachable:
+            version_numbers = {}
+            for current_branch in current_branches:
+                branch_tags = available_tags
+                if return_branch_category(current_branch) in ('mainline', 'release'):
+                    with profiler.phase('reachability') as phase:
+                        branch_tags = return_component_tags(get_reachable_tags(session, current_branch), tag_prefix)
+                        if arguments.as_of:
+                            # Both limits apply, the tags reachable from the branch that existed at the as-of point
+                            as_of_tags = set(available_tags)
+                            branch_tags = [tag for tag in branch_tags if tag in as_of_tags]
+                        phase['reachable_tags'] = len(branch_tags)
+                component_branch = component_branches[current_branch]
+                version_numbers[current_branch] = return_next_versions(branch_tags, current_remote_branches, [component_branch], arguments.major_minor_patch, arguments.increment_position, arguments.build_number, arguments.branch_number_length, profiler, arguments.format == 'json', scheme)[component_branch]
+        else:
+            component_versions = return_next_versions(available_tags, current_remote_branches, list(component_branches.values()), arguments.major_minor_patch, arguments.increment_position, arguments.build_number, arguments.branch_number_length, profiler, arguments.format == 'json', scheme)
+            version_numbers = {current_branch: component_versions[component_branch] for current_branch, component_branch in component_branches.items()}
+    if profile_destination:
+        profiler.write(profile_destination)
+
+    for branch, version_number in version_numbers.items():
+        if arguments.format == 'json':
+            # Reserved versions only carry the version number
+            print (json.dumps(dict(version_number, branch=branch) if isinstance(version_number, dict) else {'branch': branch, 'version': version_number}))
+        elif arguments.branches_from:
+            print ('{} {}'.format(branch, version_number))
+        else:
+            print (version_number)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
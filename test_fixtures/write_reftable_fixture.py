@@ -0,0 +1,198 @@
+"""Writes the reftable stack in test_fixtures/reftable_repository.
+
+The tables are laid out like git's reftable writer (reftable/writer.c) writes them, independent of
+write_reftable in benchmark_get_version_number.py: ref blocks padded to the block size, with the
+padding only written when another block follows, restart points every 16 records, a ref index
+when there are more than 3 ref blocks, an obj section when there is a ref index, and a zlib
+compressed log block. Regenerate the fixture with a stack written by git 2.45 or later
+(git init --ref-format=reftable) when one is at hand.
+
+Usage: python write_reftable_fixture.py <repository directory>
+"""
+import os
+import struct
+import sys
+import zlib
+
+BLOCK_SIZE = 4096
+RESTART_INTERVAL = 16
+COMMIT = bytes.fromhex('c3e2ab0d2f35b0ed1ab0f3d4a04e8a1a2a5e5f66')
+TAG = bytes.fromhex('5a0b6f3c1b2e2b96a8f7f4b8a1b7d9c2e04f1d3a')
+
+
+def encode_varint(value:int):
+    """Returns the reftable varint of a value, the continuation bytes are offset by one like git's."""
+    result = [value & 0x7f]
+    value >>= 7
+    while value:
+        value -= 1
+        result.append(0x80 | (value & 0x7f))
+        value >>= 7
+    return bytes(reversed(result))
+
+
+def return_common_prefix_length(first:bytes, second:bytes):
+    """Returns the length of the common prefix of two keys."""
+    length = 0
+    while length < min(len(first), len(second)) and first[length] == second[length]:
+        length += 1
+    return length
+
+
+class BlockWriter:
+    """Collects the prefix compressed records of one block.
+
+    Args:
+        block_type (str): r, i, o or g
+        header_size (int): File header bytes in front of the block, only for the first block.
+        limit (int): Highest block length.
+    """
+
+    def __init__(self, block_type:str, header_size:int, limit:int):
+        self.block_type = block_type
+        self.header_size = header_size
+        self.limit = limit
+        self.records = b''
+        self.restarts = []
+        self.last_key = b''
+        self.entries = 0
+
+    def add(self, key:bytes, extra:int, payload:bytes):
+        """Adds a record, returns False when the block is full."""
+        restart = self.entries % RESTART_INTERVAL == 0
+        prefix_length = 0 if restart else return_common_prefix_length(self.last_key, key)
+        suffix = key[prefix_length:]
+        record = encode_varint(prefix_length) + encode_varint((len(suffix) << 3) | extra) + suffix + payload
+        if self.records and self.header_size + 4 + len(self.records) + len(record) + 3 * (len(self.restarts) + restart) + 2 > self.limit:
+            return False
+        if restart:
+            self.restarts.append(self.header_size + 4 + len(self.records))
+        self.records += record
+        self.last_key = key
+        self.entries += 1
+        return True
+
+    def finish(self):
+        """Returns the block, type, length, records, restart points and their count."""
+        body = self.records + b''.join(offset.to_bytes(3, 'big') for offset in self.restarts) + len(self.restarts).to_bytes(2, 'big')
+        return self.block_type.encode() + (self.header_size + 4 + len(body)).to_bytes(3, 'big') + body
+
+
+def write_table(path:str, refs:list, logs:list, min_update_index:int, max_update_index:int):
+    """Writes a version 1 reftable.
+
+    Args:
+        path (str): Path to the new .ref file.
+        refs (list): Sorted (name, update index, value type, value, object ids) per ref.
+        logs (list): (name, update index, old id, new id, name, email, unix time, time zone offset, message) per reflog entry.
+        min_update_index (int): Lowest update index of the table.
+        max_update_index (int): Highest update index of the table.
+    """
+    header = b'REFT' + bytes([1]) + BLOCK_SIZE.to_bytes(3, 'big') + min_update_index.to_bytes(8, 'big') + max_update_index.to_bytes(8, 'big')
+    data = bytearray(header)
+    padding = [0]
+
+    def write_block(block:bytes, padded:bool):
+        # The padding of the previous block is only written once another block follows it
+        data.extend(b'\0' * padding[0])
+        start = 0 if len(data) == len(header) else len(data)
+        data.extend(block)
+        padding[0] = BLOCK_SIZE - (len(data) - start) if padded else 0
+        return start
+
+    ref_index = []
+    object_blocks = {}
+    writer = BlockWriter('r', len(header), BLOCK_SIZE)
+    block_objects = []
+    for name, update_index, value_type, value, object_ids in refs:
+        payload = encode_varint(update_index - min_update_index) + value
+        if not writer.add(name, value_type, payload):
+            start = write_block(writer.finish(), True)
+            ref_index.append((writer.last_key, start))
+            for object_id in block_objects:
+                object_blocks.setdefault(object_id, set()).add(start)
+            writer = BlockWriter('r', 0, BLOCK_SIZE)
+            block_objects = []
+            writer.add(name, value_type, payload)
+        block_objects.extend(object_ids)
+    start = write_block(writer.finish(), True)
+    ref_index.append((writer.last_key, start))
+    for object_id in block_objects:
+        object_blocks.setdefault(object_id, set()).add(start)
+
+    ref_index_position = 0
+    if len(ref_index) > 3:
+        writer = BlockWriter('i', 0, BLOCK_SIZE)
+        for key, position in ref_index:
+            writer.add(key, 0, encode_varint(position))
+        ref_index_position = write_block(writer.finish(), True)
+
+    object_id_length = 0
+    obj_position = 0
+    if ref_index_position:
+        object_ids = sorted(object_blocks)
+        object_id_length = max(max([return_common_prefix_length(first, second) for first, second in zip(object_ids, object_ids[1:])] or [0]) + 1, 2)
+        writer = BlockWriter('o', 0, BLOCK_SIZE)
+        for object_id in object_ids:
+            positions = sorted(object_blocks[object_id])
+            payload = (encode_varint(len(positions)) if len(positions) > 7 else b'') + encode_varint(positions[0])
+            payload += b''.join(encode_varint(second - first) for first, second in zip(positions, positions[1:]))
+            writer.add(object_id[:object_id_length], len(positions) if len(positions) <= 7 else 0, payload)
+        obj_position = write_block(writer.finish(), True)
+
+    log_position = 0
+    if logs:
+        writer = BlockWriter('g', 0, 1 << 24)
+        for name, update_index, old_id, new_id, who, email, seconds, time_zone, message in sorted(logs, key=lambda log: (log[0], -log[1])):
+            key = name + b'\0' + (0xffffffffffffffff - update_index).to_bytes(8, 'big')
+            payload = old_id + new_id + encode_varint(len(who)) + who + encode_varint(len(email)) + email + encode_varint(seconds)
+            payload += struct.pack('>h', time_zone) + encode_varint(len(message)) + message
+            writer.add(key, 1, payload)
+        block = writer.finish()
+        # The block length of a log block is the uncompressed length, the block is not padded
+        log_position = write_block(block[:4] + zlib.compress(block[4:]), False)
+
+    footer = header + ref_index_position.to_bytes(8, 'big') + ((obj_position << 5) | object_id_length).to_bytes(8, 'big')
+    footer += (0).to_bytes(8, 'big') + log_position.to_bytes(8, 'big') + (0).to_bytes(8, 'big')
+    data.extend(footer + zlib.crc32(footer).to_bytes(4, 'big'))
+    with open(path, 'wb') as writer_file:
+        writer_file.write(data)
+
+
+def write_fixture(repository_directory:str):
+    """Writes the two table stack into repository_directory/reftable.
+
+    The first table holds HEAD, refs/heads/main, refs/remotes/origin/release/4.7.0, the tags 4.7.0.1 to 4.7.0.699
+    and the annotated (peeled) tag 4.7.0.700 with their reflogs. The second table deletes 4.7.0.2 and adds 4.7.0.701.
+
+    Args:
+        repository_directory (str): Directory to write reftable/ into.
+    """
+    update_index = 1
+    refs = [(b'HEAD', 1, 3, encode_varint(len(b'refs/heads/main')) + b'refs/heads/main', []), (b'refs/heads/main', 1, 1, COMMIT, [COMMIT])]
+    for build in range(1, 700):
+        update_index += 1
+        refs.append(('refs/tags/4.7.0.{}'.format(build).encode(), update_index, 1, COMMIT, [COMMIT]))
+    update_index += 1
+    refs.append((b'refs/tags/4.7.0.700', update_index, 2, TAG + COMMIT, [TAG, COMMIT]))
+    update_index += 1
+    refs.append((b'refs/remotes/origin/release/4.7.0', update_index, 1, COMMIT, [COMMIT]))
+    refs.sort(key=lambda ref: ref[0])
+    zero_id = b'\0' * 20
+    logs = [(b'HEAD', 1, zero_id, COMMIT, b'test', b'test@localhost', 1700000000, 0, b'commit (initial): Initial commit\n'),
+            (b'refs/heads/main', 1, zero_id, COMMIT, b'test', b'test@localhost', 1700000000, 0, b'commit (initial): Initial commit\n'),
+            (b'refs/remotes/origin/release/4.7.0', update_index, zero_id, COMMIT, b'test', b'test@localhost', 1700000100, 0, b'update by push\n')]
+    os.makedirs(os.path.join(repository_directory, 'reftable'), exist_ok=True)
+    first = '0x000000000001-0x{:012x}-5c1d4e2a.ref'.format(update_index)
+    write_table(os.path.join(repository_directory, 'reftable', first), refs, logs, 1, update_index)
+    second_update_index = update_index + 1
+    second = '0x{:012x}-0x{:012x}-9b3f07c4.ref'.format(second_update_index, second_update_index + 1)
+    write_table(os.path.join(repository_directory, 'reftable', second),
+                [(b'refs/tags/4.7.0.2', second_update_index, 0, b'', []), (b'refs/tags/4.7.0.701', second_update_index + 1, 1, COMMIT, [COMMIT])],
+                [], second_update_index, second_update_index + 1)
+    with open(os.path.join(repository_directory, 'reftable', 'tables.list'), 'w') as writer:
+        writer.write(first + '\n' + second + '\n')
+
+
+if __name__ == "__main__":
+    write_fixture(sys.argv[1])
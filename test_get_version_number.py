@@ -1,8 +1,16 @@
 import get_version_number
+import benchmark_get_version_number
 import pytest
 import shutil
 import git
 import os
+import asyncio
+import tempfile
+import threading
+import subprocess
+import sys
+import json
+import time
 
 def __initialize_git_repo(repository_path='./tmp/test_repository'):
     filename = "repostory_filename.txt"
@@ -485,4 +493,662 @@ def test_major_minor_patch_in_fresh_repository():
 def test_hash_text_to_8_digits_branch_with_similar_names_does_not_colide():
     first = get_version_number.hash_text_to_8_digits('HERMESSW-1234')
     second = get_version_number.hash_text_to_8_digits('HERMESSW-4321')
-    assert first != second
\ No newline at end of file
+    assert first != second
+
+def test_get_tags_as_list_from_repository_packed_and_loose_tags():
+    expected_result = ['4.5.0.1', '4.6.0.1', 'TEST-1234']
+    repository = __initialize_git_repo()
+    repository.create_tag("4.5.0.1")
+    repository.create_tag("TEST-1234")
+    repository.git.pack_refs(all=True)
+    repository.create_tag("4.6.0.1")
+    result = get_version_number.get_tags_as_list_from_repository(repository.working_dir)
+    assert result == expected_result
+
+def test_iterate_tag_names_from_repository_filtered():
+    expected_result = ['4.5.0.1', '4.6.0.1']
+    repository = __initialize_git_repo()
+    repository.create_tag("4.5.0.1")
+    repository.create_tag("TEST-1234")
+    repository.git.pack_refs(all=True)
+    repository.create_tag("4.6.0.1")
+    result = list(get_version_number.iterate_tag_names_from_repository(repository.working_dir, filtered=True))
+    assert result == expected_result
+
+def test_get_tags_as_list_from_repository_worktree_falls_back_to_gitpython():
+    expected_result = ['4.5.0.1', '4.6.0.1']
+    repository = __initialize_git_repo()
+    worktree_path = os.path.abspath('./tmp/test_worktree')
+    shutil.rmtree(worktree_path, ignore_errors=True)
+    repository.git.worktree('prune')
+    repository.create_tag("4.5.0.1")
+    repository.create_tag("4.6.0.1")
+    repository.git.worktree('add', worktree_path)
+    assert get_version_number.return_git_directory(worktree_path) is None
+    result = get_version_number.get_tags_as_list_from_repository(worktree_path)
+    assert result == expected_result
+
+def test_repository_session_shares_tags_and_remote_branches():
+    repository1 = __initialize_git_repo('./tmp/test_repository1')
+    repository2_path = "./tmp/test_repository2"
+    shutil.rmtree(repository2_path, ignore_errors=True)
+    repository1.create_head("release/4.5.0")
+    repository1.create_tag("4.5.0.1")
+    git.Repo.clone_from(repository1.working_dir, repository2_path)
+    session = get_version_number.RepositorySession(repository2_path)
+    assert get_version_number.get_tags_as_list_from_repository(session) == ['4.5.0.1']
+    assert get_version_number.get_remote_branches_from_repository(session) == ['HEAD', 'master', 'release/4.5.0']
+    assert session._repo is None
+
+def test_version_index_highest_with_prefix():
+    index = get_version_number.VersionIndex.from_tags(['4.7.0.9', '4.7.0.10', '4.8.0.1', 'TEST-1234'])
+    assert index.highest() == (4, 8, 0, 1)
+    assert index.highest_with_prefix((4, 7, 0)) == (4, 7, 0, 10)
+    assert index.highest_with_prefix((4, 7)) == (4, 7, 0, 10)
+    assert index.highest_with_prefix((4, 9, 0)) is None
+
+def test_return_next_version_number_from_version_index():
+    tags = ['1.0.0.1', '1.0.0.2', '1.0.0.3', '1.0.1.1', 'TEST-1234', '0.0.70988576.1']
+    branches = ['release/1.0.1', 'TOOLS-1234']
+    index = get_version_number.VersionIndex.from_tags(tags)
+    for current_branch in ['main', 'release/1.0.1', 'release/1.2.0', 'feature/fishtank', 'TOOLS-1234']:
+        expected_result = get_version_number.return_next_version_number(tags, branches, current_branch, '1.0.0', 2, 1)
+        result = get_version_number.return_next_version_number(index, branches, current_branch, '1.0.0', 2, 1)
+        assert result == expected_result
+
+def test_load_version_index_cache_is_refreshed_when_tags_change():
+    repository = __initialize_git_repo()
+    repository.create_tag("4.5.0.1")
+    repository.git.pack_refs(all=True)
+    index = get_version_number.load_version_index(repository.working_dir)
+    assert os.path.exists(os.path.join(repository.git_dir, get_version_number.VERSION_INDEX_CACHE_FILENAME))
+    assert get_version_number.load_version_index(repository.working_dir).versions == index.versions == [(4, 5, 0, 1)]
+    repository.create_tag("4.5.0.2")
+    assert get_version_number.load_version_index(repository.working_dir).highest() == (4, 5, 0, 2)
+
+def test_load_version_index_keeps_a_cache_per_tag_prefix(monkeypatch):
+    repository = __initialize_git_repo()
+    for tag in ['service-a/1.0.0.1', 'service-b/2.0.0.1']:
+        repository.create_tag(tag)
+    sessions = [get_version_number.RepositorySession(repository.working_dir, tag_prefix=tag_prefix) for tag_prefix in ['service-a/', 'service-b/']]
+    assert [get_version_number.load_version_index(session).highest() for session in sessions] == [(1, 0, 0, 1), (2, 0, 0, 1)]
+    assert os.path.exists(os.path.join(repository.git_dir, 'version_index.service-a%2F.json'))
+    def rebuild(*args):
+        raise AssertionError('the cache was not used')
+    monkeypatch.setattr(get_version_number.VersionIndex, 'from_tags', rebuild)
+    sessions = [get_version_number.RepositorySession(repository.working_dir, tag_prefix=tag_prefix) for tag_prefix in ['service-a/', 'service-b/']]
+    assert [get_version_number.load_version_index(session).highest() for session in sessions] == [(1, 0, 0, 1), (2, 0, 0, 1)]
+
+def test_return_highest_version_number_from_list_does_not_modify_list():
+    versions = ['4.98.0.197', '4.111.0.199']
+    result = get_version_number.return_highest_version_number_from_list(versions)
+    assert result == '4.111.0.199'
+    assert versions == ['4.98.0.197', '4.111.0.199']
+
+def test_increment_version_digit_tuple():
+    expected_result = (4, 10, 0, 1)
+    result = get_version_number.increment_version_digit_tuple((4, 9, 3, 21), 1, 2)
+    assert result == expected_result
+
+def test_increment_last_digit_in_version_tuple():
+    expected_result = (4, 7, 0, 201)
+    result = get_version_number.increment_last_digit_in_version_tuple((4, 7, 0, 200), 1)
+    assert result == expected_result
+
+def test_scan_version_tags_streams_tags():
+    tags = iter(['4.7.0.9', 'TEST-1234', '4.7.0.10', '4.70.0.1', '4.8.0.1', '0.0.70988576.1'])
+    result = get_version_number.scan_version_tags(tags, [(4, 7, 0), (4, 9, 0)])
+    assert result.highest() == (4, 70, 0, 1)
+    assert result.highest_with_prefix((4, 7, 0)) == (4, 7, 0, 10)
+    assert result.highest_with_prefix((4, 9, 0)) is None
+    assert result.count == 5
+
+def test_return_next_version_number_release_branch_does_not_match_longer_digit():
+    expected_result = '4.7.0.1'
+    tags = ['4.70.0.5']
+    branches = []
+    current_branch = 'release/4.7.0'
+    major_minor_patch = ''
+    increment_position = 2
+    build_number = 1
+    result = get_version_number.return_next_version_number(tags, branches, current_branch, major_minor_patch, increment_position, build_number)
+    assert result == expected_result
+
+def test_version_index_versions_with_prefix():
+    expected_result = [(4, 7, 0, 9), (4, 7, 0, 10), (4, 7, 1, 1)]
+    index = get_version_number.VersionIndex.from_tags(['4.7.0.9', '4.7.0.10', '4.7.1.1', '4.70.0.1', '4.6.0.1'])
+    result = index.versions_with_prefix((4, 7))
+    assert result == expected_result
+    assert index.highest_with_prefix((4, 7)) == (4, 7, 1, 1)
+    assert index.highest_with_prefix((4, 7, 1, 1)) == (4, 7, 1, 1)
+    assert index.highest_with_prefix((5,)) is None
+
+def test_release_branch_index_owner():
+    release_branch_index = get_version_number.ReleaseBranchIndex(['release/4.7.0', 'release/5.0', 'release/next', 'main'])
+    assert release_branch_index.owner((4, 7, 0, 12)) == 'release/4.7.0'
+    assert release_branch_index.owner((5, 0, 3, 1)) == 'release/5.0'
+    assert release_branch_index.owner((4, 70, 0, 1)) is None
+
+def test_return_next_versions_matches_return_next_version_number():
+    tags = ['1.0.0.1', '1.0.0.2', '1.0.0.3', '1.0.1.1', 'TEST-1234', '0.0.70988576.1']
+    branches = ['release/1.0.1', 'TOOLS-1234']
+    current_branches = ['main', 'release/1.0.1', 'release/1.2.0', 'feature/fishtank', 'TOOLS-1234']
+    expected_result = {}
+    for current_branch in current_branches:
+        expected_result[current_branch] = get_version_number.return_next_version_number(tags, branches, current_branch, '1.0.0', 2, 1)
+    result = get_version_number.return_next_versions(tags, branches, current_branches, '1.0.0', 2, 1)
+    assert result == expected_result
+    assert list(result) == current_branches
+
+def test_parse_arguments_branch_and_branches_from_are_exclusive():
+    commandline_parameters = ['-d', '1', '-b', 'main', '--branches-from', '-']
+    with pytest.raises(SystemExit):
+        get_version_number.parse_arguments(commandline_parameters)
+
+def test_parse_arguments_branches_from():
+    commandline_parameters = ['-d', '1', '--branches-from', 'branches.txt', '--format', 'json']
+    result = get_version_number.parse_arguments(commandline_parameters)
+    assert [result.branch, result.branches_from, result.format] == [None, 'branches.txt', 'json']
+
+async def __stop_version_server(server):
+    server.close()
+    await server.wait_closed()
+    await asyncio.gather(*(task for task in asyncio.all_tasks() if task is not asyncio.current_task()))
+
+def test_version_server_answers_and_reloads_changed_tags():
+    repository = __initialize_git_repo()
+    repository.create_tag("4.5.0.1")
+    socket_directory = tempfile.mkdtemp()
+    socket_path = os.path.join(socket_directory, 'version.sock')
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(get_version_number.start_version_server(repository.working_dir, socket_path))
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    try:
+        result = get_version_number.request_version_numbers_from_server(socket_path, ['main', 'feature/fishtank'])
+        assert result == {'main': '4.5.0.2', 'feature/fishtank': '0.0.70988576.1'}
+        repository.create_tag("4.5.0.2")
+        result = get_version_number.request_version_numbers_from_server(socket_path, ['main'])
+        assert result == {'main': '4.5.0.3'}
+        result = get_version_number.request_version_numbers_from_server(socket_path, ['main'], details=True)
+        assert [result['main'][key] for key in ['branch', 'category', 'version', 'highest_tag']] == ['main', 'mainline', '4.5.0.3', '4.5.0.2']
+    finally:
+        asyncio.run_coroutine_threadsafe(__stop_version_server(server), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+        shutil.rmtree(socket_directory, ignore_errors=True)
+
+def test_version_server_uses_the_build_number_of_the_request(monkeypatch):
+    expected_result = {'branch': 'TOOLS-1', 'version': '99.40639147.0.9', 'build_number': 9}
+    repository = __initialize_git_repo()
+    monkeypatch.setenv('BUILD_NUMBER', '5')
+    server = get_version_number.VersionServer(repository.working_dir)
+    response = server.handle_request({'branch': 'TOOLS-1', 'build_number': 9})
+    result = {key: response[key] for key in expected_result}
+    assert result == expected_result
+
+def test_developer_branch_keeps_a_dotted_build_number():
+    expected_result = {'version': '99.40639147.0.20240301.1', 'build_number': '20240301.1'}
+    details = get_version_number.return_next_version_details([], [], 'TOOLS-1', '', 2, '20240301.1')
+    result = {key: details[key] for key in expected_result}
+    assert result == expected_result
+    environment = dict(os.environ, BUILD_NUMBER='20240301.1')
+    result = subprocess.run([sys.executable, 'get_version_number.py', '-d', './tmp/does_not_exist', '-b', 'TOOLS-1'], capture_output=True, text=True, env=environment, check=True)
+    assert result.stdout.strip() == '99.40639147.0.20240301.1'
+
+def test_reserve_next_version_number_is_unique_for_parallel_builds():
+    expected_result = ['4.5.0.{}'.format(build) for build in range(2, 22)]
+    repository = __initialize_git_repo()
+    repository.create_tag("4.5.0.1")
+    results = []
+    def reserve():
+        results.append(get_version_number.reserve_next_version_number(repository.working_dir, 'main', '', 2, 1))
+    threads = [threading.Thread(target=reserve) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results, key=get_version_number.return_version_tuple) == expected_result
+
+def test_reserve_next_version_number_forgets_reservations_once_tagged():
+    repository = __initialize_git_repo()
+    assert get_version_number.reserve_next_version_number(repository.working_dir, 'main', '', 2, 1) == '0.1.0.1'
+    repository.create_tag("0.1.0.1")
+    assert get_version_number.reserve_next_version_number(repository.working_dir, 'main', '', 2, 1) == '0.1.0.2'
+    journal_path = os.path.join(repository.git_dir, get_version_number.RESERVATION_JOURNAL_FILENAME)
+    assert [tag for tag, _, _ in get_version_number.read_reservation_journal(journal_path)] == ['0.1.0.2']
+
+def test_reserved_version_numbers_expire_or_are_released():
+    repository = __initialize_git_repo()
+    journal_path = os.path.join(repository.git_dir, get_version_number.RESERVATION_JOURNAL_FILENAME)
+    get_version_number.write_reservation_journal(journal_path, [['0.1.0.1', time.time() - get_version_number.RESERVATION_EXPIRY_SECONDS - 1, 'build:1']])
+    assert get_version_number.reserve_next_version_number(repository.working_dir, 'main', '', 2, 1, owner='build:2') == '0.1.0.1'
+    assert get_version_number.reserve_next_version_number(repository.working_dir, 'main', '', 2, 1, owner='build:3') == '0.1.0.2'
+    assert [[tag, owner] for tag, _, owner in get_version_number.read_reservation_journal(journal_path)] == [['0.1.0.1', 'build:2'], ['0.1.0.2', 'build:3']]
+    assert get_version_number.release_version_number_reservation(repository.working_dir, '0.1.0.2')
+    assert not get_version_number.release_version_number_reservation(repository.working_dir, '0.1.0.2')
+    assert get_version_number.reserve_next_version_number(repository.working_dir, 'main', '', 2, 1) == '0.1.0.2'
+
+def test_developer_branch_cli_does_not_import_gitpython_or_open_repository():
+    expected_result = '99.76319135.0.7'
+    environment = dict(os.environ, BUILD_NUMBER='7')
+    result = subprocess.run([sys.executable, '-X', 'importtime', 'get_version_number.py', '-d', './tmp/does_not_exist', '-b', 'TOOLS-1234'],
+                            capture_output=True, text=True, env=environment, check=True)
+    imported_modules = [line.split('|')[-1].strip() for line in result.stderr.splitlines() if line.startswith('import time:')]
+    assert result.stdout.strip() == expected_result
+    assert 'git' not in imported_modules
+    assert 'asyncio' not in imported_modules
+
+def test_synthetic_benchmark_repository_is_read_like_git():
+    repository_path = './tmp/test_synthetic_repository'
+    refs = benchmark_get_version_number.create_synthetic_repository(repository_path, 2000, loose_fraction=0.1)
+    session = get_version_number.RepositorySession(repository_path)
+    session.load()
+    expected_tags = git.Repo(repository_path).git.for_each_ref('refs/tags', format='%(refname:strip=2)').splitlines()
+    assert session.tags == expected_tags
+    assert len(session.tags) == refs['tags']
+    assert len(session.remote_branches) == refs['remote_branches']
+
+def test_return_profile_destination_off_and_stderr_values(monkeypatch):
+    monkeypatch.delenv(get_version_number.PROFILE_ENVIRONMENT_VARIABLE, raising=False)
+    assert get_version_number.return_profile_destination() is None
+    assert get_version_number.return_profile_destination('profile.json') == 'profile.json'
+    for value in ['', '0', 'false', 'False', 'no', 'off']:
+        monkeypatch.setenv(get_version_number.PROFILE_ENVIRONMENT_VARIABLE, value)
+        assert get_version_number.return_profile_destination() is None
+    for value in ['1', 'true', 'True', 'yes', 'on']:
+        monkeypatch.setenv(get_version_number.PROFILE_ENVIRONMENT_VARIABLE, value)
+        assert get_version_number.return_profile_destination() == '-'
+    monkeypatch.setenv(get_version_number.PROFILE_ENVIRONMENT_VARIABLE, 'profile.json')
+    assert get_version_number.return_profile_destination() == 'profile.json'
+
+def test_return_next_versions_records_profile_phases():
+    expected_result = ['release_branch_matching', 'version_scan', 'version_selection']
+    profiler = get_version_number.Profiler()
+    tags = ['1.0.0.1', '1.0.0.2', 'TEST-1234']
+    get_version_number.return_next_versions(tags, ['release/1.0.0'], ['main', 'release/1.0.0'], '', 2, 1, profiler=profiler)
+    report = profiler.report()
+    assert [phase['phase'] for phase in report['phases']] == expected_result
+    assert report['phases'][1]['matched_tags'] == 2
+    assert report['phases'][2]['branches'] == 2
+
+def test_repository_session_reads_refs_from_remote_of_shallow_clone():
+    repository1 = __initialize_git_repo('./tmp/test_repository1')
+    repository1.create_tag("4.5.0.1")
+    with repository1.git.custom_environment(GIT_COMMITTER_NAME='test', GIT_COMMITTER_EMAIL='test@localhost'):
+        repository1.create_tag("4.5.0.2", message="Annotated tag")
+    repository1.create_head("release/4.5.0")
+    repository2_path = "./tmp/test_repository2"
+    shutil.rmtree(repository2_path, ignore_errors=True)
+    git.Repo.clone_from('file://{}'.format(os.path.abspath(repository1.working_dir)), repository2_path, depth=1, single_branch=True, no_tags=True)
+    assert get_version_number.get_tags_as_list_from_repository(repository2_path) == []
+    session = get_version_number.RepositorySession(repository2_path, remote='origin')
+    assert session.tags == ['4.5.0.1', '4.5.0.2']
+    assert session.remote_branches == ['master', 'release/4.5.0']
+    result = get_version_number.return_next_version_number(session.tags, session.remote_branches, 'main', '', 2, 1)
+    assert result == '4.6.0.1'
+
+def test_version_maxima_apply_tag_delta():
+    state = get_version_number.scan_version_tags(['4.7.0.1', '4.7.0.2', '4.8.0.1', 'TEST-1234'])
+    state = get_version_number.VersionMaxima.from_dict(state.to_dict())
+    assert state.apply_tag_delta(['4.7.0.3', '4.9.0.1', 'TEST-4321'], ['4.7.0.1'])
+    assert state.highest() == (4, 9, 0, 1)
+    assert state.highest_with_prefix((4, 7, 0)) == (4, 7, 0, 3)
+    assert state.highest_with_prefix((4, 7)) == (4, 7, 0, 3)
+    assert state.highest_with_prefix((5, 0, 0)) is None
+    assert not state.apply_tag_delta([], ['4.9.0.1'])
+
+def test_load_version_state_uses_previous_state_and_ref_delta():
+    tags = ['1.0.0.1', '1.0.0.2', '1.0.0.3', '1.0.1.1']
+    branches = ['release/1.0.1']
+    repository = __initialize_git_repo()
+    for tag in tags:
+        repository.create_tag(tag)
+    state_path = './tmp/test_version_state.json'
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    state = get_version_number.load_version_state(repository.working_dir, state_path)
+    get_version_number.save_version_state(state, state_path)
+    repository.create_tag('1.1.0.1')
+    state = get_version_number.load_version_state(repository.working_dir, state_path, ['1.1.0.1'], [])
+    for current_branch in ['main', 'release/1.0.1', 'release/1.1.0']:
+        expected_result = get_version_number.return_next_version_number(tags + ['1.1.0.1'], branches, current_branch, '', 2, 1)
+        result = get_version_number.return_next_version_number(state, branches, current_branch, '', 2, 1)
+        assert result == expected_result
+
+def test_version_state_is_only_reused_for_the_same_tag_prefix():
+    repository = __initialize_git_repo()
+    for tag in ['service-a/1.0.0.1', '2.0.0.1']:
+        repository.create_tag(tag)
+    state_path = './tmp/test_version_state.json'
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    get_version_number.save_version_state(get_version_number.load_version_state(repository.working_dir, state_path), state_path)
+    state = get_version_number.load_version_state(get_version_number.RepositorySession(repository.working_dir, tag_prefix='service-a/'), state_path)
+    assert [state.tag_prefix, state.highest()] == ['service-a/', (1, 0, 0, 1)]
+    assert get_version_number.VersionMaxima.from_dict(state.to_dict()).tag_prefix == 'service-a/'
+
+def test_parse_arguments_server_rejects_other_tag_sources():
+    for server_option in [['--connect', 'version.sock', '-b', 'main'], ['-d', '1', '--serve', 'version.sock']]:
+        for option in [['--as-of', 'HEAD~1'], ['--reachable'], ['--ls-remote']]:
+            with pytest.raises(SystemExit):
+                get_version_number.parse_arguments(server_option + option)
+
+def test_parse_arguments_state_rejects_cache_and_as_of():
+    for option in [['--cache'], ['--as-of', 'HEAD~1']]:
+        for state_option in [['--state-out', 'state.json'], ['--state-in', 'state.json']]:
+            with pytest.raises(SystemExit):
+                get_version_number.parse_arguments(['-d', '1', '-b', 'main'] + option + state_option)
+
+def test_developer_branch_cli_writes_state_out():
+    repository = __initialize_git_repo()
+    repository.create_tag('1.0.0.1')
+    state_path = os.path.abspath('./tmp/test_developer_version_state.json')
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    result = subprocess.run([sys.executable, 'get_version_number.py', '-d', repository.working_dir, '-b', 'TOOLS-1234', '-n', '7', '--state-out', state_path],
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '99.76319135.0.7'
+    with open(state_path) as reader:
+        assert json.load(reader)['highest'] == '1.0.0.1'
+
+def test_iterate_manifest_versions_reports_failures_without_aborting():
+    repository = __initialize_git_repo()
+    repository.create_tag("4.5.0.1")
+    entries = [{'directory': repository.working_dir, 'branch': 'main'},
+               {'directory': './tmp/does_not_exist', 'branch': 'main'},
+               {'directory': repository.working_dir, 'branch': 'release/4.5.0', 'major_minor_patch': ''}]
+    results = list(get_version_number.iterate_manifest_versions(entries, max_workers=2))
+    versions = sorted((result['branch'], result.get('version', '')) for result in results)
+    assert versions == [('main', ''), ('main', '4.5.0.2'), ('release/4.5.0', '4.5.0.2')]
+    assert ['error' in result for result in results].count(True) == 1
+
+def test_manifest_entry_uses_its_build_number_and_ls_remote_true(monkeypatch):
+    expected_result = [{'directory': './tmp/test_repository2', 'branch': 'TOOLS-1', 'version': '99.40639147.0.9'},
+                       {'directory': './tmp/test_repository2', 'branch': 'main', 'version': '4.5.0.2'}]
+    repository1 = __initialize_git_repo('./tmp/test_repository1')
+    repository1.create_tag("4.5.0.1")
+    repository2_path = "./tmp/test_repository2"
+    shutil.rmtree(repository2_path, ignore_errors=True)
+    git.Repo.clone_from('file://{}'.format(os.path.abspath(repository1.working_dir)), repository2_path, depth=1, single_branch=True, no_tags=True)
+    monkeypatch.setenv('BUILD_NUMBER', '5')
+    entries = [{'directory': repository2_path, 'branch': 'TOOLS-1', 'build_number': 9},
+               {'directory': repository2_path, 'branch': 'main', 'ls_remote': True}]
+    result = sorted(get_version_number.iterate_manifest_versions(entries, max_workers=2), key=lambda result: result['branch'])
+    assert result == expected_result
+
+def test_bulk_version_helpers_without_numpy():
+    tags = ['1.0.0.1', '1.0.0.3', '1.0.0.01', '1.0.1.2', '2.0.0.5', 'TEST-1234']
+    versions = get_version_number.parse_version_array(tags, use_numpy=False)
+    assert get_version_number.return_grouped_highest_versions(versions) == [(1, 0, 0, 3), (1, 0, 1, 2), (2, 0, 0, 5)]
+    assert get_version_number.filter_version_array(versions, (1, 0, 1)) == [(1, 0, 1, 2)]
+    assert get_version_number.return_duplicate_versions(versions) == [(1, 0, 0, 1)]
+    assert get_version_number.return_version_gap_counts(versions) == {(1, 0, 0): 1, (1, 0, 1): 1, (2, 0, 0): 4}
+
+def test_parse_version_array_with_digits_beyond_int64():
+    pytest.importorskip('numpy')
+    tags = ['1.2.3.4', '1.2.3.99999999999999999999']
+    assert get_version_number.parse_version_array(tags) == [(1, 2, 3, 4), (1, 2, 3, 99999999999999999999)]
+    with pytest.raises(ValueError, match='1.2.3.99999999999999999999'):
+        get_version_number.parse_version_array(tags, use_numpy=True)
+
+def test_bulk_version_helpers_with_numpy_match_pure_python():
+    pytest.importorskip('numpy')
+    tags = ['1.0.0.1', '1.0.0.3', '1.0.0.01', '1.0.1.2', '2.0.0.5', '0.0.70988576.1', 'TEST-1234']
+    expected = get_version_number.parse_version_array(tags, use_numpy=False)
+    versions = get_version_number.parse_version_array(tags, use_numpy=True)
+    assert versions.shape == (6, 4)
+    assert [tuple(row) for row in get_version_number.sort_version_array(versions).tolist()] == get_version_number.sort_version_array(expected)
+    assert [tuple(row) for row in get_version_number.return_grouped_highest_versions(versions).tolist()] == get_version_number.return_grouped_highest_versions(expected)
+    assert [tuple(row) for row in get_version_number.return_duplicate_versions(versions).tolist()] == get_version_number.return_duplicate_versions(expected)
+    assert get_version_number.return_version_gap_counts(versions) == get_version_number.return_version_gap_counts(expected)
+
+def test_return_branch_number_collisions():
+    expected_result = [{'category': 'feature', 'number': 2, 'branches': ['feature/0', 'feature/4']}]
+    table = get_version_number.return_branch_number_table(['main', 'release/1.0.0', 'feature/0', 'feature/1', 'feature/4', 'feature/5', 'TOOLS-1'], 1)
+    assert sorted(table) == ['TOOLS-1', 'feature/0', 'feature/1', 'feature/4', 'feature/5']
+    result = get_version_number.return_branch_number_collisions(table)
+    assert result == expected_result
+
+def test_return_current_branch_number_collisions():
+    expected_result = [{'category': 'feature', 'number': 2, 'branches': ['feature/0', 'feature/4']}]
+    branches = ['main', 'release/1.0.0', 'feature/0', 'feature/1', 'feature/4', 'feature/5', 'TOOLS-1']
+    assert get_version_number.return_current_branch_number_collisions(branches, ['feature/4'], 1) == expected_result
+    assert get_version_number.return_current_branch_number_collisions(branches, ['feature/1'], 1) == []
+    assert get_version_number.return_current_branch_number_collisions(branches, ['main', 'release/1.0.0'], 1) == []
+
+def test_return_next_version_details_mainline_release_branch():
+    expected_result = {'branch': 'main', 'category': 'mainline', 'version': '1.3.0.1', 'highest_tag': '1.2.0.3', 'release_branch': 'release/1.2.0',
+                       'branch_number': None, 'major_minor_patch': None, 'build_number': None}
+    tags = ['1.1.0.1', '1.2.0.1', '1.2.0.3', 'not-a-version']
+    branches = ['main', 'release/1.2.0']
+    result = get_version_number.return_next_version_details(tags, branches, 'main', '', 2, 1)
+    assert result == expected_result
+
+def test_return_next_version_details_feature():
+    branch_number = get_version_number.hash_text_to_8_digits('feature/details', 8)
+    expected_result = ['0.0.{}.3'.format(branch_number), '0.0.{}.2'.format(branch_number), branch_number, None]
+    tags = ['0.0.{}.1'.format(branch_number), '0.0.{}.2'.format(branch_number)]
+    result = get_version_number.return_next_version_details(tags, [], 'feature/details', '', 1, 1)
+    assert [result['version'], result['highest_tag'], result['branch_number'], result['release_branch']] == expected_result
+
+def test_ref_backends_list_the_same_refs():
+    repository_path = './tmp/test_synthetic_repository'
+    benchmark_get_version_number.create_synthetic_repository(repository_path, 500, loose_fraction=0.1)
+    expected_result = list(get_version_number.iterate_refs_from_repository(repository_path, ('refs/tags/', 'refs/remotes/origin/'), 'files'))
+    backends = ['gitpython']
+    try:
+        import pygit2
+        backends.append('pygit2')
+    except ImportError:
+        pass
+    for backend in backends:
+        session = get_version_number.RepositorySession(repository_path, backend=backend)
+        session.load()
+        assert sorted(['refs/tags/' + tag for tag in session.tags] + ['refs/remotes/origin/' + branch for branch in session.remote_branches]) == expected_result
+    with pytest.raises(ValueError):
+        get_version_number.return_ref_backend(repository_path, 'reftable')
+
+def test_reftable_stack_is_read_with_prefix_seeks():
+    # The fixture stack has padded ref blocks with a ref index, obj and log sections, and a second table deleting 4.7.0.2
+    expected_tags = sorted('4.7.0.{}'.format(build) for build in range(1, 702) if build != 2)
+    repository_path = './tmp/test_reftable_fixture_repository'
+    shutil.rmtree(repository_path, ignore_errors=True)
+    subprocess.run(['git', 'init', '-q', '--bare', repository_path], check=True)
+    subprocess.run(['git', '-C', repository_path, 'config', 'core.repositoryformatversion', '1'], check=True)
+    subprocess.run(['git', '-C', repository_path, 'config', 'extensions.refStorage', 'reftable'], check=True)
+    shutil.copytree(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_fixtures', 'reftable_repository', 'reftable'), os.path.join(repository_path, 'reftable'))
+    session = get_version_number.RepositorySession(repository_path)
+    session.load()
+    assert session.tags == expected_tags
+    assert session.remote_branches == ['release/4.7.0']
+    result = list(get_version_number.iterate_refs_from_git_directory(repository_path, ('refs/tags/4.7.0.69', 'refs/tags/4.7.0.70')))
+    assert result == ['refs/tags/4.7.0.69'] + ['refs/tags/4.7.0.69{}'.format(build) for build in range(10)] + ['refs/tags/4.7.0.70'] + ['refs/tags/4.7.0.70{}'.format(build) for build in range(2)]
+    assert get_version_number.return_next_version_number(session.tags, session.remote_branches, 'release/4.7.0', '', 2, 1) == '4.7.0.702'
+
+def test_reftable_fixture_is_written_by_its_script():
+    fixture_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_fixtures')
+    repository_path = './tmp/test_reftable_fixture_script'
+    shutil.rmtree(repository_path, ignore_errors=True)
+    subprocess.run([sys.executable, os.path.join(fixture_directory, 'write_reftable_fixture.py'), repository_path], check=True)
+    for name in os.listdir(os.path.join(fixture_directory, 'reftable_repository', 'reftable')):
+        with open(os.path.join(fixture_directory, 'reftable_repository', 'reftable', name), 'rb') as expected, open(os.path.join(repository_path, 'reftable', name), 'rb') as result:
+            assert result.read() == expected.read()
+
+def test_reftable_repository_created_by_git():
+    repository_path = os.path.abspath('./tmp/test_reftable_git_repository')
+    shutil.rmtree(repository_path, ignore_errors=True)
+    if subprocess.run(['git', 'init', '-q', '--ref-format=reftable', repository_path], capture_output=True).returncode != 0:
+        pytest.skip('git does not support reftable')
+    environment = dict(os.environ, GIT_AUTHOR_NAME='test', GIT_AUTHOR_EMAIL='test@localhost', GIT_COMMITTER_NAME='test', GIT_COMMITTER_EMAIL='test@localhost')
+    subprocess.run(['git', '-C', repository_path, 'commit', '-q', '--allow-empty', '-m', 'Initial commit'], check=True, env=environment)
+    for tag in ['4.7.0.{}'.format(build) for build in range(1, 300)]:
+        subprocess.run(['git', '-C', repository_path, 'update-ref', 'refs/tags/' + tag, 'HEAD'], check=True)
+    subprocess.run(['git', '-C', repository_path, 'tag', '-a', '-m', 'Annotated', '4.7.0.300'], check=True, env=environment)
+    subprocess.run(['git', '-C', repository_path, 'update-ref', 'refs/remotes/origin/release/4.7.0', 'HEAD'], check=True)
+    subprocess.run(['git', '-C', repository_path, 'update-ref', '-d', 'refs/tags/4.7.0.2'], check=True)
+    subprocess.run(['git', '-C', repository_path, 'pack-refs', '--all'], check=True)
+    subprocess.run(['git', '-C', repository_path, 'update-ref', 'refs/tags/4.7.0.301', 'HEAD'], check=True)
+    expected_tags = subprocess.run(['git', '-C', repository_path, 'for-each-ref', '--format=%(refname:strip=2)', 'refs/tags'], capture_output=True, text=True, check=True).stdout.splitlines()
+    session = get_version_number.RepositorySession(repository_path)
+    assert session.tags == expected_tags
+    assert session.remote_branches == ['release/4.7.0']
+    assert get_version_number.return_next_version_number(session.tags, session.remote_branches, 'release/4.7.0', '', 2, 1) == '4.7.0.302'
+
+def test_return_tag_history_report():
+    feature_number = get_version_number.hash_text_to_8_digits('feature/0', 1)
+    tags = (tag for tag in ['1.2.0.1', '1.2.0.4', '1.2.0.04', '1.2.0.9', '2.0.0.1', '0.0.{}.2'.format(feature_number), 'TEST-1234'])
+    result = get_version_number.return_tag_history_report(tags, ['release/1.2.0', 'feature/0', 'feature/4'], 1)
+    assert [result['tags'], result['version_tags'], result['gaps'], result['duplicates']] == [7, 6, 7, 1]
+    assert [(line['line'], line['kind'], line['branches']) for line in result['lines']] == [('0.0.{}'.format(feature_number), 'feature', ['feature/0', 'feature/4']),
+                                                                                             ('1.2.0', 'release', ['release/1.2.0']), ('2.0.0', 'mainline', [])]
+    assert [result['lines'][1]['gap_ranges'], result['lines'][1]['duplicate_builds'], result['lines'][1]['highest']] == [['2-3', '5-8'], [4], '1.2.0.9']
+    assert result['collisions'] == [{'category': 'feature', 'number': feature_number, 'branches': ['feature/0', 'feature/4']}]
+
+def test_return_as_of_timestamp_only_treats_dates_as_dates():
+    assert get_version_number.return_as_of_timestamp('@1700000000') == 1700000000
+    assert get_version_number.return_as_of_timestamp('2024-03-01T12:00:00+00:00') == 1709294400
+    assert get_version_number.return_as_of_timestamp('20240301') is None
+    assert get_version_number.return_as_of_timestamp('2024-13-01') is None
+
+def test_get_tags_as_of_date_and_commit():
+    repository = __initialize_git_repo()
+    first_commit = repository.head.commit.hexsha
+    repository.create_tag('1.0.0.1')
+    repository.index.commit('Second commit', commit_date='1893456000 +0000')
+    repository.create_tag('1.0.0.2')
+    repository.git.checkout(first_commit)
+    repository.index.commit('Side commit', commit_date='1893628800 +0000')
+    repository.create_tag('1.0.0.3')
+    assert get_version_number.get_tags_as_of(repository.working_dir, first_commit) == ['1.0.0.1']
+    assert sorted(get_version_number.get_tags_as_of(repository.working_dir, '2029-12-31')) == ['1.0.0.1']
+    assert sorted(get_version_number.get_tags_as_of(repository.working_dir, '@1893542400')) == ['1.0.0.1', '1.0.0.2']
+    assert os.path.exists(os.path.join(repository.git_dir, get_version_number.TAG_DATE_INDEX_CACHE_FILENAME))
+    assert get_version_number.get_tags_as_of(repository.working_dir, '1.0.0.3') == ['1.0.0.1', '1.0.0.3']
+    result = get_version_number.return_next_version_number(get_version_number.get_tags_as_of(repository.working_dir, '1.0.0.2'), [], 'main', '', 2, 1)
+    assert result == '1.0.0.3'
+
+def test_get_reachable_tags_ignores_unrelated_branches():
+    repository = __initialize_git_repo()
+    main_branch = repository.active_branch.name
+    repository.create_tag('1.0.0.1')
+    repository.git.checkout('--orphan', 'unrelated')
+    repository.index.commit('Unrelated commit')
+    repository.create_tag('9.0.0.1')
+    repository.git.checkout(main_branch)
+    result = get_version_number.get_reachable_tags(repository.working_dir, main_branch)
+    assert result == ['1.0.0.1']
+    assert get_version_number.return_next_version_number(result, [], 'main', '', 2, 1) == '1.0.0.2'
+    repository.index.commit('Second commit')
+    repository.create_tag('1.0.0.2')
+    with repository.git.custom_environment(GIT_AUTHOR_NAME='test', GIT_AUTHOR_EMAIL='test@localhost', GIT_COMMITTER_NAME='test', GIT_COMMITTER_EMAIL='test@localhost'):
+        repository.git.merge('unrelated', '--allow-unrelated-histories', '-m', 'Merge unrelated')
+    assert get_version_number.get_reachable_tags(repository.working_dir, main_branch) == ['1.0.0.1', '1.0.0.2', '9.0.0.1']
+    repository.git.reset('--hard', '1.0.0.2')
+    assert get_version_number.get_reachable_tags(repository.working_dir, main_branch) == ['1.0.0.1', '1.0.0.2']
+    assert os.path.exists(os.path.join(repository.git_dir, get_version_number.REACHABILITY_CACHE_FILENAME))
+
+def test_return_next_version_number_semver_scheme():
+    scheme = get_version_number.VERSION_SCHEMES['semver']
+    branch_number = get_version_number.hash_text_to_8_digits('feature/semver', 8)
+    tags = ['1.2.3', '1.2.4+build.7', '1.3.0-rc.1', '1.2.05', '1.2.9.1', '0.{}.0'.format(branch_number)]
+    branches = ['release/1.2']
+    expected_result = ['1.3.0', '1.2.5', '1.4.0', '0.{}.1'.format(branch_number)]
+    result = [get_version_number.return_next_version_number(tags, branches, current_branch, '', 2, 1, scheme=scheme)
+              for current_branch in ['main', 'release/1.2', 'release/1.4', 'feature/semver']]
+    assert result == expected_result
+    assert get_version_number.return_filtered_tag_list(tags, scheme) == ['1.2.3', '1.2.4+build.7', '0.{}.0'.format(branch_number)]
+    assert get_version_number.return_highest_version_number_from_list(['1.2.3', '1.10.0+build.1', '1.9.9'], scheme) == '1.10.0+build.1'
+
+def test_return_next_version_number_three_digit_scheme():
+    scheme = get_version_number.VERSION_SCHEMES['three-digit']
+    tags = ['0.1.1', '0.1.2', '4.7.1', '4.7.0.1']
+    assert get_version_number.return_next_version_number([], [], 'main', scheme.default_line, 2, 1, scheme=scheme) == '0.1.1'
+    assert get_version_number.return_next_version_number(tags, [], 'main', '', 2, 1, scheme=scheme) == '4.7.2'
+    assert get_version_number.return_next_version_number(tags, [], 'main', '5.0', 2, 1, scheme=scheme) == '5.0.1'
+    assert get_version_number.return_next_version_number(tags, ['release/4.7'], 'main', '', 2, 1, scheme=scheme) == '4.8.1'
+    branch_number = get_version_number.hash_text_to_8_digits('developer', 8)
+    assert get_version_number.return_next_version_number(tags, [], 'developer', '', 2, 7, scheme=scheme) == '99.{}.7'.format(branch_number)
+    index = get_version_number.VersionIndex.from_tags(tags, scheme)
+    assert index.highest_with_prefix((4, 7)) == (4, 7, 1)
+
+def test_return_next_version_number_calver_scheme():
+    scheme = get_version_number.VERSION_SCHEMES['calver']
+    today = get_version_number.time.localtime()
+    tags = ['2020.1.0', '2020.1.1', '2020.13']
+    assert get_version_number.return_next_version_number(tags, [], 'main', '', 2, 1, scheme=scheme) == '{}.{}.0'.format(today.tm_year, today.tm_mon)
+    assert get_version_number.return_next_version_number(tags + ['2999.12.4'], [], 'main', '', 2, 1, scheme=scheme) == '2999.12.5'
+    assert get_version_number.return_next_version_number(tags, ['release/2020.1'], 'release/2020.1', '', 2, 1, scheme=scheme) == '2020.1.2'
+    state = get_version_number.scan_version_tags(tags, scheme=scheme)
+    assert get_version_number.VersionMaxima.from_dict(state.to_dict()).scheme is scheme
+
+def test_return_next_version_number_calver_bumps_to_the_next_month():
+    scheme = get_version_number.VERSION_SCHEMES['calver']
+    today = get_version_number.time.localtime()
+    assert get_version_number.return_next_version_number(['2999.12.4'], ['release/2999.12'], 'main', '', 2, 1, scheme=scheme) == '3000.1.0'
+    assert get_version_number.return_next_version_number(['2999.5.4'], ['release/2999.5'], 'main', '', 2, 1, scheme=scheme) == '2999.6.0'
+    assert get_version_number.return_next_version_number(['2999.5.4'], ['release/2999.5'], 'main', '', 1, 1, scheme=scheme) == '3000.1.0'
+    assert get_version_number.return_next_version_number(['2000.5.4'], ['release/2000.5'], 'main', '2000.5', 2, 1, scheme=scheme) == '{}.{}.0'.format(today.tm_year, today.tm_mon)
+
+def test_unsorted_packed_refs_are_merged_with_loose_refs():
+    expected_result = ['refs/tags/1.0.0.1', 'refs/tags/2.0.0.1']
+    repository = __initialize_git_repo()
+    commit = repository.head.commit.hexsha
+    with open(os.path.join(repository.git_dir, 'packed-refs'), 'w') as writer:
+        writer.write('# pack-refs with: peeled\n{0} refs/tags/2.0.0.1\n{0} refs/tags/1.0.0.1\n'.format(commit))
+    repository.create_tag('1.0.0.1', force=True)
+    result = list(get_version_number.iterate_refs_from_git_directory(repository.git_dir, ('refs/tags/',)))
+    assert result == expected_result
+
+def test_iterate_packed_refs_seeks_prefixes():
+    repository_path = './tmp/test_synthetic_repository'
+    benchmark_get_version_number.create_synthetic_repository(repository_path, 500, loose_fraction=0.1)
+    refs = list(get_version_number.iterate_refs_from_git_directory(repository_path, ('refs/',)))
+    for prefixes in [('refs/tags/1',), ('refs/tags/0.0.',), ('refs/remotes/origin/release/',), ('refs/tags/', 'refs/remotes/origin/'), ('refs/tags/zzz',)]:
+        expected_result = [ref for ref in refs if ref.startswith(prefixes)]
+        result = list(get_version_number.iterate_refs_from_git_directory(repository_path, prefixes))
+        assert result == expected_result
+
+def test_repository_session_with_tag_prefix():
+    repository = __initialize_git_repo()
+    for tag in ['service-a/1.0.0.1', 'service-a/1.1.0.4', 'service-b/2.0.0.1', 'v1.0.0.3', '1.0.0.9']:
+        repository.create_tag(tag)
+    repository.git.pack_refs('--all')
+    repository.create_tag('service-a/1.1.0.5')
+    session = get_version_number.RepositorySession(repository.working_dir, tag_prefix='service-a/')
+    assert sorted(session.tags) == ['1.0.0.1', '1.1.0.4', '1.1.0.5']
+    assert get_version_number.return_next_version_number(session.tags, [], 'main', '', 2, 1) == '1.1.0.6'
+    assert get_version_number.RepositorySession(repository.working_dir, tag_prefix='v').tags == ['1.0.0.3']
+
+def test_return_component_next_versions():
+    tags = ['service-a/1.2.0.3', 'service-a/1.2.0.4', 'service-a/1.3.0.1', 'service-b/2.0.0.7', 'v1.1.0.2', '1.0.0.1', 'build-17']
+    branches = ['main', 'release/service-a/1.2.0', 'release/v1.1.0']
+    expected_result = [('', 'main', '1.0.0.2'), ('service-a/', 'main', 'service-a/1.3.0.2'), ('service-a/', 'release/service-a/1.2.0', 'service-a/1.2.0.5'),
+                       ('service-b/', 'main', 'service-b/2.0.0.8'), ('v', 'main', 'v1.2.0.1')]
+    result = get_version_number.return_component_next_versions(tags, branches, ['main', 'release/service-a/1.2.0'], '', 2, 1)
+    assert [(version['tag_prefix'], version['branch'], version['tag']) for version in result] == expected_result
+
+def test_release_branch_of_another_component_is_an_error():
+    repository = __initialize_git_repo()
+    repository.create_tag('service-a/1.0.0.4')
+    entry = {'directory': repository.working_dir, 'branch': 'release/service-b/2.0.0', 'tag_prefix': 'service-a/'}
+    result = get_version_number.return_manifest_entry_version(entry)
+    assert 'version' not in result and result['error'].startswith('ValueError')
+    result = subprocess.run([sys.executable, 'get_version_number.py', '-d', repository.working_dir, '-b', 'release/1.0.0', '--tag-prefix', 'service-a/'], capture_output=True, text=True)
+    assert result.returncode == 2 and 'another component' in result.stderr
+    entry['branch'] = 'release/service-a/1.0.0'
+    assert get_version_number.return_manifest_entry_version(entry)['version'] == '1.0.0.5'
+
+def test_as_of_and_reachable_are_combined():
+    repository = __initialize_git_repo()
+    repository.create_tag('1.0.0.1')
+    repository.index.commit('Second commit')
+    repository.create_tag('1.0.0.2')
+    result = subprocess.run([sys.executable, 'get_version_number.py', '-d', repository.working_dir, '-b', repository.active_branch.name, '--as-of', 'HEAD~1', '--reachable'], capture_output=True, text=True)
+    assert result.stdout.strip() == '1.0.0.2'
+
+def test_parse_arguments_reserve_rejects_other_tag_sources():
+    for option in [['--as-of', 'HEAD~1'], ['--cache'], ['--ls-remote'], ['--ref-backend', 'files'], ['--state-in', 'state.json']]:
+        with pytest.raises(SystemExit):
+            get_version_number.parse_arguments(['-d', '1', '-b', 'main', '--reserve'] + option)